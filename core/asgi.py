@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Sensor oqimi (NDJSON) Django'ning to'liq tanani o'qiydigan handler'ini chetlab o'tadi
+from monitoring.streaming import SensorStreamRouter  # noqa: E402
+
+application = SensorStreamRouter(django_application)
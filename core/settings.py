@@ -47,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # INSTRUMENTATION_ENABLED=True bo'lmasa o'chiq (MiddlewareNotUsed)
+    'monitoring.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -127,6 +129,10 @@ STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'  # ✅ Majburiy
 STATICFILES_DIRS = [BASE_DIR / 'static']  # ✅ Qo'shimcha
 
+# Yaratilgan hisobot fayllari (Report.file_path)
+MEDIA_URL = '/media/'
+MEDIA_ROOT = Path(os.getenv('MEDIA_ROOT', BASE_DIR / 'media'))
+
 # settings.py fayliga qo'shing
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
@@ -135,12 +141,65 @@ LOGOUT_REDIRECT_URL = '/'
 # custom user model
 AUTH_USER_MODEL = 'monitoring.User'   # yoki app nomingiz.nomi (app name: monitoring degan faraz)
 
-# backend (odatda defaultda bor)
+# username, employee_id yoki STIR bilan kirish (bitta indeksli so'rov)
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
+    'monitoring.backends.CustomAuthBackend',
 ]
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Sensor ma'lumotlarini qabul qilish (monitoring/ingest.py, monitoring/streaming.py)
+SENSOR_INGEST_MAX_BATCH = int(os.getenv('SENSOR_INGEST_MAX_BATCH', 5000))
+SENSOR_STREAM_BATCH_SIZE = int(os.getenv('SENSOR_STREAM_BATCH_SIZE', 500))
+SENSOR_STREAM_FLUSH_INTERVAL = float(os.getenv('SENSOR_STREAM_FLUSH_INTERVAL', 1.0))  # soniya
+
+# Sensor tarixini saqlash siyosati (monitoring/retention.py, apply_retention buyrug'i)
+SENSOR_RETENTION = {
+    'RAW_DAYS': int(os.getenv('SENSOR_RAW_RETENTION_DAYS', 90)),  # xom SensorData
+    'MINUTE_ROLLUP_DAYS': int(os.getenv('SENSOR_MINUTE_ROLLUP_DAYS', 30)),
+    'HOUR_ROLLUP_DAYS': None,  # None - cheksiz saqlanadi; kunlik agregatlar doim saqlanadi
+    'CHUNK_SIZE': int(os.getenv('SENSOR_RETENTION_CHUNK_SIZE', 5000)),
+}
+
+# Kesh (dashboard statistikasi va boshqalar). Bir nechta worker uchun umumiy
+# backend tavsiya etiladi, masalan:
+#   CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#   CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'sofbreathe'),
+    }
+}
+DASHBOARD_STATS_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_STATS_CACHE_TIMEOUT', 60))  # soniya
+
+# Jonli yangilanishlar (monitoring/live.py). Bir nechta worker uchun umumiy
+# broker klassini ko'rsating.
+LIVE_BROKER = os.getenv('LIVE_BROKER', 'monitoring.live.InProcessBroker')
+LIVE_HEARTBEAT_INTERVAL = int(os.getenv('LIVE_HEARTBEAT_INTERVAL', 15))  # soniya
+
+# Bosh sahifa xaritasi: shu zoom'dan past bo'lsa korxonalar serverda klasterlanadi
+MAP_CLUSTER_MAX_ZOOM = int(os.getenv('MAP_CLUSTER_MAX_ZOOM', 14))
+
+# Fon rejimidagi hisobotlar (monitoring/reports.py, process_report_jobs buyrug'i)
+REPORT_REUSE_SECONDS = int(os.getenv('REPORT_REUSE_SECONDS', 900))  # tugamagan davr hisoboti shuncha vaqt qayta ishlatiladi
+REPORT_JOB_TIMEOUT = int(os.getenv('REPORT_JOB_TIMEOUT', 600))  # shundan uzoq 'running' ish qayta navbatga qo'yiladi
+REPORT_JOB_MAX_ATTEMPTS = int(os.getenv('REPORT_JOB_MAX_ATTEMPTS', 3))
+
+# Davomiylik bo'yicha jarima (Penalty.mode='duration'): oyna berilmasa oxirgi N kun
+PENALTY_DURATION_WINDOW_DAYS = int(os.getenv('PENALTY_DURATION_WINDOW_DAYS', 30))
+
+# Qoidabuzarlik detektori (monitoring/detector.py)
+VIOLATION_MODERATE_RATIO = float(os.getenv('VIOLATION_MODERATE_RATIO', 0.9))  # max_allowed_gas ulushi
+VIOLATION_HYSTERESIS = float(os.getenv('VIOLATION_HYSTERESIS', 0.05))
+VIOLATION_DEBOUNCE_READINGS = int(os.getenv('VIOLATION_DEBOUNCE_READINGS', 3))
+VIOLATION_DRAFT_PENALTIES = os.getenv('VIOLATION_DRAFT_PENALTIES', 'True').lower() == 'true'
+VIOLATION_DRAFT_DEADLINE_DAYS = int(os.getenv('VIOLATION_DRAFT_DEADLINE_DAYS', 30))
+
+# So'rovlar instrumentatsiyasi (monitoring/instrumentation.py): view bo'yicha SQL soni/vaqti,
+# render vaqti, javob hajmi. /api/instrumentation/ va instrumentation_report buyrug'i
+INSTRUMENTATION_ENABLED = os.getenv('INSTRUMENTATION_ENABLED', 'False').lower() == 'true'
+INSTRUMENTATION_BUFFER_SIZE = int(os.getenv('INSTRUMENTATION_BUFFER_SIZE', 5000))  # oxirgi N so'rov
@@ -1,7 +1,13 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from django.utils.html import format_html
+from django.db.models import Count
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
 from .models import *
+from .notifications import count_bits, fill_recipients, invalidate_unread
+from .stats import invalidate_dashboard_stats
+from .summaries import invalidate_penalty_summaries
 
 # Custom User Admin
 class CustomUserAdmin(UserAdmin):
@@ -22,26 +28,30 @@ class CustomUserAdmin(UserAdmin):
         }),
     )
     
+    autocomplete_fields = ('company',)
+    
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('company')
 
-# Region Admin
-class RegionAdmin(admin.ModelAdmin):
-    list_display = ('name', 'company_count')
-    search_fields = ('name',)
+# Korxonalar soni ro'yxat so'rovining o'zida (har bir qator uchun COUNT emas)
+class CompanyCountMixin:
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(company_total=Count('company'))
     
     def company_count(self, obj):
-        return obj.company_set.count()
+        return obj.company_total
     company_count.short_description = 'Korxonalar soni'
+    company_count.admin_order_field = 'company_total'
+
+# Region Admin
+class RegionAdmin(CompanyCountMixin, admin.ModelAdmin):
+    list_display = ('name', 'company_count')
+    search_fields = ('name',)
 
 # Industry Type Admin
-class IndustryTypeAdmin(admin.ModelAdmin):
+class IndustryTypeAdmin(CompanyCountMixin, admin.ModelAdmin):
     list_display = ('name', 'company_count')
     search_fields = ('name',)
-    
-    def company_count(self, obj):
-        return obj.company_set.count()
-    company_count.short_description = 'Korxonalar soni'
 
 # Company Admin
 class CompanyAdmin(admin.ModelAdmin):
@@ -52,6 +62,7 @@ class CompanyAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at', 'status')
     list_editable = ('sensor_active',)
     list_per_page = 25
+    autocomplete_fields = ('region', 'industry_type')
     
     fieldsets = (
         ('Asosiy Ma\'lumotlar', {
@@ -109,53 +120,67 @@ class CompanyAdmin(admin.ModelAdmin):
         self.message_user(request, f'{queryset.count()} ta korxonaning holati yangilandi')
     calculate_status.short_description = "Tanlangan korxonalar holatini yangilash"
 
-# Penalty Inline for Company
-class PenaltyInline(admin.TabularInline):
-    model = Penalty
+# Inline'lar faqat oxirgi INLINE_LIMIT ta yozuvni ko'rsatadi; qolganlari -
+# korxona sahifasidagi "Barchasini ko'rish" havolalari orqali ro'yxatda
+INLINE_LIMIT = 20
+
+class LatestInlineFormSet(BaseInlineFormSet):
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            self._queryset = super().get_queryset()[:INLINE_LIMIT]
+        return self._queryset
+
+class LatestInline(admin.TabularInline):
+    formset = LatestInlineFormSet
     extra = 0
-    readonly_fields = ('penalty_number', 'excess_amount', 'trees_required', 'status', 'created_at')
-    fields = ('penalty_number', 'excess_amount', 'trees_required', 'status', 'deadline', 'created_at')
     can_delete = False
     
     def has_add_permission(self, request, obj):
         return False
 
+# Penalty Inline for Company
+class PenaltyInline(LatestInline):
+    model = Penalty
+    ordering = ('-created_at',)
+    verbose_name_plural = f'Jarimalar (oxirgi {INLINE_LIMIT} ta)'
+    readonly_fields = ('penalty_number', 'excess_amount', 'trees_required', 'status', 'created_at')
+    fields = ('penalty_number', 'excess_amount', 'trees_required', 'status', 'deadline', 'created_at')
+
 # Sensor Data Inline for Company
-class SensorDataInline(admin.TabularInline):
+class SensorDataInline(LatestInline):
     model = SensorData
-    extra = 0
-    readonly_fields = ('recorded_at',)
+    ordering = ('-recorded_at',)
+    verbose_name_plural = f'Sensor ma\'lumotlari (oxirgi {INLINE_LIMIT} ta)'
+    readonly_fields = ('gas_amount', 'recorded_at')
     fields = ('gas_amount', 'recorded_at')
-    can_delete = False
-    
-    def has_add_permission(self, request, obj):
-        return False
 
 # Notification Inline for Company
-class NotificationInline(admin.TabularInline):
+class NotificationInline(LatestInline):
     model = Notification
-    extra = 0
+    ordering = ('-created_at',)
+    verbose_name_plural = f'Bildirishnomalar (oxirgi {INLINE_LIMIT} ta)'
     readonly_fields = ('created_at',)
     fields = ('message', 'is_read', 'created_at')
-    can_delete = False
-    
-    def has_add_permission(self, request, obj):
-        return False
 
 # Penalty Admin
 class PenaltyAdmin(admin.ModelAdmin):
-    list_display = ('penalty_number', 'company', 'excess_amount', 'trees_required', 
+    list_display = ('penalty_number', 'company', 'mode', 'excess_amount', 'trees_required', 
                    'status_badge', 'status', 'deadline', 'created_at')
-    list_filter = ('status', 'created_at', 'deadline', 'company__region')
+    list_filter = ('status', 'mode', 'created_at', 'deadline', 'company__region')
     search_fields = ('penalty_number', 'company__name', 'company__stir_number')
-    readonly_fields = ('penalty_number', 'excess_amount', 'trees_required', 'created_at')
+    readonly_fields = ('penalty_number', 'excess_amount', 'trees_required', 'exceed_hours', 'created_at')
     list_editable = ('status', 'deadline')
     list_per_page = 25
+    show_full_result_count = False
+    autocomplete_fields = ('company',)
     
     fieldsets = (
         ('Asosiy Ma\'lumotlar', {
             'fields': ('penalty_number', 'company', 'excess_amount', 'trees_required')
         }),
+        ('Hisoblash rejimi', {
+            'fields': ('mode', 'window_start', 'window_end', 'exceed_hours')
+        }),
         ('Holat va Muddat', {
             'fields': ('status', 'deadline')
         }),
@@ -166,11 +191,13 @@ class PenaltyAdmin(admin.ModelAdmin):
     
     def status_badge(self, obj):
         colors = {
+            'draft': 'gray',
             'active': 'orange',
             'completed': 'green',
             'cancelled': 'red'
         }
         status_text = {
+            'draft': 'Qoralama',
             'active': 'Faol',
             'completed': 'Bajarilgan',
             'cancelled': 'Bekor qilingan'
@@ -186,15 +213,30 @@ class PenaltyAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('company')
     
-    actions = ['mark_as_completed', 'mark_as_cancelled']
+    actions = ['approve_drafts', 'mark_as_completed', 'mark_as_cancelled']
+    
+    def approve_drafts(self, request, queryset):
+        drafts = queryset.filter(status='draft')
+        changed = list(drafts.values_list('company_id', 'created_at'))
+        updated = drafts.update(status='active')
+        invalidate_dashboard_stats()
+        invalidate_penalty_summaries(changed)
+        self.message_user(request, f'{updated} ta qoralama jarima tasdiqlandi')
+    approve_drafts.short_description = "Tanlangan qoralama jarimalarni tasdiqlash"
     
     def mark_as_completed(self, request, queryset):
+        changed = list(queryset.values_list('company_id', 'created_at'))
         updated = queryset.update(status='completed')
+        invalidate_dashboard_stats()
+        invalidate_penalty_summaries(changed)
         self.message_user(request, f'{updated} ta jarima bajarilgan deb belgilandi')
     mark_as_completed.short_description = "Tanlangan jarimalarni bajarilgan deb belgilash"
     
     def mark_as_cancelled(self, request, queryset):
+        changed = list(queryset.values_list('company_id', 'created_at'))
         updated = queryset.update(status='cancelled')
+        invalidate_dashboard_stats()
+        invalidate_penalty_summaries(changed)
         self.message_user(request, f'{updated} ta jarima bekor qilingan deb belgilandi')
     mark_as_cancelled.short_description = "Tanlangan jarimalarni bekor qilingan deb belgilash"
 
@@ -204,6 +246,7 @@ class PenaltyResponseAdmin(admin.ModelAdmin):
     list_filter = ('submitted_at', 'penalty__status')
     search_fields = ('penalty__penalty_number', 'penalty__company__name', 'comment')
     readonly_fields = ('submitted_at',)
+    raw_id_fields = ('penalty',)
     
     fieldsets = (
         ('Asosiy Ma\'lumotlar', {
@@ -230,6 +273,8 @@ class SensorDataAdmin(admin.ModelAdmin):
     search_fields = ('company__name', 'company__stir_number')
     readonly_fields = ('recorded_at',)
     list_per_page = 50
+    show_full_result_count = False
+    autocomplete_fields = ('company',)
     
     fieldsets = (
         ('Asosiy Ma\'lumotlar', {
@@ -243,6 +288,28 @@ class SensorDataAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('company')
 
+# Sensor Rollup Admin
+class SensorRollupAdmin(admin.ModelAdmin):
+    list_display = ('company', 'granularity', 'bucket_start', 'sample_count', 'gas_avg_display',
+                   'gas_min', 'gas_max', 'exceed_count')
+    list_filter = ('granularity', 'company__region')
+    search_fields = ('company__name', 'company__stir_number')
+    readonly_fields = ('company', 'granularity', 'bucket_start', 'sample_count', 'gas_sum',
+                       'gas_min', 'gas_max', 'exceed_count')
+    list_per_page = 50
+    show_full_result_count = False
+    
+    def gas_avg_display(self, obj):
+        avg = obj.gas_avg
+        return '-' if avg is None else round(avg, 3)
+    gas_avg_display.short_description = 'O\'rtacha'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('company')
+
 # Notification Admin
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ('company', 'message_preview', 'is_read', 'created_at')
@@ -250,6 +317,8 @@ class NotificationAdmin(admin.ModelAdmin):
     search_fields = ('company__name', 'message')
     list_editable = ('is_read',)
     list_per_page = 25
+    show_full_result_count = False
+    autocomplete_fields = ('company',)
     
     fieldsets = (
         ('Asosiy Ma\'lumotlar', {
@@ -272,21 +341,54 @@ class NotificationAdmin(admin.ModelAdmin):
     actions = ['mark_as_read', 'mark_as_unread']
     
     def mark_as_read(self, request, queryset):
+        company_ids = set(queryset.values_list('company_id', flat=True))
         updated = queryset.update(is_read=True)
+        invalidate_unread(company_ids)
         self.message_user(request, f'{updated} ta bildirishnoma o`qilgan deb belgilandi')
     mark_as_read.short_description = "Tanlangan bildirishnomalarni o'qilgan deb belgilash"
     
     def mark_as_unread(self, request, queryset):
+        company_ids = set(queryset.values_list('company_id', flat=True))
         updated = queryset.update(is_read=False)
+        invalidate_unread(company_ids)
         self.message_user(request, f'{updated} ta bildirishnoma o`qilmagan deb belgilandi')
     mark_as_unread.short_description = "Tanlangan bildirishnomalarni o'qilmagan deb belgilash"
 
+# Broadcast Admin
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = ('message_preview', 'region', 'recipient_count', 'read_count', 'created_by', 'created_at')
+    list_filter = ('region', 'created_at')
+    search_fields = ('message',)
+    readonly_fields = ('recipient_count', 'read_count', 'created_by', 'created_at')
+    list_per_page = 25
+
+    def message_preview(self, obj):
+        if len(obj.message) > 50:
+            return obj.message[:50] + '...'
+        return obj.message
+    message_preview.short_description = 'Xabar'
+
+    def read_count(self, obj):
+        return count_bits(obj.read_by, obj.recipients)
+    read_count.short_description = "O'qiganlar"
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('region', 'created_by')
+
+    def save_model(self, request, obj, form, change):
+        # Qabul qiluvchilar xabar yaratilgan paytdagi korxonalar
+        if not change:
+            obj.created_by = request.user
+            fill_recipients(obj)
+        super().save_model(request, obj, form, change)
+
 # Report Admin
 class ReportAdmin(admin.ModelAdmin):
     list_display = ('company', 'report_type', 'period', 'created_at', 'file_preview')
     list_filter = ('report_type', 'created_at', 'company__region')
     search_fields = ('company__name', 'period')
     readonly_fields = ('created_at',)
+    autocomplete_fields = ('company',)
     
     fieldsets = (
         ('Asosiy Ma\'lumotlar', {
@@ -301,7 +403,7 @@ class ReportAdmin(admin.ModelAdmin):
         if obj.file_path:
             return format_html(
                 '<a href="{}" target="_blank">Yuklab olish</a>',
-                obj.file_path.url
+                reverse('download_saved_report', args=[obj.pk])
             )
         return '-'
     file_preview.short_description = 'Fayl'
@@ -309,9 +411,46 @@ class ReportAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('company')
 
+# Report Job Admin
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'company', 'report_type', 'period', 'status', 'attempts', 'worker',
+                    'created_at', 'finished_at')
+    list_filter = ('status', 'report_type')
+    search_fields = ('company__name', 'period')
+    readonly_fields = ('company', 'report_type', 'period', 'period_start', 'period_end', 'status',
+                       'report', 'requested_by', 'attempts', 'worker', 'error', 'created_at',
+                       'started_at', 'finished_at')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('company')
+
 # Detailed Company Admin with inlines
 class DetailedCompanyAdmin(CompanyAdmin):
     inlines = [PenaltyInline, SensorDataInline, NotificationInline]
+    readonly_fields = CompanyAdmin.readonly_fields + ('related_links',)
+    fieldsets = CompanyAdmin.fieldsets + (
+        ('Bog\'liq yozuvlar', {
+            'fields': ('related_links',)
+        }),
+    )
+    
+    def related_links(self, obj):
+        if obj.pk is None:
+            return '-'
+        links = [
+            ('monitoring_penalty_changelist', 'Jarimalar'),
+            ('monitoring_sensordata_changelist', 'Sensor ma\'lumotlari'),
+            ('monitoring_sensorrollup_changelist', 'Sensor agregatlari'),
+            ('monitoring_notification_changelist', 'Bildirishnomalar'),
+        ]
+        return format_html_join(
+            ' | ', '<a href="{}?company__id__exact={}">{}: barchasini ko\'rish</a>',
+            ((reverse(f'admin:{name}'), obj.pk, label) for name, label in links),
+        )
+    related_links.short_description = 'Barchasini ko\'rish'
 
 # Admin site customization
 admin.site.site_header = "Toshkent Shahri Ekologiya Monitoring Tizimi"
@@ -325,8 +464,11 @@ admin.site.register(IndustryType, IndustryTypeAdmin)
 admin.site.register(Company, DetailedCompanyAdmin)
 admin.site.register(Penalty, PenaltyAdmin)
 admin.site.register(SensorData, SensorDataAdmin)
+admin.site.register(SensorRollup, SensorRollupAdmin)
 admin.site.register(Notification, NotificationAdmin)
+admin.site.register(Broadcast, BroadcastAdmin)
 admin.site.register(Report, ReportAdmin)
+admin.site.register(ReportJob, ReportJobAdmin)
 
 # Alternative simple registration for quick setup
 # admin.site.register(User)
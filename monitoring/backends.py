@@ -5,20 +5,49 @@ from django.db.models import Q
 
 User = get_user_model()
 
+# Kirish turi bo'yicha identifikator ustuvorligi (username hammasida oxirgi)
+LOGIN_FIELDS = {
+    'factory': ('stir_number', 'username'),
+    'committee': ('employee_id', 'username'),
+}
+DEFAULT_LOGIN_FIELDS = ('username', 'employee_id', 'stir_number')
+
+
 class CustomAuthBackend(ModelBackend):
-    def authenticate(self, request, username=None, password=None, **kwargs):
+    """
+    Username, employee_id yoki stir_number orqali kirish - bitta so'rov:
+    uchala ustun ham yagona indeksli, shuning uchun OR ko'pi bilan 3 qator
+    qaytaradi. Bir nechta foydalanuvchi mos kelsa (masalan, birining
+    username'i boshqasining STIR'i), user_type bo'yicha ustuvor maydon tanlanadi.
+    """
+
+    def authenticate(self, request, username=None, password=None, user_type=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if not username or password is None:
+            return None
+        fields = LOGIN_FIELDS.get(user_type, DEFAULT_LOGIN_FIELDS)
+        lookup = Q()
+        for field in fields:
+            lookup |= Q(**{field: username})
+        candidates = list(User._default_manager.select_related('company').filter(lookup))
+
+        user = next(
+            (u for field in fields for u in candidates if getattr(u, field) == username),
+            None,
+        )
+        if user is None:
+            # Foydalanuvchi borligini vaqt bo'yicha bilib bo'lmasligi uchun (ModelBackend kabi)
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def get_user(self, user_id):
+        # Har bir so'rovda request.user bilan korxona ham bitta JOIN bilan olinadi
         try:
-            # Username, employee_id yoki stir_number orqali qidirish
-            user = User.objects.get(
-                Q(username=username) | 
-                Q(employee_id=username) | 
-                Q(stir_number=username)
-            )
-            
-            if user.check_password(password):
-                return user
-                
+            user = User._default_manager.select_related('company').get(pk=user_id)
         except User.DoesNotExist:
             return None
-        
-        return None
\ No newline at end of file
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,43 @@
+# monitoring/decorators.py
+"""
+Korxona (factory) view'lari uchun umumiy kirish tekshiruvi.
+
+request.user CustomAuthBackend.get_user da korxonasi bilan bitta JOIN
+so'rovda olinadi. factory_required foydalanuvchi turini va biriktirilgan
+korxonani tekshiradi va uni request.company sifatida view'ga beradi.
+allow_committee=True bo'lsa qo'mita ham o'tadi (request.company = None).
+"""
+from functools import wraps
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import render
+
+
+def factory_required(view=None, *, html=False, allow_committee=False):
+    """
+    html=True: xatolik error.html sahifasi bilan, aks holda JSON (403/404).
+    allow_committee=True: qo'mita foydalanuvchisi ham kiradi, request.company = None.
+    login_required ni ham o'z ichiga oladi.
+    """
+    def decorator(view):
+        @login_required
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if allow_committee and request.user.user_type == 'committee':
+                request.company = None
+                return view(request, *args, **kwargs)
+            if request.user.user_type != 'factory':
+                if html:
+                    return render(request, 'error.html', {'error': 'Sizga korxona paneliga kirish ruxsati yo\'q'})
+                return JsonResponse({'error': 'Ruxsat yo\'q'}, status=403)
+            company = request.user.company
+            if company is None:
+                if html:
+                    return render(request, 'error.html', {'error': 'Sizga biriktirilgan korxona topilmadi'})
+                return JsonResponse({'error': 'Korxona topilmadi'}, status=404)
+            request.company = company
+            return view(request, *args, **kwargs)
+        return wrapper
+
+    return decorator(view) if view is not None else decorator
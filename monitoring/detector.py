@@ -0,0 +1,165 @@
+# monitoring/detector.py
+"""
+Qoidabuzarlik detektori (ingestion bosqichi).
+
+Har bir o'qish korxonaning ogohlantirish darajasini (good / moderate / bad)
+hisoblaydi. Daraja o'zgarishi tasdiqlansa Notification yoziladi, 'bad' ga
+o'tishda esa (VIOLATION_DRAFT_PENALTIES) qo'mita ko'rib chiqishi uchun
+'draft' holatidagi jarima yaratiladi.
+
+- gisterezis: darajadan chiqish chegarasi kirish chegarasidan HYSTERESIS
+  ulushga past, shuning uchun chegara atrofidagi tebranish xabar bermaydi;
+- debounce: yangi daraja ketma-ket DEBOUNCE_READINGS ta o'qishda
+  takrorlangandagina tasdiqlanadi.
+
+Har bir korxona holati jarayon xotirasida saqlanadi (O(1), tarix so'ralmaydi).
+Tasdiqlangan daraja Company.alert_level da ham saqlanadi: bazadagi qiymat
+xotiradagidan farq qilsa (boshqa worker yoki qayta ishga tushish) holat
+bazadagisi bilan tenglashtiriladi.
+"""
+import datetime
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification, Penalty, generate_penalty_number
+from .notifications import invalidate_unread
+from .penalty_rules import penalty_amounts
+
+# 'moderate' darajasi: gas_amount >= max_allowed_gas * MODERATE_RATIO
+MODERATE_RATIO = getattr(settings, 'VIOLATION_MODERATE_RATIO', 0.9)
+HYSTERESIS = getattr(settings, 'VIOLATION_HYSTERESIS', 0.05)
+DEBOUNCE_READINGS = getattr(settings, 'VIOLATION_DEBOUNCE_READINGS', 3)
+DRAFT_PENALTIES = getattr(settings, 'VIOLATION_DRAFT_PENALTIES', True)
+DRAFT_DEADLINE_DAYS = getattr(settings, 'VIOLATION_DRAFT_DEADLINE_DAYS', 30)
+
+LEVEL_RANK = {'good': 0, 'moderate': 1, 'bad': 2}
+
+
+def classify(gas_amount, max_allowed_gas, level):
+    """Joriy daraja (level) ni hisobga olib o'qish darajasini qaytaradi."""
+    if max_allowed_gas > 0:
+        ratio = gas_amount / max_allowed_gas
+    else:
+        ratio = float('inf') if gas_amount > 0 else 0.0
+    bad_at = 1.0 - HYSTERESIS if level == 'bad' else 1.0
+    if ratio > bad_at:
+        return 'bad'
+    moderate_at = MODERATE_RATIO - HYSTERESIS if level != 'good' else MODERATE_RATIO
+    return 'moderate' if ratio >= moderate_at else 'good'
+
+
+class Transition:
+    __slots__ = ('company', 'previous', 'level', 'gas_amount')
+
+    def __init__(self, company, previous, level, gas_amount):
+        self.company = company
+        self.previous = previous
+        self.level = level
+        self.gas_amount = gas_amount
+
+    @property
+    def escalated(self):
+        return LEVEL_RANK[self.level] > LEVEL_RANK[self.previous]
+
+    def message(self):
+        statuses = dict(self.company.STATUS_CHOICES)
+        reading = f"{self.gas_amount:g} kg/soat (ruxsat etilgan: {self.company.max_allowed_gas:g} kg/soat)"
+        if self.level == 'bad':
+            return f"Gaz chiqarish me'yordan oshdi: {reading}. Holat: {statuses['bad']}."
+        if self.escalated:
+            return f"Gaz chiqarish me'yorga yaqinlashdi: {reading}. Holat: {statuses['moderate']}."
+        return (
+            f"Gaz chiqarish kamaydi: {reading}. "
+            f"Holat: {statuses[self.previous]} -> {statuses[self.level]}."
+        )
+
+
+class _State:
+    __slots__ = ('level', 'candidate', 'streak')
+
+    def __init__(self, level):
+        self.level = level
+        self.candidate = None
+        self.streak = 0
+
+
+class ViolationDetector:
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._states.clear()
+
+    def observe(self, company, gas_amount):
+        """
+        Bitta o'qishni baholaydi. Daraja o'zgarishi tasdiqlansa
+        company.alert_level ni yangilaydi va Transition qaytaradi, aks holda None.
+        """
+        with self._lock:
+            state = self._states.get(company.pk)
+            if state is None or state.level != company.alert_level:
+                state = self._states[company.pk] = _State(company.alert_level)
+
+            level = classify(gas_amount, company.max_allowed_gas, state.level)
+            if level == state.level:
+                state.candidate, state.streak = None, 0
+                return None
+            if level == state.candidate:
+                state.streak += 1
+            else:
+                state.candidate, state.streak = level, 1
+            if state.streak < DEBOUNCE_READINGS:
+                return None
+
+            previous = state.level
+            state.level, state.candidate, state.streak = level, None, 0
+            company.alert_level = level
+            return Transition(company, previous, level, gas_amount)
+
+
+detector = ViolationDetector()
+
+
+def emit_transitions(transitions):
+    """
+    Tasdiqlangan o'zgarishlar uchun Notification va (kerak bo'lsa) 'draft'
+    jarimalarni yozadi. Chaqiruvchi tranzaksiya ichida bo'lishi kerak.
+    """
+    if not transitions:
+        return
+    Notification.objects.bulk_create([
+        Notification(company=t.company, message=t.message()) for t in transitions
+    ])
+    company_ids = [t.company.pk for t in transitions]
+    transaction.on_commit(lambda: invalidate_unread(company_ids))
+    if not DRAFT_PENALTIES:
+        return
+
+    violations = {t.company.pk: t for t in transitions if t.level == 'bad'}
+    if not violations:
+        return
+    # Faol yoki ko'rib chiqilmagan jarimasi bor korxonaga yangi qoralama yozilmaydi
+    pending = set(
+        Penalty.objects.filter(company_id__in=violations, status__in=('draft', 'active'))
+        .values_list('company_id', flat=True)
+    )
+    deadline = timezone.localdate() + datetime.timedelta(days=DRAFT_DEADLINE_DAYS)
+    drafts = []
+    for company_id, t in violations.items():
+        if company_id in pending:
+            continue
+        excess, trees = penalty_amounts(t.gas_amount, t.company.max_allowed_gas)
+        drafts.append(Penalty(
+            company=t.company,
+            status='draft',
+            deadline=deadline,
+            excess_amount=excess,
+            trees_required=trees,
+            penalty_number=generate_penalty_number(),
+        ))
+    Penalty.objects.bulk_create(drafts)
@@ -0,0 +1,164 @@
+# monitoring/exports.py
+"""
+Hisobot ma'lumotlarini cheklangan xotira bilan eksport qilish.
+
+- CSV / NDJSON: qatorlar .iterator() bilan bo'laklab o'qiladi va ~64 KB
+  bloklar holida javobga yoziladi;
+- XLSX: openpyxl write-only rejimida vaqtinchalik faylga yoziladi, fayl
+  bo'laklab yuboriladi.
+
+ASGI ostida Django sinxron iteratorni to'liq xotiraga yig'ib oladi, shuning
+uchun u yerda bloklar asinxron iterator orqali bittadan olinadi.
+"""
+import csv
+import io
+import json
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .models import Company, Penalty
+
+ITERATOR_CHUNK_SIZE = 2000
+BLOCK_SIZE = 64 * 1024
+
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+NDJSON_CONTENT_TYPE = 'application/x-ndjson; charset=utf-8'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+COMPANY_HEADERS = (
+    'ID', 'Korxona nomi', 'STIR raqami', 'Hudud', 'Sanoat turi', 'Kenglik', 'Uzunlik',
+    'Ruxsat etilgan maksimal gaz (kg)', 'Joriy gaz miqdori (kg)', 'Holati', 'Sensor faol',
+    'Yaratilgan sana',
+)
+
+PENALTY_HEADERS = (
+    'Jarima raqami', 'Korxona', 'Oshib ketgan miqdor (kg)', 'Kerakli daraxtlar', 'Holati',
+    'Muddati', 'Yaratilgan sana',
+)
+
+
+def _format_datetime(value):
+    return timezone.localtime(value).strftime('%d.%m.%Y %H:%M')
+
+
+def company_rows():
+    statuses = dict(Company.STATUS_CHOICES)
+    rows = Company.objects.order_by('region__name', 'name').values_list(
+        'id', 'name', 'stir_number', 'region__name', 'industry_type__name', 'latitude', 'longitude',
+        'max_allowed_gas', 'current_gas_amount', 'status', 'sensor_active', 'created_at',
+    )
+    for (pk, name, stir, region, industry, lat, lng, max_allowed, current, status,
+         sensor_active, created_at) in rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        yield (
+            pk, name, stir, region, industry, lat, lng, max_allowed, current,
+            statuses.get(status, status), 'Ha' if sensor_active else "Yo'q", _format_datetime(created_at),
+        )
+
+
+def penalty_rows(period_start, period_end, company=None):
+    statuses = dict(Penalty.STATUS_CHOICES)
+    # Qoralamalar (detektor yaratgan, tasdiqlanmagan) hisobotga kirmaydi
+    penalties = Penalty.objects.filter(created_at__gte=period_start, created_at__lt=period_end).exclude(status='draft')
+    if company is not None:
+        penalties = penalties.filter(company=company)
+    rows = penalties.order_by('-created_at').values_list(
+        'penalty_number', 'company__name', 'excess_amount', 'trees_required', 'status',
+        'deadline', 'created_at',
+    )
+    for number, company, excess, trees, status, deadline, created_at in rows.iterator(
+            chunk_size=ITERATOR_CHUNK_SIZE):
+        yield (
+            number, company, float(excess), trees, statuses.get(status, status),
+            deadline.strftime('%d.%m.%Y'), _format_datetime(created_at),
+        )
+
+
+def csv_chunks(headers, rows):
+    # BOM: Excel UTF-8 (o'zbekcha harflar) ni to'g'ri ochishi uchun
+    buffer = io.StringIO()
+    buffer.write('\ufeff')
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= BLOCK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def ndjson_chunks(headers, rows):
+    block = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(headers, row)), ensure_ascii=False, default=str) + '\n'
+        block.append(line)
+        size += len(line)
+        if size >= BLOCK_SIZE:
+            yield ''.join(block).encode('utf-8')
+            block, size = [], 0
+    if block:
+        yield ''.join(block).encode('utf-8')
+
+
+def write_xlsx(sheets):
+    """
+    sheets: (nomi, sarlavhalar, qatorlar, bo'sh bo'lsa xabar) ro'yxati.
+    Qaytaradi: boshiga qaytarilgan vaqtinchalik fayl (yopilganda o'chadi).
+    """
+    workbook = Workbook(write_only=True)
+    for title, headers, rows, empty_message in sheets:
+        sheet = workbook.create_sheet(title)
+        sheet.append(headers)
+        written = 0
+        for row in rows:
+            sheet.append(row)
+            written += 1
+        if not written and empty_message:
+            sheet.append([empty_message])
+    output = tempfile.TemporaryFile(suffix='.xlsx')
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def file_chunks(fileobj, block_size=BLOCK_SIZE):
+    try:
+        while True:
+            chunk = fileobj.read(block_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+async def _async_chunks(chunks):
+    iterator = iter(chunks)
+    done = object()
+    try:
+        while True:
+            chunk = await sync_to_async(next)(iterator, done)
+            if chunk is done:
+                break
+            yield chunk
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+def streaming_response(request, chunks, content_type, filename, length=None):
+    if isinstance(request, ASGIRequest):
+        chunks = _async_chunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    if length is not None:
+        response['Content-Length'] = str(length)
+    return response
@@ -0,0 +1,118 @@
+# monitoring/geo.py
+"""
+Geohash yordamchilari.
+
+Company.geohash ustuni (indekslangan) korxona koordinatasidan hisoblanadi.
+Bir xil prefiksli geohash'lar bitta to'rtburchak katakda yotadi, shuning
+uchun xarita oynasi (bbox) bir nechta katak prefiksi bilan qoplanadi va
+bazadan indeks bo'yicha oraliq (range) so'rovlari bilan o'qiladi.
+"""
+import math
+
+import numpy as np
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Saqlanadigan aniqlik: 9 belgi ~ 4.8 m x 4.8 m
+PRECISION = 9
+
+# Yerning o'rtacha radiusi, metr
+EARTH_RADIUS_M = 6_371_008.8
+
+# Prefiksdan keyingi barcha geohash'lar shu belgidan kichik ('z' < '{')
+RANGE_END = '{'
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if longitude >= mid:
+                bits = bits * 2 + 1
+                lng_lo = mid
+            else:
+                bits *= 2
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                bits = bits * 2 + 1
+                lat_lo = mid
+            else:
+                bits *= 2
+                lat_hi = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = bit_count = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """precision belgili katakning (balandlik, kenglik) o'lchami, gradusda."""
+    lat_bits = 5 * precision // 2
+    lng_bits = 5 * precision - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def _cell_indexes(low, high, offset, size):
+    count = round(2 * offset / size)
+    first = min(int(math.floor((low + offset) / size)), count - 1)
+    last = min(int(math.floor((high + offset) / size)), count - 1)
+    return range(first, last + 1)
+
+
+def cover(south, west, north, east, max_cells=32):
+    """
+    bbox'ni qoplaydigan geohash prefikslari (eng aniq, lekin max_cells dan oshmaydigan).
+    Qaytaradi: saralangan prefikslar ro'yxati.
+    """
+    for precision in range(PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = _cell_indexes(south, north, 90.0, height)
+        cols = _cell_indexes(west, east, 180.0, width)
+        if len(rows) * len(cols) <= max_cells:
+            break
+    return sorted({
+        encode((row + 0.5) * height - 90.0, (col + 0.5) * width - 180.0, precision)
+        for row in rows
+        for col in cols
+    })
+
+
+def cluster_precision(zoom):
+    """
+    Xarita zoom darajasi uchun klaster katagi aniqligi: katak kengligi
+    taxminan plitkaning (256 px) choragidan oshmaydi.
+    """
+    target = 360.0 / 2 ** (zoom + 2)
+    for precision in range(1, PRECISION + 1):
+        if cell_size(precision)[1] <= target:
+            return precision
+    return PRECISION
+
+
+def radius_bbox(latitude, longitude, radius_m):
+    """Nuqta atrofidagi radius_m doirani o'z ichiga olgan (south, west, north, east)."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    south, north = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    # Qutbga yaqin joyda uzunlik bo'yicha butun aylana
+    cos_lat = math.cos(math.radians(max(abs(south), abs(north))))
+    dlng = 180.0 if cos_lat < 1e-9 else min(math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat)), 180.0)
+    return south, max(longitude - dlng, -180.0), north, min(longitude + dlng, 180.0)
+
+
+def haversine_m(latitude, longitude, latitudes, longitudes):
+    """Bitta nuqtadan koordinatalar massiviga bo'lgan masofalar (metr), vektorlangan."""
+    lat1 = math.radians(latitude)
+    lat2 = np.radians(latitudes)
+    dlat = lat2 - lat1
+    dlng = np.radians(longitudes) - math.radians(longitude)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
@@ -0,0 +1,208 @@
+# monitoring/ingest.py
+"""
+Sensor ma'lumotlarini qabul qilish (ingestion) xizmati.
+
+Bitta yoki ko'p o'qishlarni (readings) bitta tranzaksiyada yozadi:
+- SensorData qatorlari bulk_create bilan yoziladi;
+- har bir korxonaning current_gas_amount/status maydonlari partiya
+  (batch) uchun faqat bir marta yangilanadi;
+- SensorRollup agregatlari shu tranzaksiyada yangilanadi;
+- har bir o'qish qoidabuzarlik detektoridan o'tadi (monitoring/detector.py).
+"""
+import json
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .detector import detector, emit_transitions
+from .live import publish_company_updates
+from .models import Company, SensorData
+from .rollups import apply_readings
+from .stats import invalidate_dashboard_stats
+
+# Bitta so'rovda qabul qilinadigan maksimal o'qishlar soni
+MAX_BATCH_SIZE = getattr(settings, 'SENSOR_INGEST_MAX_BATCH', 5000)
+
+
+class IngestError(ValueError):
+    """So'rov tanasini (body) umuman o'qib bo'lmasa ko'tariladi."""
+
+
+def parse_readings_body(body, content_type=''):
+    """
+    So'rov tanasidan o'qishlar ro'yxatini ajratib oladi.
+    Qo'llab-quvvatlanadigan formatlar:
+    - JSON ro'yxat: [{...}, {...}]
+    - JSON obyekt: {"readings": [{...}, ...]}
+    - NDJSON (application/x-ndjson): har bir qatorda bitta JSON obyekt
+    """
+    if isinstance(body, bytes):
+        try:
+            body = body.decode('utf-8')
+        except UnicodeDecodeError:
+            raise IngestError("So'rov tanasi UTF-8 formatida emas")
+
+    if 'ndjson' in content_type or 'jsonl' in content_type:
+        readings = []
+        for line in body.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                readings.append(json.loads(line))
+            except ValueError:
+                # Noto'g'ri qator ham natijada alohida rad etiladi
+                readings.append(None)
+        return readings
+
+    try:
+        data = json.loads(body or 'null')
+    except ValueError:
+        raise IngestError("JSON formati noto'g'ri")
+
+    if isinstance(data, dict):
+        data = data.get('readings')
+    if not isinstance(data, list):
+        raise IngestError("'readings' ro'yxati topilmadi")
+    return data
+
+
+def _parse_gas_amount(value):
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(amount) or amount < 0:
+        return None
+    return amount
+
+
+def _parse_company_id(value):
+    # 12.7 -> 12 kabi jim kesishga yo'l qo'yilmaydi: faqat butun son yoki raqamli satr
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, float):
+        value = int(value) if value.is_integer() else None
+    elif isinstance(value, str):
+        value = int(value.strip()) if value.strip().isdigit() else None
+    elif not isinstance(value, int):
+        return None
+    return value if value is not None and value > 0 else None
+
+
+def ingest_readings(readings, company=None):
+    """
+    O'qishlarni bitta tranzaksiyada saqlaydi.
+
+    readings: dict'lar ro'yxati. Har biri `gas_amount` va (agar `company`
+    berilmagan bo'lsa) `company_id` yoki `stir_number` ni o'z ichiga oladi.
+    company: berilsa, barcha o'qishlar shu korxonaga tegishli deb olinadi
+    (korxona foydalanuvchisi faqat o'z korxonasiga yozishi mumkin).
+
+    Qaytaradi: {'accepted': int, 'rejected': int, 'results': [...]}
+    results har bir kiritilgan qator uchun (tartib saqlanadi):
+        {'index': i, 'status': 'accepted', 'company_id': ..}
+        {'index': i, 'status': 'rejected', 'error': '...'}
+    """
+    results = [None] * len(readings)
+    parsed = []  # (index, company_key, gas_amount)
+    company_ids = set()
+    stir_numbers = set()
+
+    for index, row in enumerate(readings):
+        if not isinstance(row, dict):
+            results[index] = {'index': index, 'status': 'rejected', 'error': "Qator JSON obyekt emas"}
+            continue
+
+        gas_amount = _parse_gas_amount(row.get('gas_amount'))
+        if gas_amount is None:
+            results[index] = {'index': index, 'status': 'rejected', 'error': "Gaz miqdori noto'g'ri yoki kiritilmagan"}
+            continue
+
+        if company is not None:
+            key = ('id', company.pk)
+            row_company_id = row.get('company_id')
+            row_stir = row.get('stir_number')
+            if (row_company_id is not None and str(row_company_id) != str(company.pk)) or \
+                    (row_stir is not None and str(row_stir) != company.stir_number):
+                results[index] = {'index': index, 'status': 'rejected', 'error': "Boshqa korxonaga yozish ruxsati yo'q"}
+                continue
+        elif row.get('company_id') is not None:
+            company_id = _parse_company_id(row['company_id'])
+            if company_id is None:
+                results[index] = {'index': index, 'status': 'rejected', 'error': "company_id noto'g'ri"}
+                continue
+            key = ('id', company_id)
+            company_ids.add(company_id)
+        elif row.get('stir_number'):
+            key = ('stir', str(row['stir_number']))
+            stir_numbers.add(key[1])
+        else:
+            results[index] = {'index': index, 'status': 'rejected', 'error': "Korxona ko'rsatilmagan"}
+            continue
+
+        parsed.append((index, key, gas_amount))
+
+    accepted = 0
+    if parsed:
+        with transaction.atomic():
+            companies_by_key = {}
+            if company is not None:
+                companies_by_key[('id', company.pk)] = company
+            else:
+                lookup = Company.objects.filter(id__in=company_ids) | Company.objects.filter(stir_number__in=stir_numbers)
+                for c in lookup:
+                    companies_by_key[('id', c.pk)] = c
+                    companies_by_key[('stir', c.stir_number)] = c
+
+            sensor_rows = []
+            transitions = []
+            touched = {}
+            # (status, me'yordan oshganmi) - partiyadan oldingi holat
+            previous = {}
+            for index, key, gas_amount in parsed:
+                target = companies_by_key.get(key)
+                if target is None:
+                    results[index] = {'index': index, 'status': 'rejected', 'error': 'Korxona topilmadi'}
+                    continue
+                sensor_rows.append(SensorData(company=target, gas_amount=gas_amount))
+                # Partiyadagi oxirgi o'qish korxonaning joriy qiymati bo'ladi
+                previous.setdefault(target.pk, (target.status, target.current_gas_amount > target.max_allowed_gas))
+                target.current_gas_amount = gas_amount
+                touched[target.pk] = target
+                transition = detector.observe(target, gas_amount)
+                if transition is not None:
+                    transitions.append(transition)
+                results[index] = {'index': index, 'status': 'accepted', 'company_id': target.pk}
+
+            if sensor_rows:
+                SensorData.objects.bulk_create(sensor_rows)
+                # Daqiqa/soat/kun agregatlarini yangilash
+                apply_readings(sensor_rows)
+
+                now = timezone.now()
+                for c in touched.values():
+                    c.status = c.calculate_status()
+                    c.updated_at = now
+                Company.objects.bulk_update(
+                    list(touched.values()), ['current_gas_amount', 'status', 'alert_level', 'updated_at']
+                )
+                emit_transitions(transitions)
+                publish_company_updates(touched.values())
+                # Dashboard hisoblagichlari faqat holat o'zgarganda eskiradi
+                if any(
+                    previous[c.pk] != (c.status, c.current_gas_amount > c.max_allowed_gas)
+                    for c in touched.values()
+                ):
+                    transaction.on_commit(invalidate_dashboard_stats)
+            accepted = len(sensor_rows)
+
+    return {
+        'accepted': accepted,
+        'rejected': len(readings) - accepted,
+        'results': results,
+    }
@@ -0,0 +1,203 @@
+# monitoring/instrumentation.py
+"""
+So'rovlar instrumentatsiyasi (ixtiyoriy, INSTRUMENTATION_ENABLED=True).
+
+InstrumentationMiddleware har bir so'rov uchun view nomi, SQL so'rovlar
+soni va vaqti (connection.execute_wrapper, DEBUG talab qilinmaydi), shablon
+render vaqti, umumiy vaqt va javob hajmini jarayon xotirasidagi halqa
+buferga (oxirgi INSTRUMENTATION_BUFFER_SIZE ta so'rov) yozadi. Shablon
+render() faqat instrumentatsiya yoqilganda (middleware yuklanganda) o'raladi.
+
+Ko'rish: /api/instrumentation/ (faqat staff) yoki instrumentation_report
+buyrug'i. Bufer har bir worker jarayoniga alohida.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+BUFFER_SIZE = getattr(settings, 'INSTRUMENTATION_BUFFER_SIZE', 5000)
+
+# contextvar: sync_to_async thread'lariga ham o'tadi (threading.local o'tmaydi)
+_current = ContextVar('instrumentation_collector', default=None)
+
+
+class RequestRecord:
+    __slots__ = ('view', 'method', 'status', 'queries', 'db_ms', 'render_ms', 'total_ms', 'size', 'at')
+
+    def __init__(self, view, method, status, queries, db_ms, render_ms, total_ms, size, at):
+        self.view = view
+        self.method = method
+        self.status = status
+        self.queries = queries
+        self.db_ms = db_ms
+        self.render_ms = render_ms
+        self.total_ms = total_ms
+        self.size = size
+        self.at = at
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class RingBuffer:
+    def __init__(self, size):
+        self._records = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def append(self, record):
+        with self._lock:
+            self._records.append(record)
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+buffer = RingBuffer(BUFFER_SIZE)
+
+
+class _Collector:
+    __slots__ = ('queries', 'db_seconds', 'render_seconds', 'started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - started
+
+
+def _patch_template_render():
+    """Django shablon backendi render() vaqtini joriy so'rov hisobiga qo'shadi (bir marta)."""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, '_instrumented', False):
+        return
+    original = Template.render
+
+    def render(self, *args, **kwargs):
+        collector = _current.get()
+        if collector is None:
+            return original(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            collector.render_seconds += time.perf_counter() - started
+
+    render._instrumented = True
+    Template.render = render
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return request.path
+    return match.view_name or match._func_path
+
+
+class InstrumentationMiddleware:
+    """Sync va async rejimda ishlaydi: ASGI ostida so'rovni thread pool'ga o'tkazmaydi."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        _patch_template_render()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        collector = _Collector()
+        token = _current.set(collector)
+        stack = _wrap_connections(collector)
+        try:
+            response = self.get_response(request)
+        finally:
+            stack.close()
+            _current.reset(token)
+        _record(request, response, collector)
+        return response
+
+    async def __acall__(self, request):
+        collector = _Collector()
+        token = _current.set(collector)
+        # connections thread-local: wrapper ORM ishlaydigan sync thread'da o'rnatiladi
+        stack = await sync_to_async(_wrap_connections)(collector)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _current.reset(token)
+        _record(request, response, collector)
+        return response
+
+
+def _wrap_connections(collector):
+    stack = ExitStack()
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(collector))
+    return stack
+
+
+def _record(request, response, collector):
+    total = time.perf_counter() - collector.started
+    buffer.append(RequestRecord(
+        view=_view_name(request),
+        method=request.method,
+        status=response.status_code,
+        queries=collector.queries,
+        db_ms=round(collector.db_seconds * 1000, 2),
+        render_ms=round(collector.render_seconds * 1000, 2),
+        total_ms=round(total * 1000, 2),
+        # Oqimli javoblar hajmi oldindan ma'lum emas
+        size=None if response.streaming else len(response.content),
+        at=time.time(),
+    ))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def summarize(records):
+    """View bo'yicha p50/p95/max ko'rsatkichlar, p95 umumiy vaqt bo'yicha kamayish tartibida."""
+    by_view = defaultdict(list)
+    for record in records:
+        by_view[record['view']].append(record)
+    rows = []
+    for view, items in by_view.items():
+        row = {'view': view, 'count': len(items)}
+        for field in ('queries', 'db_ms', 'render_ms', 'total_ms'):
+            values = [item[field] for item in items]
+            row[field] = {'p50': percentile(values, 50), 'p95': percentile(values, 95), 'max': max(values)}
+        sizes = [item['size'] for item in items if item['size'] is not None]
+        row['avg_size'] = round(sum(sizes) / len(sizes)) if sizes else None
+        rows.append(row)
+    rows.sort(key=lambda row: -row['total_ms']['p95'])
+    return rows
@@ -0,0 +1,143 @@
+# monitoring/live.py
+"""
+Jonli yangilanishlar (Server-Sent Events) uchun broker.
+
+Kanallar:
+- 'companies'      - barcha korxonalarning gaz/holat o'zgarishlari (ochiq ma'lumot)
+- 'region:<id>'    - faqat shu hududdagi korxonalar o'zgarishlari
+- 'company:<id>'   - korxona o'zgarishlari + uning jarimalari (faqat korxona egasi)
+- 'committee'      - jarimalar va statistika o'zgarishi (faqat qo'mita)
+
+Standart broker (InProcessBroker) bitta jarayon ichida ishlaydi. Bir nechta
+worker uchun LIVE_BROKER sozlamasida subscribe/unsubscribe/publish
+metodlariga ega boshqa klass (masalan Redis pub/sub) ko'rsatiladi.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Obunachi navbatining hajmi; sekin mijozda to'lib qolsa 'resync' yuboriladi
+QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, channels, loop):
+        self.channels = tuple(channels)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def put(self, event):
+        """Faqat obunachining event loop'ida chaqiriladi."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Mijoz ortda qoldi: navbatni tozalab, to'liq qayta yuklashni so'raymiz
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'type': 'resync'})
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class InProcessBroker:
+    """Jarayon ichidagi broker; publish() istalgan oqimdan (thread) chaqirilishi mumkin."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channels):
+        subscription = Subscription(channels, asyncio.get_running_loop())
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def has_subscribers(self):
+        with self._lock:
+            return bool(self._subscribers)
+
+    def publish(self, channels, event):
+        with self._lock:
+            targets = set()
+            for channel in channels:
+                targets.update(self._subscribers.get(channel, ()))
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # Loop yopilgan (mijoz uzilgan)
+                self.unsubscribe(subscription)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'LIVE_BROKER', 'monitoring.live.InProcessBroker')
+                _broker = import_string(path)()
+    return _broker
+
+
+def _publish_on_commit(channels, event):
+    broker = get_broker()
+    if broker.has_subscribers():
+        transaction.on_commit(lambda: broker.publish(channels, event))
+
+
+def company_event(company):
+    return {
+        'type': 'company',
+        'id': company.pk,
+        'region_id': company.region_id,
+        'current_gas_amount': company.current_gas_amount,
+        'max_allowed_gas': company.max_allowed_gas,
+        'status': company.status,
+    }
+
+
+def publish_company_updates(companies):
+    """Korxonalarning yangi gaz miqdori/holatini (tranzaksiya tugagach) yuboradi."""
+    for company in companies:
+        _publish_on_commit(
+            ('companies', f'region:{company.region_id}', f'company:{company.pk}'),
+            company_event(company),
+        )
+
+
+def publish_penalty_update(penalty):
+    _publish_on_commit(
+        ('committee', f'company:{penalty.company_id}'),
+        {
+            'type': 'penalty',
+            'id': penalty.pk,
+            'company_id': penalty.company_id,
+            'penalty_number': penalty.penalty_number,
+            'status': penalty.status,
+            'trees_required': penalty.trees_required,
+        },
+    )
+
+
+def publish_stats_changed(**kwargs):
+    """Dashboard hisoblagichlari o'zgardi - qo'mita sahifalari ularni qayta so'raydi."""
+    _publish_on_commit(('committee',), {'type': 'stats'})
@@ -0,0 +1,51 @@
+# monitoring/management/commands/apply_retention.py
+"""
+Sensor tarixini saqlash siyosatini qo'llaydi (cron orqali, masalan har kecha):
+    0 3 * * * python manage.py apply_retention --max-chunks 200
+"""
+from django.core.management.base import BaseCommand
+
+from monitoring.retention import apply_retention, get_policy
+
+
+class Command(BaseCommand):
+    help = "Eski xom sensor ma'lumotlarini agregatlarga o'tkazib, bo'laklab o'chiradi"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--raw-days', type=int, help="Xom o'qishlar necha kun saqlanadi")
+        parser.add_argument('--minute-days', type=int, help="Daqiqalik agregatlar necha kun saqlanadi")
+        parser.add_argument('--hour-days', type=int, help="Soatlik agregatlar necha kun saqlanadi")
+        parser.add_argument('--chunk-size', type=int, help="Bitta tranzaksiyada o'chiriladigan qatorlar soni")
+        parser.add_argument('--max-chunks', type=int,
+                            help="Har bir bosqichda ko'pi bilan shuncha bo'lak (qolgani keyingi safar)")
+        parser.add_argument('--dry-run', action='store_true', help="Hech narsa o'zgartirmasdan hisoblash")
+
+    def handle(self, *args, **options):
+        policy = get_policy(
+            RAW_DAYS=options['raw_days'], MINUTE_ROLLUP_DAYS=options['minute_days'],
+            HOUR_ROLLUP_DAYS=options['hour_days'], CHUNK_SIZE=options['chunk_size'],
+        )
+        self.stdout.write(
+            f"Siyosat: xom {policy['RAW_DAYS']} kun, daqiqalik agregat {policy['MINUTE_ROLLUP_DAYS']} kun, "
+            f"soatlik agregat {policy['HOUR_ROLLUP_DAYS'] or 'cheksiz'}, bo'lak {policy['CHUNK_SIZE']}"
+        )
+
+        report = apply_retention(
+            raw_days=options['raw_days'], minute_days=options['minute_days'],
+            hour_days=options['hour_days'], chunk_size=options['chunk_size'],
+            max_chunks=options['max_chunks'], dry_run=options['dry_run'],
+        )
+
+        prefix = "[dry-run] " if options['dry_run'] else ""
+        self.stdout.write(f"{prefix}Chegara (cutoff): {report['cutoff']}")
+        self.stdout.write(f"{prefix}Agregatlangan kunlar: {report['downsampled_days']} "
+                          f"({report['rollups_written']} ta agregat qatori)")
+        self.stdout.write(f"{prefix}O'chirilgan xom qatorlar: {report['raw_deleted']}")
+        self.stdout.write(f"{prefix}O'chirilgan daqiqalik agregatlar: {report['minute_rollups_deleted']}")
+        self.stdout.write(f"{prefix}O'chirilgan soatlik agregatlar: {report['hour_rollups_deleted']}")
+        if report['complete']:
+            self.stdout.write(self.style.SUCCESS("Retention yakunlandi"))
+        else:
+            self.stdout.write(self.style.WARNING(
+                "Bo'laklar chegarasiga yetildi, qolgan qatorlar keyingi ishga tushirishda qayta ishlanadi"
+            ))
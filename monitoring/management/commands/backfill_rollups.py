@@ -0,0 +1,66 @@
+# monitoring/management/commands/backfill_rollups.py
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from monitoring.models import SensorData
+from monitoring.rollups import GRANULARITIES, raw_history_start, rebuild_rollups
+from monitoring.summaries import invalidate_summaries
+
+
+class Command(BaseCommand):
+    help = "SensorRollup agregatlarini xom SensorData tarixidan qaytadan quradi"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--granularity', choices=GRANULARITIES + ('all',), default='all',
+            help="Qaysi agregat darajasini qurish (standart: all)",
+        )
+        parser.add_argument('--since', help="Boshlanish sanasi, YYYY-MM-DD (standart: eng eski o'qish)")
+        parser.add_argument('--until', help="Tugash sanasi, YYYY-MM-DD, kiritilmaydi (standart: bugun+1)")
+        parser.add_argument('--company', type=int, action='append', dest='companies',
+                            help="Faqat shu korxona(lar) uchun (bir necha marta berish mumkin)")
+
+    def _parse_date(self, value):
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f"Sana formati noto'g'ri: {value} (YYYY-MM-DD kutilgan)")
+
+    def handle(self, *args, **options):
+        granularities = GRANULARITIES if options['granularity'] == 'all' else (options['granularity'],)
+
+        raw = SensorData.objects.all()
+        if options['companies']:
+            raw = raw.filter(company_id__in=options['companies'])
+        bounds = raw.aggregate(first=Min('recorded_at'), last=Max('recorded_at'))
+        if bounds['first'] is None:
+            self.stdout.write("Sensor ma'lumotlari topilmadi")
+            return
+
+        since = self._parse_date(options['since']) if options['since'] else timezone.localtime(bounds['first']).date()
+        until = (
+            self._parse_date(options['until']) if options['until']
+            else timezone.localtime(bounds['last']).date() + datetime.timedelta(days=1)
+        )
+        if since >= until:
+            raise CommandError("--since --until dan oldin bo'lishi kerak")
+        history_start = raw_history_start()
+        if history_start is not None and since < timezone.localtime(history_start).date():
+            # Retention o'chirgan xom ma'lumotdan agregat qurilmaydi (mavjudlari saqlanadi)
+            since = timezone.localtime(history_start).date()
+            self.stdout.write(self.style.WARNING(
+                f"{since} dan oldingi xom ma'lumotlar retention bilan o'chirilgan, --since {since} ga surildi"
+            ))
+            if since >= until:
+                return
+
+        self.stdout.write(f"Agregatlar qurilmoqda: {since} .. {until} ({', '.join(granularities)})")
+        created = rebuild_rollups(since, until, granularities, company_ids=options['companies'])
+        self.stdout.write(self.style.SUCCESS(f"{created} ta agregat qatori yaratildi"))
+        # Shu davrlar uchun saqlangan korxona hisobotlari endi eskirgan
+        invalidated = invalidate_summaries(since, until, company_ids=options['companies'])
+        if invalidated:
+            self.stdout.write(f"{invalidated} ta davr ko'rsatkichi qayta hisoblanadi")
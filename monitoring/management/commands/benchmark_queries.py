@@ -0,0 +1,234 @@
+# monitoring/management/commands/benchmark_queries.py
+"""
+SensorData, Penalty va Notification "issiq" so'rovlari uchun benchmark.
+
+Misol (alohida benchmark bazasida ishga tushiring):
+    python manage.py benchmark_queries --sensor-rows 2000000 --compare
+
+--compare berilsa, Meta.indexes dagi indekslar vaqtincha o'chiriladi,
+so'rov rejalari (EXPLAIN) va kechikishlar o'lchanadi, keyin indekslar
+qayta yaratilib yana o'lchanadi.
+"""
+import datetime
+import random
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from monitoring.geo import encode as geohash_encode
+from monitoring.models import Company, IndustryType, Notification, Penalty, Region, SensorData
+
+BENCH_PREFIX = 'BENCH-'
+INDEXED_MODELS = (SensorData, Penalty, Notification)
+
+
+class Command(BaseCommand):
+    help = "Issiq so'rovlar uchun ma'lumot yaratib, EXPLAIN rejalari va kechikishlarni o'lchaydi"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=1000)
+        parser.add_argument('--sensor-rows', type=int, default=2_000_000)
+        parser.add_argument('--penalties', type=int, default=200_000)
+        parser.add_argument('--notifications', type=int, default=200_000)
+        parser.add_argument('--repeat', type=int, default=20, help="Har bir so'rov necha marta bajariladi")
+        parser.add_argument('--no-seed', action='store_true', help="Oldingi benchmark ma'lumotlaridan foydalanish")
+        parser.add_argument('--keep', action='store_true', help="Benchmark ma'lumotlarini o'chirmaslik")
+        parser.add_argument('--compare', action='store_true',
+                            help="Indekslarsiz (oldin) va indekslar bilan (keyin) solishtirish")
+
+    def handle(self, *args, **options):
+        if not options['no_seed']:
+            self.seed(options)
+
+        company_ids = list(
+            Company.objects.filter(name__startswith=BENCH_PREFIX).values_list('id', flat=True)
+        )
+        if not company_ids:
+            self.stderr.write("Benchmark korxonalari topilmadi (--no-seed'siz ishga tushiring)")
+            return
+        rng = random.Random(42)
+        sample_companies = [rng.choice(company_ids) for _ in range(options['repeat'])]
+
+        try:
+            if options['compare']:
+                self.stdout.write(self.style.MIGRATE_HEADING("\n=== OLDIN (indekslarsiz) ==="))
+                dropped = self.drop_indexes()
+                try:
+                    self.analyze()
+                    before = self.run_queries(sample_companies)
+                finally:
+                    self.create_indexes(dropped)
+                self.stdout.write(self.style.MIGRATE_HEADING("\n=== KEYIN (indekslar bilan) ==="))
+                self.analyze()
+                after = self.run_queries(sample_companies)
+                self.print_summary(before, after)
+            else:
+                self.analyze()
+                self.run_queries(sample_companies)
+        finally:
+            if not options['keep']:
+                self.cleanup()
+
+    # --- Ma'lumot yaratish ---
+    def seed(self, options):
+        self.cleanup()
+        rng = random.Random(1)
+        region = Region.objects.create(name=f'{BENCH_PREFIX}region')
+        industry = IndustryType.objects.create(name=f'{BENCH_PREFIX}industry')
+        coords = [(41.2 + rng.random() * 0.2, 69.1 + rng.random() * 0.3) for _ in range(options['companies'])]
+        companies = Company.objects.bulk_create([
+            Company(
+                name=f'{BENCH_PREFIX}{i:06d}',
+                stir_number=f'B{i:08d}',
+                region=region,
+                industry_type=industry,
+                latitude=lat,
+                longitude=lng,
+                geohash=geohash_encode(lat, lng),
+                max_allowed_gas=100,
+                current_gas_amount=rng.uniform(50, 150),
+            )
+            for i, (lat, lng) in enumerate(coords)
+        ], batch_size=1000)
+        company_ids = [c.pk for c in companies]
+        now = timezone.now()
+
+        def random_time():
+            return now - datetime.timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+
+        ops = connection.ops
+        self.bulk_insert(
+            SensorData, ['company', 'gas_amount', 'recorded_at'], options['sensor_rows'],
+            lambda: (rng.choice(company_ids), rng.uniform(0, 200), ops.adapt_datetimefield_value(random_time())),
+        )
+        self.bulk_insert(
+            Penalty,
+            [
+                'company', 'mode', 'excess_amount', 'trees_required', 'exceed_hours', 'status', 'deadline',
+                'created_at', 'penalty_number',
+            ],
+            options['penalties'],
+            lambda: (
+                rng.choice(company_ids),
+                'instant',
+                ops.adapt_decimalfield_value(Decimal('12.5'), 10, 3),
+                125,
+                0,
+                rng.choice(('active', 'completed', 'cancelled')),
+                ops.adapt_datefield_value(now.date()),
+                ops.adapt_datetimefield_value(random_time()),
+                f"BEN-{uuid.uuid4().hex[:12].upper()}",
+            ),
+        )
+        self.bulk_insert(
+            Notification, ['company', 'message', 'is_read', 'created_at'], options['notifications'],
+            lambda: (rng.choice(company_ids), 'Benchmark', rng.random() < 0.7,
+                     ops.adapt_datetimefield_value(random_time())),
+        )
+
+    def bulk_insert(self, model, field_names, total, make_row, batch_size=20_000):
+        fields = [model._meta.get_field(name) for name in field_names]
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(f.column) for f in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        sql = f'INSERT INTO {table} ({columns}) VALUES ({placeholders})'
+        started = time.perf_counter()
+        done = 0
+        while done < total:
+            count = min(batch_size, total - done)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, [make_row() for _ in range(count)])
+            done += count
+        self.stdout.write(f"{model.__name__}: {total} qator ({time.perf_counter() - started:.1f} s)")
+
+    def cleanup(self):
+        ids = list(Company.objects.filter(name__startswith=BENCH_PREFIX).values_list('id', flat=True))
+        if ids:
+            with connection.cursor() as cursor:
+                for model in INDEXED_MODELS:
+                    for start in range(0, len(ids), 500):
+                        chunk = ids[start:start + 500]
+                        cursor.execute(
+                            f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)} "
+                            f"WHERE company_id IN ({', '.join(['%s'] * len(chunk))})",
+                            chunk,
+                        )
+            Company.objects.filter(id__in=ids).delete()
+        Region.objects.filter(name__startswith=BENCH_PREFIX).delete()
+        IndustryType.objects.filter(name__startswith=BENCH_PREFIX).delete()
+
+    # --- Indekslar ---
+    def existing_index_names(self, model):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(cursor, model._meta.db_table))
+
+    def drop_indexes(self):
+        dropped = []
+        with connection.schema_editor() as editor:
+            for model in INDEXED_MODELS:
+                existing = self.existing_index_names(model)
+                for index in model._meta.indexes:
+                    if index.name in existing:
+                        editor.remove_index(model, index)
+                        dropped.append((model, index))
+        self.stdout.write(f"{len(dropped)} ta indeks vaqtincha o'chirildi")
+        return dropped
+
+    def create_indexes(self, dropped):
+        with connection.schema_editor() as editor:
+            for model, index in dropped:
+                editor.add_index(model, index)
+        self.stdout.write(f"{len(dropped)} ta indeks qayta yaratildi")
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    # --- O'lchash ---
+    def queries(self):
+        today = timezone.localdate()
+        month_start = timezone.make_aware(datetime.datetime.combine(today.replace(day=1), datetime.time.min))
+        day_start = timezone.make_aware(datetime.datetime.combine(today - datetime.timedelta(days=100), datetime.time.min))
+        day_end = day_start + datetime.timedelta(days=1)
+        return [
+            ('company_dashboard: oxirgi sensor', lambda cid: SensorData.objects.filter(company_id=cid).order_by('-recorded_at')[:10]),
+            ('company_sensor_data: eng oxirgi', lambda cid: SensorData.objects.filter(company_id=cid).order_by('-recorded_at')[:1]),
+            ('company_notifications', lambda cid: Notification.objects.filter(company_id=cid).order_by('-created_at')[:10]),
+            ("o'qilmaganlar soni", lambda cid: Notification.objects.filter(company_id=cid, is_read=False).values('id')),
+            ('company_dashboard: faol jarimalar', lambda cid: Penalty.objects.filter(company_id=cid, status='active')),
+            ('company_penalties', lambda cid: Penalty.objects.filter(company_id=cid).order_by('-created_at')),
+            ('penalties: status filtr', lambda cid: Penalty.objects.filter(status='active').order_by('-created_at')[:50]),
+            ('dashboard: oxirgi jarimalar', lambda cid: Penalty.objects.order_by('-created_at')[:10]),
+            ('download_report: davr jarimalari', lambda cid: Penalty.objects.filter(created_at__gte=month_start).order_by('-created_at')),
+            ('rebuild_rollups/retention: kunlik oyna', lambda cid: SensorData.objects.filter(recorded_at__gte=day_start, recorded_at__lt=day_end).values('id')),
+        ]
+
+    def run_queries(self, sample_companies):
+        results = {}
+        for label, build in self.queries():
+            plan = build(sample_companies[0]).explain()
+            timings = []
+            for cid in sample_companies:
+                qs = build(cid)
+                started = time.perf_counter()
+                list(qs)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            median = statistics.median(timings)
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            results[label] = median
+            self.stdout.write(self.style.SUCCESS(f"\n{label}: median {median:.2f} ms, p95 {p95:.2f} ms"))
+            for line in plan.splitlines():
+                self.stdout.write(f"    {line}")
+        return results
+
+    def print_summary(self, before, after):
+        self.stdout.write(self.style.MIGRATE_HEADING("\n=== Xulosa (median, ms) ==="))
+        for label in before:
+            speedup = before[label] / after[label] if after[label] else float('inf')
+            self.stdout.write(f"{label:40s} {before[label]:10.2f} -> {after[label]:10.2f}  (x{speedup:.1f})")
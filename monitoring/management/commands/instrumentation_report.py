@@ -0,0 +1,71 @@
+# monitoring/management/commands/instrumentation_report.py
+"""
+Instrumentatsiya buferi bo'yicha view foizlari (p50/p95/max) jadvali.
+
+Bufer har bir worker jarayoni xotirasida, shuning uchun ma'lumot ishlayotgan
+serverning /api/instrumentation/ endpointidan olinadi:
+    python manage.py instrumentation_report --url https://host/api/instrumentation/ --session <sessionid>
+yoki oldin saqlangan javobdan:
+    python manage.py instrumentation_report --file instrumentation.json
+"""
+import json
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.instrumentation import summarize
+
+
+class Command(BaseCommand):
+    help = "View bo'yicha SQL soni, DB/render/umumiy vaqt foizlarini chiqaradi"
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--url', help="/api/instrumentation/ manzili")
+        source.add_argument('--file', help="Endpoint javobi saqlangan JSON fayl")
+        parser.add_argument('--session', help="Staff foydalanuvchining sessionid cookie qiymati")
+        parser.add_argument('--view', help="Faqat shu view")
+        parser.add_argument('--top', type=int, default=20, help="Eng sekin N ta view")
+
+    def handle(self, *args, **options):
+        payload = self.load(options)
+        records = payload.get('records')
+        if records:
+            if options['view']:
+                records = [r for r in records if r['view'] == options['view']]
+            rows = summarize(records)
+        else:
+            rows = [r for r in payload.get('views', []) if not options['view'] or r['view'] == options['view']]
+        if not rows:
+            self.stdout.write("Yozuvlar yo'q (INSTRUMENTATION_ENABLED yoqilganmi?)")
+            return
+
+        self.stdout.write(
+            f"{'view':<40} {'soni':>6} {'sql p50/p95/max':>16} {'db ms p95':>10} "
+            f"{'render p95':>11} {'jami p50':>9} {'jami p95':>9} {'jami max':>9} {'hajm':>8}"
+        )
+        for row in rows[:options['top']]:
+            q = row['queries']
+            self.stdout.write(
+                f"{row['view'][:40]:<40} {row['count']:>6} "
+                f"{q['p50']:>5}/{q['p95']:>4}/{q['max']:>5} {row['db_ms']['p95']:>10.1f} "
+                f"{row['render_ms']['p95']:>11.1f} {row['total_ms']['p50']:>9.1f} "
+                f"{row['total_ms']['p95']:>9.1f} {row['total_ms']['max']:>9.1f} {row['avg_size'] or '-':>8}"
+            )
+
+    def load(self, options):
+        if options['file']:
+            with open(options['file'], encoding='utf-8') as f:
+                return json.load(f)
+        url = options['url']
+        # Xom yozuvlar bilan: foizlar --view bo'yicha ham qayta hisoblanadi
+        separator = '&' if '?' in url else '?'
+        request = urllib.request.Request(f"{url}{separator}records={settings.INSTRUMENTATION_BUFFER_SIZE}")
+        if options['session']:
+            request.add_header('Cookie', f"{settings.SESSION_COOKIE_NAME}={options['session']}")
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return json.load(response)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Endpointdan o'qib bo'lmadi: {e}")
@@ -0,0 +1,104 @@
+# monitoring/management/commands/loadtest_login.py
+"""
+Bir vaqtda ko'p login (smena boshidagi "login bo'roni") uchun yuklama testi.
+
+Misol (alohida test bazasida ishga tushiring):
+    python manage.py loadtest_login --users 200 --concurrency 20 --logins 1000
+
+Vaqtinchalik foydalanuvchilar (LOADTEST- prefiksi) yaratiladi, login_view
+ga STIR / employee_id bilan POST so'rovlar parallel yuboriladi va
+p50/p95/p99 kechikish hamda bitta login uchun SQL so'rovlar soni chiqariladi.
+Kechikishning asosiy qismi - parolni xeshlash (PASSWORD_HASHERS).
+"""
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from monitoring.instrumentation import percentile
+from monitoring.models import User
+
+LOADTEST_PREFIX = 'LOADTEST-'
+PASSWORD = 'loadtest-parol'
+
+
+class Command(BaseCommand):
+    help = "Parallel loginlar uchun p50/p95/p99 kechikishni o'lchaydi"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--logins', type=int, default=1000, help="Jami login urinishlari")
+        parser.add_argument('--keep', action='store_true', help="Test foydalanuvchilarini o'chirmaslik")
+
+    def handle(self, *args, **options):
+        credentials = self.seed(options['users'])
+        rng = random.Random(7)
+        attempts = [rng.choice(credentials) for _ in range(options['logins'])]
+        url = reverse('login')
+        try:
+            # Test mijozi 'testserver' xostidan foydalanadi
+            with override_settings(ALLOWED_HOSTS=['*']):
+                self.report_queries(url, credentials[0])
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                    results = list(pool.map(lambda attempt: self.login(url, attempt), attempts))
+                elapsed = time.perf_counter() - started
+        finally:
+            if not options['keep']:
+                self.cleanup()
+
+        latencies = [ms for ms, ok in results]
+        failed = sum(1 for ms, ok in results if not ok)
+        self.stdout.write(
+            f"{len(results)} login, {options['concurrency']} parallel: {len(results) / elapsed:.1f} login/s, "
+            f"p50 {percentile(latencies, 50):.1f} ms, p95 {percentile(latencies, 95):.1f} ms, "
+            f"p99 {percentile(latencies, 99):.1f} ms, o'rtacha {statistics.mean(latencies):.1f} ms"
+        )
+        if failed:
+            self.stderr.write(f"{failed} ta login muvaffaqiyatsiz")
+
+    def seed(self, count):
+        self.cleanup()
+        # Parol bir marta xeshlanadi (yaratish tez bo'lsin), tekshiruv esa har loginda
+        password_hash = make_password(PASSWORD)
+        users = []
+        for i in range(count):
+            factory = i % 2 == 0
+            users.append(User(
+                username=f'{LOADTEST_PREFIX}{i:05d}',
+                password=password_hash,
+                user_type='factory' if factory else 'committee',
+                stir_number=f'L{i:08d}' if factory else None,
+                employee_id=None if factory else f'{LOADTEST_PREFIX}E{i:05d}',
+            ))
+        User.objects.bulk_create(users, batch_size=1000)
+        return [
+            (u.user_type, u.stir_number if u.user_type == 'factory' else u.employee_id)
+            for u in users
+        ]
+
+    def login(self, url, attempt):
+        user_type, identifier = attempt
+        client = Client()
+        started = time.perf_counter()
+        response = client.post(url, {'username': identifier, 'password': PASSWORD, 'user_type': user_type})
+        return (time.perf_counter() - started) * 1000, response.status_code == 302
+
+    def report_queries(self, url, attempt):
+        user_type, identifier = attempt
+        with CaptureQueriesContext(connection) as queries:
+            Client().post(url, {'username': identifier, 'password': PASSWORD, 'user_type': user_type})
+        self.stdout.write(f"Bitta login: {len(queries)} ta SQL so'rov")
+        for query in queries.captured_queries:
+            self.stdout.write(f"  {query['sql'][:140]}")
+
+    def cleanup(self):
+        User.objects.filter(username__startswith=LOADTEST_PREFIX).delete()
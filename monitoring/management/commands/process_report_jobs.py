@@ -0,0 +1,61 @@
+# monitoring/management/commands/process_report_jobs.py
+"""
+Hisobot navbatini (ReportJob) bajaruvchi worker:
+    python manage.py process_report_jobs --workers 4
+
+--once: navbatdagi barcha ishlarni bajarib chiqadi va to'xtaydi (cron/test uchun).
+Bir nechta serverda parallel ishga tushirish mumkin.
+"""
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from monitoring.reports import claim_next_job, run_job, worker_name
+
+
+class Command(BaseCommand):
+    help = "Navbatdagi hisobotlarni yaratadi"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help="Parallel oqimlar soni")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Navbat bo'sh bo'lsa kutish (soniya)")
+        parser.add_argument('--once', action='store_true', help="Navbat bo'shagach to'xtash")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self.work, args=(f"{worker_name()}:{i}", options, stop), daemon=True)
+            for i in range(max(1, options['workers']))
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()
+            self.stdout.write("To'xtatilmoqda, joriy ishlar tugashi kutilmoqda...")
+            for thread in threads:
+                thread.join()
+
+    def work(self, name, options, stop):
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                job = claim_next_job(name)
+                if job is None:
+                    if options['once']:
+                        return
+                    stop.wait(options['poll_interval'])
+                    continue
+                started = time.perf_counter()
+                status = run_job(job)
+                owner = job.company.name if job.company_id else "qo'mita"
+                self.stdout.write(
+                    f"[{name}] #{job.id} {job.period} ({owner}): {status}, {time.perf_counter() - started:.1f} s"
+                )
+        finally:
+            connection.close()
@@ -0,0 +1,31 @@
+# monitoring/management/commands/rebuild_search_index.py
+"""
+Korxonalar qidiruv indeksini (search_text va 3-gramlar) qaytadan quradi:
+    python manage.py rebuild_search_index
+
+Korxonalar bulk_create/bulk_update yoki to'g'ridan-to'g'ri SQL bilan
+yozilganda (signal ishlamaganda) ishga tushiring.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from monitoring.models import Company
+from monitoring.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Korxonalar qidiruv indeksini qaytadan quradi"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--region', type=int, help="Faqat shu hudud (id) korxonalari")
+
+    def handle(self, *args, **options):
+        queryset = Company.objects.all()
+        if options['region']:
+            queryset = queryset.filter(region_id=options['region'])
+        started = time.perf_counter()
+        total = rebuild_search_index(queryset)
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} ta korxona indekslandi ({time.perf_counter() - started:.1f} s)"
+        ))
@@ -0,0 +1,20 @@
+# monitoring/management/commands/take_status_snapshots.py
+"""
+Korxona holatlarining kunlik snapshot'ini yozadi (cron, masalan har soatda):
+    5 * * * * python manage.py take_status_snapshots
+"""
+from django.core.management.base import BaseCommand
+
+from monitoring.snapshots import take_status_snapshot
+
+
+class Command(BaseCommand):
+    help = "Bugungi korxona holatlari snapshot'ini yozadi yoki yangilaydi"
+
+    def handle(self, *args, **options):
+        snapshot = take_status_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f"{snapshot.date}: jami {snapshot.total_companies}, yaxshi {snapshot.good_count}, "
+            f"o'rtacha {snapshot.moderate_count}, xavfli {snapshot.bad_count}, "
+            f"me'yordan oshgan {snapshot.dangerous_count}"
+        ))
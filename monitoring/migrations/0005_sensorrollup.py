@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0004_alter_penalty_excess_amount_delete_penaltyresponse'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('minute', 'Daqiqa'), ('hour', 'Soat'), ('day', 'Kun')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('gas_sum', models.FloatField(default=0)),
+                ('gas_min', models.FloatField(blank=True, null=True)),
+                ('gas_max', models.FloatField(blank=True, null=True)),
+                ('exceed_count', models.PositiveIntegerField(default=0)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='monitoring.company')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('company', 'granularity', 'bucket_start'), name='unique_sensor_rollup_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0005_sensorrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['company', '-created_at'], name='notif_company_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['company'], name='notification_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='penalty',
+            index=models.Index(fields=['status', '-created_at'], name='penalty_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='penalty',
+            index=models.Index(fields=['created_at'], name='penalty_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='penalty',
+            index=models.Index(fields=['company', '-created_at'], name='penalty_company_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='penalty',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['company'], name='penalty_company_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sensordata',
+            index=models.Index(fields=['company', '-recorded_at'], name='sensor_company_recent_idx'),
+        ),
+    ]
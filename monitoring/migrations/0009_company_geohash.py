@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:31
+
+from django.db import migrations, models
+
+from monitoring.geo import encode
+
+
+def fill_geohash(apps, schema_editor):
+    Company = apps.get_model('monitoring', 'Company')
+    companies = list(Company.objects.only('id', 'latitude', 'longitude'))
+    for company in companies:
+        company.geohash = encode(company.latitude, company.longitude)
+    Company.objects.bulk_update(companies, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0008_companystatussnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='geohash',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
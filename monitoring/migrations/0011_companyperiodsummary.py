@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0010_report_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyPeriodSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_type', models.CharField(choices=[('monthly', 'Oylik'), ('quarterly', 'Choraklik'), ('yearly', 'Yillik')], max_length=20)),
+                ('period', models.CharField(max_length=50)),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('gas_sum', models.FloatField(default=0)),
+                ('gas_min', models.FloatField(blank=True, null=True)),
+                ('gas_max', models.FloatField(blank=True, null=True)),
+                ('exceed_count', models.PositiveIntegerField(default=0)),
+                ('exceed_hours', models.PositiveIntegerField(default=0)),
+                ('penalty_count', models.PositiveIntegerField(default=0)),
+                ('penalty_trees', models.PositiveIntegerField(default=0)),
+                ('penalty_excess', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('is_final', models.BooleanField(default=False)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='monitoring.company')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('company', 'report_type', 'period'), name='unique_company_period_summary')],
+            },
+        ),
+    ]
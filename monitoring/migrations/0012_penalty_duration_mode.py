@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:43
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0011_companyperiodsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='penalty',
+            name='exceed_hours',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='penalty',
+            name='mode',
+            field=models.CharField(choices=[('instant', "Joriy o'lchov bo'yicha"), ('duration', "Oshish davomiyligi bo'yicha")], default='instant', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='penalty',
+            name='window_end',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='penalty',
+            name='window_start',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sensorrollup',
+            name='exceed_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='penalty',
+            name='excess_amount',
+            field=models.DecimalField(decimal_places=3, default=Decimal('0.0'), editable=False, help_text="Avtomatik hisoblanadi: instant - current_gas_amount - max_allowed_gas (kg/soat), duration - oynadagi soatlik ortiqchalar yig'indisi (kg).", max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.0'))]),
+        ),
+    ]
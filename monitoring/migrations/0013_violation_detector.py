@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:45
+
+from django.db import migrations, models
+
+
+def fill_alert_level(apps, schema_editor):
+    # Mavjud korxonalar uchun detektor joriy holatdan boshlaydi
+    Company = apps.get_model('monitoring', 'Company')
+    Company.objects.update(alert_level=models.F('status'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0012_penalty_duration_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='alert_level',
+            field=models.CharField(choices=[('good', 'Yaxshi'), ('moderate', "O'rtacha"), ('bad', 'Xavfli')], default='good', editable=False, max_length=20),
+        ),
+        migrations.RunPython(fill_alert_level, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='penalty',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Qoralama'), ('active', 'Faol'), ('completed', 'Bajarilgan'), ('cancelled', 'Bekor qilingan')], default='active', max_length=20),
+        ),
+    ]
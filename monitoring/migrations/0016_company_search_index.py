@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from monitoring.textindex import company_search_text, trigrams
+
+
+def fill_search_index(apps, schema_editor):
+    Company = apps.get_model('monitoring', 'Company')
+    CompanySearchTrigram = apps.get_model('monitoring', 'CompanySearchTrigram')
+    companies = list(Company.objects.select_related('region').only('id', 'name', 'stir_number', 'region__name'))
+    grams = []
+    for company in companies:
+        company.search_text = company_search_text(company.name, company.stir_number, company.region.name)
+        grams.extend(CompanySearchTrigram(company_id=company.pk, gram=gram) for gram in trigrams(company.search_text))
+    Company.objects.bulk_update(companies, ['search_text'], batch_size=1000)
+    CompanySearchTrigram.objects.bulk_create(grams, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0015_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='search_text',
+            field=models.CharField(default='', editable=False, max_length=400),
+        ),
+        migrations.CreateModel(
+            name='CompanySearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=3)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_trigrams', to='monitoring.company')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['gram', 'company'], name='trigram_gram_company_idx')],
+            },
+        ),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:53
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def blank_identifiers_to_null(apps, schema_editor):
+    # '' unique indeksda takrorlanadi; takroriy identifikatorlar qo'lda tuzatilishi kerak
+    User = apps.get_model('monitoring', 'User')
+    for field in ('employee_id', 'stir_number'):
+        User.objects.filter(**{field: ''}).update(**{field: None})
+        duplicates = list(
+            User.objects.exclude(**{f'{field}__isnull': True})
+            .values(field).annotate(n=Count('id')).filter(n__gt=1).values_list(field, flat=True)
+        )
+        if duplicates:
+            raise RuntimeError(f"User.{field} takrorlanadi: {', '.join(duplicates[:20])}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0016_company_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(blank_identifiers_to_null, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='user',
+            name='employee_id',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='stir_number',
+            field=models.CharField(blank=True, max_length=9, null=True, unique=True),
+        ),
+    ]
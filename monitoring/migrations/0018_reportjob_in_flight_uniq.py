@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:13
+
+from django.db import migrations, models
+
+
+def fail_duplicate_jobs(apps, schema_editor):
+    # bir xil hisobot uchun eng eski ish qoladi, qolganlari 'failed'
+    ReportJob = apps.get_model('monitoring', 'ReportJob')
+    seen = set()
+    jobs = ReportJob.objects.filter(status__in=('pending', 'running')).order_by('created_at', 'id')
+    for job in jobs:
+        key = (job.company_id, job.report_type, job.period)
+        if key in seen:
+            ReportJob.objects.filter(pk=job.pk).update(status='failed', error='Takroriy ish')
+        seen.add(key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0017_unique_login_identifiers'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reportjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('company__isnull', False), ('status__in', ('pending', 'running'))), fields=('company', 'report_type', 'period'), name='reportjob_in_flight_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='reportjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('company__isnull', True), ('status__in', ('pending', 'running'))), fields=('report_type', 'period'), name='reportjob_committee_in_flight_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0018_reportjob_in_flight_uniq'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='company',
+            name='search_text',
+            field=models.TextField(default='', editable=False),
+        ),
+    ]
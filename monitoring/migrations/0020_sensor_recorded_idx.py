@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0019_company_search_text_textfield'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sensordata',
+            index=models.Index(fields=['recorded_at'], name='sensor_recorded_idx'),
+        ),
+    ]
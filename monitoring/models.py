@@ -2,6 +2,12 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 import uuid
 
+from .geo import encode as geohash_encode
+from .textindex import company_search_text
+from .penalty_rules import (
+    TREES_PER_KG_PER_HOUR, integrated_excess, milli_to_decimal, penalty_amounts, to_milli, trees_needed,
+)
+
 class User(AbstractUser):
     USER_TYPE_CHOICES = (
         ('committee', 'Qo\'mita'),
@@ -9,11 +15,18 @@ class User(AbstractUser):
     )
     
     user_type = models.CharField(max_length=20, choices=USER_TYPE_CHOICES, default='factory')
-    employee_id = models.CharField(max_length=50, blank=True, null=True)
-    stir_number = models.CharField(max_length=9, blank=True, null=True)
+    # Login identifikatorlari (CustomAuthBackend): yagona indeks, bo'sh qiymat NULL
+    employee_id = models.CharField(max_length=50, blank=True, null=True, unique=True)
+    stir_number = models.CharField(max_length=9, blank=True, null=True, unique=True)
     company = models.ForeignKey('Company', on_delete=models.CASCADE, null=True, blank=True)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     
+    def save(self, *args, **kwargs):
+        # '' unique indeksda takrorlanadi - NULL sifatida saqlanadi
+        self.employee_id = self.employee_id or None
+        self.stir_number = self.stir_number or None
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.username} - {self.get_user_type_display()}"
 
@@ -42,13 +55,26 @@ class Company(models.Model):
     industry_type = models.ForeignKey(IndustryType, on_delete=models.CASCADE)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    # latitude/longitude dan save() da hisoblanadi (xarita oynasi so'rovlari uchun)
+    geohash = models.CharField(max_length=12, db_index=True, editable=False, default='')
+    # nom + STIR + hudud, normallashtirilgan (monitoring/textindex.py); 3-gramlari CompanySearchTrigram da
+    # TextField: kirill transliteratsiyasi (ш -> sh, ...) matnni uzaytiradi, uzunlik cheklanmaydi
+    search_text = models.TextField(editable=False, default='')
     max_allowed_gas = models.FloatField(default=100)  # kg/soat
     current_gas_amount = models.FloatField(default=0)  # kg/soat
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='good')
+    # Qoidabuzarlik detektori tasdiqlagan daraja (monitoring/detector.py)
+    alert_level = models.CharField(max_length=20, choices=STATUS_CHOICES, default='good', editable=False)
     sensor_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # companies: keyset sahifalash (name, id)
+            models.Index(fields=['name', 'id'], name='company_name_id_idx'),
+        ]
+    
     def __str__(self):
         return self.name
     
@@ -69,32 +95,70 @@ class Company(models.Model):
     def save(self, *args, **kwargs):
         # saqlashdan oldin statusni avtomatik yangilash
         self.status = self.calculate_status()
+        self.geohash = geohash_encode(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'name', 'stir_number', 'region'} & set(update_fields):
+            self.search_text = company_search_text(self.name, self.stir_number, self.region.name)
+        if update_fields is not None:
+            extra = set()
+            if {'latitude', 'longitude'} & set(update_fields):
+                extra.add('geohash')
+            if {'name', 'stir_number', 'region'} & set(update_fields):
+                extra.add('search_text')
+            if extra:
+                kwargs['update_fields'] = {*update_fields, *extra}
         super().save(*args, **kwargs)
     
 
+class CompanySearchTrigram(models.Model):
+    """Company.search_text ning 3-gramlari: qidiruv indeksi (monitoring/search.py)."""
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='search_trigrams')
+    gram = models.CharField(max_length=3)
+
+    class Meta:
+        indexes = [
+            # search_companies: gram IN (...) GROUP BY company - faqat indeksdan o'qiladi
+            models.Index(fields=['gram', 'company'], name='trigram_gram_company_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.company_id}: {self.gram!r}"
+
+
 
 # monitoring/models.py
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
 from decimal import Decimal, InvalidOperation
+import datetime
 import uuid
-import math
 
 # ... (User, Region, IndustryType, Company modelleri sizda mavjud bo'lishi kerak)
 
 def generate_penalty_number():
     return f"PEN-{uuid.uuid4().hex[:8].upper()}"
 
-# Har 1 kg/soat oshish uchun daraxtlar soni (Decimal ishlatamiz)
-TREES_PER_KG_PER_HOUR = Decimal('10')
+# Daraxt me'yori va hisob qoidalari: monitoring/penalty_rules.py
+
+# duration rejimida oyna berilmasa: oxirgi N kun
+PENALTY_WINDOW_DAYS = getattr(settings, 'PENALTY_DURATION_WINDOW_DAYS', 30)
 
 class Penalty(models.Model):
     STATUS_CHOICES = (
+        # detektor yaratgan, qo'mita tasdiqlashini kutayotgan jarima
+        ('draft', 'Qoralama'),
         ('active', 'Faol'),
         ('completed', 'Bajarilgan'),
         ('cancelled', 'Bekor qilingan'),
     )
+    MODE_CHOICES = (
+        ('instant', 'Joriy o\'lchov bo\'yicha'),
+        ('duration', 'Oshish davomiyligi bo\'yicha'),
+    )
 
     company = models.ForeignKey('Company', on_delete=models.CASCADE)
 
@@ -105,17 +169,37 @@ class Penalty(models.Model):
         default=Decimal('0.0'),
         validators=[MinValueValidator(Decimal('0.0'))],
         editable=False,
-        help_text="Avtomatik hisoblanadi: current_gas_amount - max_allowed_gas (kg/soat)."
+        help_text="Avtomatik hisoblanadi: instant - current_gas_amount - max_allowed_gas (kg/soat), "
+                  "duration - oynadagi soatlik ortiqchalar yig'indisi (kg)."
     )
 
     # trees_required avtomatik hisoblanadi, admin tahrirlay olmaydi
     trees_required = models.IntegerField(editable=False, default=0)
 
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, default='instant')
+    # duration rejimi: [window_start, window_end) oralig'idagi soatlik agregatlar
+    window_start = models.DateTimeField(null=True, blank=True)
+    window_end = models.DateTimeField(null=True, blank=True)
+    # Oynada me'yordan oshgan soatlar soni (duration rejimi)
+    exceed_hours = models.PositiveIntegerField(editable=False, default=0)
+
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     deadline = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
     penalty_number = models.CharField(max_length=20, unique=True, default=generate_penalty_number)
 
+    class Meta:
+        indexes = [
+            # penalties, dashboard: status bo'yicha filtr + eng yangilari
+            models.Index(fields=['status', '-created_at'], name='penalty_status_created_idx'),
+            # download_report: created_at oralig'i
+            models.Index(fields=['created_at'], name='penalty_created_idx'),
+            # company_penalties: korxona jarimalari, eng yangilari
+            models.Index(fields=['company', '-created_at'], name='penalty_company_recent_idx'),
+            # company_dashboard: korxonaning faol jarimalari
+            models.Index(fields=['company'], condition=models.Q(status='active'), name='penalty_company_active_idx'),
+        ]
+
     def __str__(self):
         return f"Jarima #{self.penalty_number} - {self.company.name}"
 
@@ -123,17 +207,15 @@ class Penalty(models.Model):
         """
         company.current_gas_amount - company.max_allowed_gas
         Agar natija manfiy bo'lsa -> 0
+        duration rejimida - duration_totals() dagi ortiqcha kg.
         """
+        if self.mode == 'duration':
+            return self.duration_totals()['excess']
         try:
-            cur = Decimal(str(self.company.current_gas_amount))
-            allowed = Decimal(str(self.company.max_allowed_gas))
-        except (InvalidOperation, TypeError, AttributeError):
-            return Decimal('0.0')
-        diff = cur - allowed
-        if diff <= Decimal('0'):
+            excess, _ = penalty_amounts(self.company.current_gas_amount, self.company.max_allowed_gas)
+        except (TypeError, AttributeError):
             return Decimal('0.0')
-        # Round to the same decimal_places we use (3)
-        return diff.quantize(Decimal('0.001'))
+        return excess
 
     def calculate_trees_required(self) -> int:
         """
@@ -141,26 +223,49 @@ class Penalty(models.Model):
         Agar excess_amount 0 bo'lsa 0 qaytaradi.
         """
         try:
-            amt = Decimal(self.excess_amount)
+            return trees_needed(Decimal(self.excess_amount))
         except (InvalidOperation, TypeError):
             return 0
-        if amt <= Decimal('0'):
-            return 0
-        trees = math.ceil(float(amt * TREES_PER_KG_PER_HOUR))
-        return max(0, int(trees))
+
+    def duration_totals(self):
+        """
+        Oynadagi soatlik agregatlardan (xom SensorData o'qilmaydi) bitta so'rov:
+        {'excess': ortiqcha kg (Decimal), 'hours': oshgan soatlar soni}.
+        """
+        totals = SensorRollup.objects.filter(
+            company_id=self.company_id,
+            granularity='hour',
+            bucket_start__gte=self.window_start,
+            bucket_start__lt=self.window_end,
+            exceed_count__gt=0,
+        ).aggregate(excess=integrated_excess(), hours=Count('id'))
+        return {
+            'excess': milli_to_decimal(max(0, to_milli(totals['excess'] or 0))),
+            'hours': totals['hours'],
+        }
 
     def save(self, *args, **kwargs):
-        # 1) excess_amountni avtomatik hisoblash (company ma'lumotidan)
-        if self.company_id:  # company mavjud bo'lsa
-            self.excess_amount = self.compute_excess_amount()
-        else:
-            # Agar company tanlanmagan bo'lsa, default 0
-            self.excess_amount = Decimal('0.0')
+        if self.mode == 'duration':
+            if self.window_end is None:
+                self.window_end = timezone.now()
+            if self.window_start is None:
+                self.window_start = self.window_end - datetime.timedelta(days=PENALTY_WINDOW_DAYS)
 
-        # 2) trees_requiredni hisoblash
-        self.trees_required = self.calculate_trees_required()
+        # 1) excess_amount va trees_required faqat yaratilganda hisoblanadi:
+        # keyingi saqlashlar (status, muddat) yozilgan miqdorni o'zgartirmaydi
+        if self._state.adding:
+            if not self.company_id:
+                # Agar company tanlanmagan bo'lsa, default 0
+                self.excess_amount = Decimal('0.0')
+            elif self.mode == 'duration':
+                totals = self.duration_totals()
+                self.excess_amount = totals['excess']
+                self.exceed_hours = totals['hours']
+            else:
+                self.excess_amount = self.compute_excess_amount()
+            self.trees_required = self.calculate_trees_required()
 
-        # 3) penalty_number zaxira
+        # 2) penalty_number zaxira
         if not self.penalty_number:
             self.penalty_number = generate_penalty_number()
 
@@ -174,18 +279,176 @@ class SensorData(models.Model):
     gas_amount = models.FloatField()
     recorded_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            # company_dashboard, company_sensor_data: korxonaning oxirgi o'qishlari
+            models.Index(fields=['company', '-recorded_at'], name='sensor_company_recent_idx'),
+            # retention va agregatlarni qayta qurish: barcha korxonalar bo'yicha vaqt oralig'i
+            models.Index(fields=['recorded_at'], name='sensor_recorded_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.company.name} - {self.gas_amount}kg - {self.recorded_at}"
 
+class SensorRollup(models.Model):
+    """
+    SensorData'ning vaqt oraliqlari (daqiqa/soat/kun) bo'yicha oldindan
+    hisoblangan agregatlari. Grafik va hisobotlar xom qatorlar o'rniga
+    shu jadvaldan o'qiydi (monitoring/rollups.py).
+    """
+    GRANULARITY_CHOICES = (
+        ('minute', 'Daqiqa'),
+        ('hour', 'Soat'),
+        ('day', 'Kun'),
+    )
+
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    sample_count = models.PositiveIntegerField(default=0)
+    gas_sum = models.FloatField(default=0)
+    gas_min = models.FloatField(null=True, blank=True)
+    gas_max = models.FloatField(null=True, blank=True)
+    # max_allowed_gas dan oshgan o'qishlar soni
+    exceed_count = models.PositiveIntegerField(default=0)
+    # Oshgan o'qishlarda (gas_amount - max_allowed_gas) yig'indisi
+    exceed_sum = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['company', 'granularity', 'bucket_start'],
+                name='unique_sensor_rollup_bucket',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.company.name} - {self.get_granularity_display()} - {self.bucket_start}"
+
+    @property
+    def gas_avg(self):
+        if not self.sample_count:
+            return None
+        return self.gas_sum / self.sample_count
+
+class RetentionCheckpoint(models.Model):
+    """
+    Retention jarayonining holati (monitoring/retention.py).
+    downsampled_until dan oldingi xom ma'lumotlar agregatlarga o'tkazilgan
+    va o'chirilishi xavfsiz; jarayon uzilsa shu nuqtadan davom etadi.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    downsampled_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} - {self.downsampled_until}"
+
+class CompanyStatusSnapshot(models.Model):
+    """
+    Kunlik korxona holatlari hisoblagichlari (monitoring/snapshots.py).
+    Trend grafiklari va "Oylik trend" varag'i shu jadvaldan o'qiydi.
+    """
+    date = models.DateField(unique=True)
+    total_companies = models.PositiveIntegerField(default=0)
+    good_count = models.PositiveIntegerField(default=0)
+    moderate_count = models.PositiveIntegerField(default=0)
+    bad_count = models.PositiveIntegerField(default=0)
+    # current_gas_amount > max_allowed_gas
+    dangerous_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Holatlar - {self.date}"
+
+class CompanyPeriodSummary(models.Model):
+    """
+    Korxonaning oy/chorak/yil bo'yicha oldindan hisoblangan ko'rsatkichlari
+    (monitoring/summaries.py). Oylik qatorlar kunlik/soatlik agregatlardan,
+    chorak va yil oylik qatorlardan yig'iladi. Tugagan davr qatori
+    (is_final) qayta hisoblanmaydi.
+    """
+    REPORT_TYPE_CHOICES = (
+        ('monthly', 'Oylik'),
+        ('quarterly', 'Choraklik'),
+        ('yearly', 'Yillik'),
+    )
+
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    report_type = models.CharField(max_length=20, choices=REPORT_TYPE_CHOICES)
+    period = models.CharField(max_length=50)  # "2024-02", "2024-Q1", "2024"
+    period_start = models.DateField()
+    period_end = models.DateField()
+    sample_count = models.PositiveIntegerField(default=0)
+    gas_sum = models.FloatField(default=0)
+    gas_min = models.FloatField(null=True, blank=True)
+    gas_max = models.FloatField(null=True, blank=True)
+    exceed_count = models.PositiveIntegerField(default=0)
+    # kamida bitta o'qish me'yordan oshgan soatlar soni
+    exceed_hours = models.PositiveIntegerField(default=0)
+    penalty_count = models.PositiveIntegerField(default=0)
+    penalty_trees = models.PositiveIntegerField(default=0)
+    penalty_excess = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    is_final = models.BooleanField(default=False)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['company', 'report_type', 'period'],
+                name='unique_company_period_summary',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.company.name} - {self.period}"
+
+    @property
+    def gas_avg(self):
+        if not self.sample_count:
+            return None
+        return self.gas_sum / self.sample_count
+
 class Notification(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE)
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            # company_notifications, company_dashboard: oxirgi ogohlantirishlar
+            models.Index(fields=['company', '-created_at'], name='notif_company_recent_idx'),
+            # o'qilmagan ogohlantirishlar soni
+            models.Index(fields=['company'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+        ]
+    
     def __str__(self):
         return f"Bildirishnoma - {self.company.name}"
 
+class Broadcast(models.Model):
+    """
+    Hudud (yoki barcha hududlar) korxonalariga umumiy xabar. Matn bir marta
+    saqlanadi; qabul qiluvchilar va o'qiganlar company.pk bo'yicha bitmap
+    (monitoring/notifications.py).
+    """
+    message = models.TextField()
+    # None - barcha hududlar
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, null=True, blank=True)
+    recipients = models.BinaryField(default=b'', editable=False)
+    read_by = models.BinaryField(default=b'', editable=False)
+    recipient_count = models.PositiveIntegerField(default=0, editable=False)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['region', '-created_at'], name='broadcast_region_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"Xabar - {self.region.name if self.region_id else 'Barcha hududlar'}"
+
 class Report(models.Model):
     REPORT_TYPE_CHOICES = (
         ('monthly', 'Oylik'),
@@ -193,11 +456,67 @@ class Report(models.Model):
         ('yearly', 'Yillik'),
     )
     
-    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    # None - qo'mitaning umumiy hisoboti
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, blank=True)
     report_type = models.CharField(max_length=20, choices=REPORT_TYPE_CHOICES)
     period = models.CharField(max_length=50)  # "2024-02", "2024-Q1", "2024"
     file_path = models.FileField(upload_to='reports/')
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'report_type', 'period', '-created_at'], name='report_lookup_idx'),
+        ]
+    
+    def __str__(self):
+        owner = self.company.name if self.company_id else "Qo'mita"
+        return f"{self.get_report_type_display()} hisobot - {owner} - {self.period}"
+
+
+class ReportJob(models.Model):
+    """Hisobot yaratish navbati (process_report_jobs buyrug'i bajaradi)."""
+    STATUS_CHOICES = (
+        ('pending', 'Navbatda'),
+        ('running', 'Bajarilmoqda'),
+        ('done', 'Tayyor'),
+        ('failed', 'Xato'),
+    )
+
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, blank=True)
+    report_type = models.CharField(max_length=20, choices=Report.REPORT_TYPE_CHOICES)
+    period = models.CharField(max_length=50)
+    period_start = models.DateField()
+    period_end = models.DateField()  # oxirgi kun (shu kun ham kiradi)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    report = models.ForeignKey(Report, on_delete=models.SET_NULL, null=True, blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # worker navbatdagi eng eski ishni oladi
+            models.Index(fields=['status', 'created_at'], name='reportjob_queue_idx'),
+        ]
+        # bir xil hisobot uchun navbatda/bajarilayotgan ish bittadan ko'p bo'lmaydi
+        # (company NULL unique indeksda takrorlanadi - qo'mita uchun alohida shart)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['company', 'report_type', 'period'],
+                condition=models.Q(status__in=('pending', 'running'), company__isnull=False),
+                name='reportjob_in_flight_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['report_type', 'period'],
+                condition=models.Q(status__in=('pending', 'running'), company__isnull=True),
+                name='reportjob_committee_in_flight_uniq',
+            ),
+        ]
+
     def __str__(self):
-        return f"{self.get_report_type_display()} hisobot - {self.company.name} - {self.period}"
\ No newline at end of file
+        owner = self.company.name if self.company_id else "Qo'mita"
+        return f"{self.period} ({owner}) - {self.get_status_display()}"
\ No newline at end of file
@@ -0,0 +1,153 @@
+# monitoring/notifications.py
+"""
+Korxona xabarlari: shaxsiy Notification qatorlari va hudud bo'yicha
+Broadcast xabarlari.
+
+- Broadcast matni bir marta saqlanadi; qabul qiluvchilar va o'qiganlar
+  bitmap'da (bit raqami = company.pk). Hajmi eng katta pk ga bog'liq
+  (max_pk / 8 bayt): pk lar zich bo'lsa 10 000 korxona uchun ~1.2 KB;
+- BROADCAST_UNREAD_DAYS dan eski xabarlar o'qilgan hisoblanadi, shuning uchun
+  hisoblash va belgilash butun tarixni o'qimaydi;
+- o'qilmaganlar soni korxona bo'yicha keshda saqlanadi va xabar yaratilganda
+  yoki o'qilganda bekor qilinadi, shuning uchun badge so'rovi qatorlarni
+  sanamaydi. Signal chetlab o'tiladigan joylarda (bulk_create,
+  queryset.update) invalidate_unread() ni qo'lda chaqiring.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Broadcast, Company, Notification
+
+UNREAD_CACHE_TIMEOUT = getattr(settings, 'NOTIFICATION_UNREAD_CACHE_TIMEOUT', 300)
+BROADCAST_UNREAD_DAYS = getattr(settings, 'NOTIFICATION_BROADCAST_UNREAD_DAYS', 30)
+
+
+def set_bits(bitmap, positions):
+    data = bytearray(bitmap or b'')
+    for position in positions:
+        index = position >> 3
+        if index >= len(data):
+            data.extend(bytes(index + 1 - len(data)))
+        data[index] |= 1 << (position & 7)
+    return bytes(data)
+
+
+def has_bit(bitmap, position):
+    index = position >> 3
+    return index < len(bitmap) and bool(bitmap[index] & (1 << (position & 7)))
+
+
+def count_bits(bitmap, mask=None):
+    value = int.from_bytes(bytes(bitmap or b''), 'little')
+    if mask is not None:
+        value &= int.from_bytes(bytes(mask), 'little')
+    return value.bit_count()
+
+
+# --- O'qilmaganlar soni ---
+
+def unread_cache_key(company_id):
+    return f'monitoring:unread:{company_id}'
+
+
+def invalidate_unread(company_ids):
+    cache.delete_many([unread_cache_key(company_id) for company_id in company_ids])
+
+
+def notification_changed(sender, instance, **kwargs):
+    """Notification post_save/post_delete signal handler."""
+    invalidate_unread([instance.company_id])
+
+
+def _company_broadcasts(company):
+    return Broadcast.objects.filter(Q(region_id=company.region_id) | Q(region__isnull=True))
+
+
+def _unread_since():
+    return timezone.now() - datetime.timedelta(days=BROADCAST_UNREAD_DAYS)
+
+
+def _unread_broadcast_ids(company, broadcasts):
+    """Oxirgi BROADCAST_UNREAD_DAYS dagi, korxona hali o'qimagan xabarlar id lari."""
+    rows = broadcasts.filter(created_at__gte=_unread_since()).values_list('id', 'recipients', 'read_by')
+    return [
+        broadcast_id for broadcast_id, recipients, read_by in rows
+        if has_bit(recipients, company.pk) and not has_bit(read_by, company.pk)
+    ]
+
+
+def get_unread_count(company):
+    count = cache.get(unread_cache_key(company.pk))
+    if count is None:
+        count = Notification.objects.filter(company=company, is_read=False).count()
+        count += len(_unread_broadcast_ids(company, _company_broadcasts(company)))
+        cache.set(unread_cache_key(company.pk), count, UNREAD_CACHE_TIMEOUT)
+    return count
+
+
+# --- Broadcast ---
+
+def fill_recipients(broadcast):
+    """Broadcast hududidagi hozirgi korxonalarni qabul qiluvchi qiladi. Qaytaradi: ularning id lari."""
+    companies = Company.objects.all()
+    if broadcast.region_id:
+        companies = companies.filter(region_id=broadcast.region_id)
+    company_ids = list(companies.values_list('pk', flat=True))
+    broadcast.recipients = set_bits(b'', company_ids)
+    broadcast.recipient_count = len(company_ids)
+    transaction.on_commit(lambda: invalidate_unread(company_ids))
+    return company_ids
+
+
+def create_broadcast(message, region=None, user=None):
+    broadcast = Broadcast(message=message, region=region, created_by=user)
+    with transaction.atomic():
+        fill_recipients(broadcast)
+        broadcast.save()
+    return broadcast
+
+
+def recent_broadcasts(company, limit=10):
+    """Korxonaga yuborilgan oxirgi xabarlar: [(broadcast, o'qilganmi), ...]."""
+    result = []
+    unread_since = _unread_since()
+    for broadcast in _company_broadcasts(company).order_by('-created_at').iterator():
+        if has_bit(broadcast.recipients, company.pk):
+            is_read = broadcast.created_at < unread_since or has_bit(broadcast.read_by, company.pk)
+            result.append((broadcast, is_read))
+            if len(result) >= limit:
+                break
+    return result
+
+
+def mark_read(company, notification_ids=None, broadcast_ids=None):
+    """
+    Xabarlarni o'qilgan deb belgilaydi (id lar berilmasa - hammasini).
+    Qaytaradi: belgilangan xabarlar soni.
+    """
+    notifications = Notification.objects.filter(company=company, is_read=False)
+    broadcasts = _company_broadcasts(company)
+    if notification_ids is not None or broadcast_ids is not None:
+        notifications = notifications.filter(id__in=notification_ids or [])
+        broadcasts = broadcasts.filter(id__in=broadcast_ids or [])
+
+    # faqat hali o'qilmaganlar lock qilinadi - boshqa korxonalar bilan to'qnashmaslik uchun
+    unread_ids = _unread_broadcast_ids(company, broadcasts)
+
+    with transaction.atomic():
+        updated = notifications.update(is_read=True)
+        # read_by o'qib-yoziladi: parallel belgilashlar bir-birini yo'qotmasligi uchun lock
+        locked = Broadcast.objects.filter(id__in=unread_ids).select_for_update().only('id', 'recipients', 'read_by')
+        for broadcast in locked:
+            if has_bit(broadcast.recipients, company.pk) and not has_bit(broadcast.read_by, company.pk):
+                broadcast.read_by = set_bits(broadcast.read_by, [company.pk])
+                broadcast.save(update_fields=['read_by'])
+                updated += 1
+        if updated:
+            transaction.on_commit(lambda: invalidate_unread([company.pk]))
+    return updated
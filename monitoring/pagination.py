@@ -0,0 +1,113 @@
+# monitoring/pagination.py
+"""
+Keyset (cursor) sahifalash.
+
+OFFSET va COUNT(*) o'rniga oxirgi ko'rsatilgan qatorning kalitlaridan
+(masalan (name, id) yoki (created_at, id)) keyingi qatorlar olinadi:
+WHERE (name, id) > (:name, :id) ORDER BY name, id LIMIT n+1.
+Shuning uchun chuqur sahifa ham birinchi sahifa kabi tez ochiladi.
+
+Kursor - kalit qiymatlari va yo'nalishning base64 JSON ko'rinishi.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, previous_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def encode_cursor(values, direction='next'):
+    payload = json.dumps({'k': values, 'd': direction}, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        values, direction = payload['k'], payload['d']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("Kursor noto'g'ri")
+    if direction not in ('next', 'previous') or not isinstance(values, list):
+        raise InvalidCursor("Kursor noto'g'ri")
+    return values, direction
+
+
+def _after(keys, values, reverse):
+    """(k1, k2, ...) kalitlari bo'yicha values dan keyingi qatorlar sharti."""
+    condition = Q()
+    for i, (field, descending) in enumerate(keys):
+        lookup = 'lt' if descending != reverse else 'gt'
+        step = Q(**{f'{field}__{lookup}': values[i]})
+        for previous_field, value in zip((f for f, _ in keys[:i]), values[:i]):
+            step &= Q(**{previous_field: value})
+        condition |= step
+    return condition
+
+
+def paginate(queryset, keys, cursor=None, page_size=20):
+    """
+    keys: [(maydon, kamayish_tartibida), ...] - oxirgisi yagona bo'lishi kerak
+    (masalan [('name', False), ('id', False)]).
+    Qaytaradi: KeysetPage. Noto'g'ri kursor uchun InvalidCursor.
+    """
+    direction = 'next'
+    if cursor:
+        values, direction = decode_cursor(cursor)
+        if len(values) != len(keys):
+            raise InvalidCursor("Kursor noto'g'ri")
+        try:
+            values = [
+                queryset.model._meta.get_field(field).to_python(value)
+                for (field, _), value in zip(keys, values)
+            ]
+        except ValidationError:
+            raise InvalidCursor("Kursor noto'g'ri")
+        queryset = queryset.filter(_after(keys, values, reverse=direction == 'previous'))
+
+    backwards = direction == 'previous'
+    ordering = [f"{'-' if descending != backwards else ''}{field}" for field, descending in keys]
+    items = list(queryset.order_by(*ordering)[:page_size + 1])
+    has_more = len(items) > page_size
+    items = items[:page_size]
+    if backwards:
+        items.reverse()
+
+    def key_values(item):
+        return [getattr(item, field) for field, _ in keys]
+
+    has_next = bool(items) and (backwards or has_more)
+    has_previous = bool(items) and (has_more if backwards else bool(cursor))
+    return KeysetPage(
+        items,
+        encode_cursor(key_values(items[-1]), 'next') if has_next else None,
+        encode_cursor(key_values(items[0]), 'previous') if has_previous else None,
+    )
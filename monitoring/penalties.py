@@ -0,0 +1,157 @@
+# monitoring/penalties.py
+"""
+Ommaviy jarima: "X hudud/sanoat turidagi barcha qoidabuzarlarga jarima".
+
+Qoidabuzarlar bitta so'rov bilan o'qiladi, ortiqcha miqdor va daraxtlar
+penalty_rules dagi vektorlangan funksiyalar bilan bitta hisobda topiladi,
+jarimalar esa bitta tranzaksiyada bulk_create bilan yoziladi.
+
+- instant: joriy o'lchovi me'yordan oshgan korxonalar;
+- duration: oynada me'yordan oshgan soati bor korxonalar, ortiqcha miqdor
+  soatlik agregatlardan korxonalar bo'yicha guruhlab bitta so'rovda olinadi.
+
+bulk_create Penalty.save() va post_save signallarini chaqirmaydi, shuning
+uchun hisoblangan maydonlar shu yerda to'ldiriladi, jonli yangilanishlar
+yuboriladi, dashboard keshi va davr ko'rsatkichlari esa tranzaksiya
+tugagach bir marta bekor qilinadi. Nomzod korxonalar tranzaksiya davomida
+lock qilinadi - parallel ishga tushirish takroriy jarima yozmaydi.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef
+from django.utils import timezone
+
+from .live import publish_penalty_update
+from .models import PENALTY_WINDOW_DAYS, Company, Penalty, SensorRollup, generate_penalty_number
+from .penalty_rules import excess_amounts_array, integrated_excess, milli_to_decimal, penalty_amounts_array
+from .stats import invalidate_dashboard_stats
+from .summaries import invalidate_penalty_summaries
+
+BATCH_SIZE = 1000
+
+
+def violators(region_id=None, industry_type_id=None, skip_active=True):
+    """Joriy o'lchovi me'yordan oshgan korxonalar (ixtiyoriy: hudud / sanoat turi bo'yicha)."""
+    companies = candidates(region_id, industry_type_id, skip_active)
+    return companies.filter(current_gas_amount__gt=F('max_allowed_gas'))
+
+
+def candidates(region_id=None, industry_type_id=None, skip_active=True):
+    """Hudud / sanoat turi bo'yicha jarima yozilishi mumkin bo'lgan korxonalar."""
+    companies = Company.objects.all()
+    if region_id:
+        companies = companies.filter(region_id=region_id)
+    if industry_type_id:
+        companies = companies.filter(industry_type_id=industry_type_id)
+    if skip_active:
+        # Faol yoki tasdiqlanmagan (draft) jarimasi bor korxonaga ikkinchi jarima yozilmaydi
+        companies = companies.exclude(
+            Exists(Penalty.objects.filter(company=OuterRef('pk'), status__in=('active', 'draft')))
+        )
+    return companies
+
+
+def _unique_numbers(count):
+    numbers = set()
+    while len(numbers) < count:
+        numbers.add(generate_penalty_number())
+    return list(numbers)
+
+
+def _instant_amounts(region_id, industry_type_id, skip_active):
+    rows = list(
+        violators(region_id, industry_type_id, skip_active)
+        .order_by('pk')
+        .values_list('pk', 'current_gas_amount', 'max_allowed_gas')
+    )
+    if not rows:
+        return [], None, None, None
+    company_ids, current, allowed = zip(*rows)
+    excess, trees = penalty_amounts_array(current, allowed)
+    return company_ids, excess, trees, [0] * len(company_ids)
+
+
+def _duration_amounts(region_id, industry_type_id, skip_active, window_start, window_end):
+    rows = list(
+        SensorRollup.objects.filter(
+            company__in=candidates(region_id, industry_type_id, skip_active),
+            granularity='hour',
+            bucket_start__gte=window_start,
+            bucket_start__lt=window_end,
+            exceed_count__gt=0,
+        )
+        .values('company_id')
+        .annotate(excess=integrated_excess(), hours=Count('id'))
+        .order_by('company_id')
+        .values_list('company_id', 'excess', 'hours')
+    )
+    if not rows:
+        return [], None, None, None
+    company_ids, excess_amounts, hours = zip(*rows)
+    excess, trees = excess_amounts_array(excess_amounts)
+    return company_ids, excess, trees, hours
+
+
+def issue_penalties(deadline, region_id=None, industry_type_id=None, skip_active=True, dry_run=False,
+                    mode='instant', window_start=None, window_end=None):
+    """
+    Qoidabuzarlarga jarima yozadi.
+    Qaytaradi: {'count', 'trees_required', 'excess_amount', 'penalties'}
+    (dry_run=True bo'lsa jarimalar saqlanmaydi).
+    """
+    if mode == 'duration':
+        window_end = window_end or timezone.now()
+        window_start = window_start or window_end - datetime.timedelta(days=PENALTY_WINDOW_DAYS)
+    else:
+        window_start = window_end = None
+
+    with transaction.atomic():
+        if not dry_run:
+            # Parallel ishga tushirishlar (buyruq va endpoint) bir korxonaga ikki marta jarima
+            # yozmasligi uchun nomzodlar lock qilinadi; faol jarimalar lock'dan keyin qayta o'qiladi
+            list(
+                candidates(region_id, industry_type_id, skip_active)
+                .order_by('pk').select_for_update().values_list('pk', flat=True)
+            )
+        if mode == 'duration':
+            company_ids, excess, trees, hours = _duration_amounts(
+                region_id, industry_type_id, skip_active, window_start, window_end,
+            )
+        else:
+            company_ids, excess, trees, hours = _instant_amounts(region_id, industry_type_id, skip_active)
+        if not company_ids:
+            return {'count': 0, 'trees_required': 0, 'excess_amount': milli_to_decimal(0), 'penalties': []}
+
+        penalties = [
+            Penalty(
+                company_id=company_id,
+                mode=mode,
+                window_start=window_start,
+                window_end=window_end,
+                excess_amount=milli_to_decimal(company_excess),
+                trees_required=int(company_trees),
+                exceed_hours=company_hours,
+                status='active',
+                deadline=deadline,
+                penalty_number=number,
+            )
+            for company_id, company_excess, company_trees, company_hours, number in zip(
+                company_ids, excess.tolist(), trees.tolist(), hours, _unique_numbers(len(company_ids)),
+            )
+        ]
+        if not dry_run:
+            Penalty.objects.bulk_create(penalties, batch_size=BATCH_SIZE)
+            # bulk_create post_save chaqirmaydi: jonli yangilanish va keshlar shu yerda
+            for penalty in penalties:
+                publish_penalty_update(penalty)
+            transaction.on_commit(invalidate_dashboard_stats)
+            changed = [(penalty.company_id, penalty.created_at) for penalty in penalties]
+            transaction.on_commit(lambda: invalidate_penalty_summaries(changed))
+
+    return {
+        'count': len(penalties),
+        'trees_required': int(trees.sum()),
+        'excess_amount': milli_to_decimal(int(excess.sum())),
+        'penalties': penalties,
+    }
@@ -0,0 +1,90 @@
+# monitoring/penalty_rules.py
+"""
+Jarima qoidalari: ortiqcha gaz va kerakli daraxtlar sonini hisoblash.
+
+Bu modul daraxt me'yori uchun yagona manba: Penalty.save(), ko'rinishlar va
+ommaviy jarima (monitoring/penalties.py) shu funksiyalardan foydalanadi.
+
+Hisob butun sonlarda (milli-kg/soat, ya'ni 0.001 aniqlikda) olib boriladi,
+shuning uchun bitta korxona uchun natija va vektorlangan (NumPy) natija
+bir xil chiqadi.
+
+Jarima rejimlari:
+- instant: joriy o'qish bo'yicha ortiqcha (kg/soat), ya'ni bir soatlik oshish;
+- duration: jarima oynasidagi soatlik agregatlar bo'yicha ortiqcha kg
+  (har soat uchun o'rtacha ortiqcha kg/soat * 1 soat). Bir soatlik oshish
+  ikkala rejimda bir xil daraxt beradi, bir haftalik oshish esa 168 barobar.
+"""
+from decimal import Decimal
+
+import numpy as np
+from django.db.models import ExpressionWrapper, F, FloatField, Sum
+
+# Har 1 kg/soat oshish uchun daraxtlar soni
+TREES_PER_KG_PER_HOUR = Decimal('10')
+
+# 0.001 kg/soat birliklarida
+MILLI = 1000
+_RATE_MILLI = int(TREES_PER_KG_PER_HOUR * MILLI)
+
+
+def to_milli(value):
+    return int(round(value * MILLI))
+
+
+def excess_milli(current_gas_amount, max_allowed_gas):
+    """Ortiqcha miqdor (milli birlikda), manfiy bo'lsa 0."""
+    return max(0, to_milli(current_gas_amount) - to_milli(max_allowed_gas))
+
+
+def trees_for_excess_milli(excess):
+    """excess * TREES_PER_KG_PER_HOUR, yuqoriga yaxlitlangan."""
+    return -(-excess * _RATE_MILLI // (MILLI * MILLI))
+
+
+def milli_to_decimal(excess):
+    return Decimal(int(excess)).scaleb(-3)
+
+
+def penalty_amounts(current_gas_amount, max_allowed_gas):
+    """Qaytaradi: (excess_amount: Decimal, trees_required: int)."""
+    excess = excess_milli(current_gas_amount, max_allowed_gas)
+    return milli_to_decimal(excess), trees_for_excess_milli(excess)
+
+
+def trees_needed(excess_amount):
+    """kg/soat dagi ortiqcha miqdor uchun daraxtlar soni."""
+    return trees_for_excess_milli(max(0, to_milli(excess_amount)))
+
+
+def penalty_amounts_array(current_gas_amounts, max_allowed_gas):
+    """
+    penalty_amounts() ning vektorlangan varianti.
+    Qaytaradi: (excess milli birlikda, daraxtlar) - int64 massivlar.
+    """
+    current = _milli_array(current_gas_amounts)
+    allowed = _milli_array(max_allowed_gas)
+    excess = np.maximum(current - allowed, 0)
+    return excess, _trees_array(excess)
+
+
+def excess_amounts_array(excess_amounts):
+    """Tayyor ortiqcha miqdorlar (kg) uchun: (milli birlikda, daraxtlar)."""
+    excess = np.maximum(_milli_array(excess_amounts), 0)
+    return excess, _trees_array(excess)
+
+
+def _milli_array(values):
+    return np.rint(np.asarray(values, dtype=float) * MILLI).astype(np.int64)
+
+
+def _trees_array(excess):
+    return -(-excess * _RATE_MILLI // (MILLI * MILLI))
+
+
+def integrated_excess():
+    """
+    SensorRollup (granularity='hour', exceed_count > 0) qatorlari ustida
+    agregat: oynadagi ortiqcha miqdor, kg.
+    """
+    return Sum(ExpressionWrapper(F('exceed_sum') / F('sample_count'), output_field=FloatField()))
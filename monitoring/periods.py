@@ -0,0 +1,61 @@
+# monitoring/periods.py
+"""Hisobot davrlari (oy, chorak, yil) bilan ishlash uchun yordamchilar."""
+import datetime
+
+from django.utils import timezone
+
+
+def month_range(year, month):
+    start = datetime.date(year, month, 1)
+    if month == 12:
+        end = datetime.date(year + 1, 1, 1) - datetime.timedelta(days=1)
+    else:
+        end = datetime.date(year, month + 1, 1) - datetime.timedelta(days=1)
+    return start, end
+
+
+def aware_day_range(start_date, end_date):
+    """
+    [start_date, end_date] sanalarini [start 00:00, end+1 00:00) aware datetime
+    oralig'iga aylantiradi. `created_at__date` o'rniga ishlatilsa created_at
+    indeksidan foydalanish mumkin bo'ladi.
+    """
+    start = timezone.make_aware(datetime.datetime.combine(start_date, datetime.time.min))
+    end = timezone.make_aware(datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min))
+    return start, end
+
+
+def parse_period(report_type, year, month=None, quarter=None):
+    """
+    Qaytaradi: (boshlanish sanasi, oxirgi sana, davr belgisi).
+    Noto'g'ri parametrlarda ValueError.
+    """
+    year = int(year)
+    if report_type == 'monthly':
+        if month is None:
+            raise ValueError("month parametri monthly hisobot uchun majburiy")
+        month = int(month)
+        if not 1 <= month <= 12:
+            raise ValueError("Noto'g'ri month")
+        start_date, end_date = month_range(year, month)
+        return start_date, end_date, f"{year}-{month:02d}"
+    if report_type == 'quarterly':
+        quarter = int(quarter or 1)
+        if not 1 <= quarter <= 4:
+            raise ValueError("Noto'g'ri quarter")
+        start_month = (quarter - 1) * 3 + 1
+        start_date = datetime.date(year, start_month, 1)
+        _, end_date = month_range(year, start_month + 2)
+        return start_date, end_date, f"{year}-Q{quarter}"
+    if report_type == 'yearly':
+        return datetime.date(year, 1, 1), datetime.date(year, 12, 31), f"{year}"
+    raise ValueError("Noto'g'ri report_type")
+
+
+def months_in_period(start_date, end_date):
+    """[start_date, end_date] ichidagi oylar: (boshlanish, oxirgi kun, belgi)."""
+    year, month = start_date.year, start_date.month
+    while datetime.date(year, month, 1) <= end_date:
+        first, last = month_range(year, month)
+        yield first, last, f"{year}-{month:02d}"
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
@@ -0,0 +1,255 @@
+# monitoring/reports.py
+"""
+Hisobotlarni fon rejimida yaratish.
+
+enqueue_report() ReportJob yozuvini navbatga qo'yadi (yoki tayyor/bajarilayotgan
+bir xil hisobotni qaytaradi), process_report_jobs buyrug'i esa claim_next_job()
+bilan ishni oladi va run_job() bilan faylni Report sifatida saqlaydi.
+
+Navbat bazada: ishni olish shartli UPDATE (status='pending' -> 'running')
+orqali bajariladi, shuning uchun bir nechta worker bitta ishni ikki marta olmaydi.
+"""
+import datetime
+import os
+import socket
+import traceback
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import exports
+from .models import Report, ReportJob
+from .periods import aware_day_range
+from .snapshots import counts_from_stats, monthly_status_trend
+from .stats import get_dashboard_stats
+from .summaries import breakdown_rows, get_company_summary
+
+REUSE_SECONDS = getattr(settings, 'REPORT_REUSE_SECONDS', 900)
+JOB_TIMEOUT = getattr(settings, 'REPORT_JOB_TIMEOUT', 600)
+MAX_ATTEMPTS = getattr(settings, 'REPORT_JOB_MAX_ATTEMPTS', 3)
+ENQUEUE_ATTEMPTS = 3
+
+
+# --- Hisobot fayllari ---
+
+def build_committee_report(period_start, period_end, period_label):
+    """Qo'mitaning umumiy hisoboti (xlsx). Qaytaradi: vaqtinchalik fayl."""
+    stats = get_dashboard_stats()
+    year = period_start.year
+    # Oylik trend (kunlik snapshot'lardan)
+    snapshots = monthly_status_trend(year, live_counts=counts_from_stats(stats))
+    trend = [
+        (f"{year}-{m:02d}", snapshot['dangerous_count'] if snapshot else None)
+        for m, snapshot in enumerate(snapshots, start=1)
+    ]
+    start, end = aware_day_range(period_start, period_end)
+    return exports.write_xlsx([
+        (
+            'Umumiy maʼlumot',
+            ('Hisobot davri', 'Jami korxonalar', 'Xavfli korxonalar', 'Faol jarimalar', 'Yaratilgan sana'),
+            [(period_label, stats['total_companies'], stats['dangerous_companies'],
+              stats['active_penalties'], timezone.localtime().strftime("%d.%m.%Y %H:%M"))],
+            None,
+        ),
+        ('Korxonalar', exports.COMPANY_HEADERS, exports.company_rows(), 'Hech qanday korxona topilmadi'),
+        (
+            'Jarimalar', exports.PENALTY_HEADERS, exports.penalty_rows(start, end),
+            f'{period_label} davrida hech qanday jarima topilmadi',
+        ),
+        ('Oylik trend', ('Oy', 'Xavfli korxonalar soni'), trend, None),
+    ])
+
+
+def build_company_report(company, report_type, period_start, period_end, period_label):
+    """Korxona hisoboti (xlsx) - oldindan hisoblangan davr ko'rsatkichlaridan."""
+    summary = get_company_summary(company, report_type, period_start, period_end, period_label)
+    start, end = aware_day_range(period_start, period_end)
+    breakdown_title, breakdown_column = ('Kunlar', 'Kun') if report_type == 'monthly' else ('Oylar', 'Oy')
+    return exports.write_xlsx([
+        (
+            'Umumiy maʼlumot',
+            (
+                'Korxona', 'STIR raqami', 'Hisobot davri', "O'lchovlar soni", "O'rtacha gaz (kg/soat)",
+                'Minimal (kg/soat)', 'Maksimal (kg/soat)', 'Ruxsat etilgan (kg/soat)',
+                "Me'yordan oshgan o'lchovlar", "Me'yordan oshgan soatlar", 'Jarimalar soni',
+                'Kerakli daraxtlar', 'Oshib ketgan miqdor (kg)', 'Yaratilgan sana',
+            ),
+            [(
+                company.name, company.stir_number, period_label, summary.sample_count, summary.gas_avg,
+                summary.gas_min, summary.gas_max, company.max_allowed_gas, summary.exceed_count,
+                summary.exceed_hours, summary.penalty_count, summary.penalty_trees,
+                float(summary.penalty_excess), timezone.localtime().strftime("%d.%m.%Y %H:%M"),
+            )],
+            None,
+        ),
+        (
+            breakdown_title,
+            (breakdown_column, "O'lchovlar soni", "O'rtacha gaz (kg/soat)", 'Minimal (kg/soat)',
+             'Maksimal (kg/soat)', "Me'yordan oshgan o'lchovlar"),
+            breakdown_rows(company, report_type, period_start, period_end),
+            f"{period_label} davrida sensor ma'lumotlari yo'q",
+        ),
+        (
+            'Jarimalar', exports.PENALTY_HEADERS, exports.penalty_rows(start, end, company=company),
+            f'{period_label} davrida hech qanday jarima topilmadi',
+        ),
+    ])
+
+
+def report_filename(company, report_type, period_label):
+    owner = f"korxona_{company.stir_number}" if company is not None else 'ekolog'
+    return f"{owner}_{report_type}_{period_label}.xlsx"
+
+
+def _build(job):
+    if job.company_id is None:
+        return build_committee_report(job.period_start, job.period_end, job.period)
+    return build_company_report(job.company, job.report_type, job.period_start, job.period_end, job.period)
+
+
+def _save_report(company, report_type, period_label, output):
+    try:
+        with transaction.atomic():
+            report = Report(company=company, report_type=report_type, period=period_label)
+            report.file_path.save(report_filename(company, report_type, period_label), File(output), save=True)
+            _retire_superseded(report)
+        return report
+    finally:
+        output.close()
+
+
+def _retire_superseded(report):
+    """
+    Shu (korxona, tur, davr) uchun eski hisobotlarni o'chiradi: ularga ishora
+    qilgan ishlar yangi hisobotga o'tkaziladi, fayllar commit'dan keyin o'chiriladi.
+    """
+    old = list(
+        Report.objects.filter(company=report.company, report_type=report.report_type, period=report.period)
+        .exclude(pk=report.pk)
+    )
+    if not old:
+        return
+    ReportJob.objects.filter(report__in=old).update(report=report)
+    Report.objects.filter(pk__in=[item.pk for item in old]).delete()
+    files = [item.file_path for item in old if item.file_path]
+
+    def delete_files():
+        for file in files:
+            file.delete(save=False)
+
+    transaction.on_commit(delete_files)
+
+
+def get_company_report(company, report_type, period_start, period_end, period_label):
+    """
+    Korxona hisobotini qaytaradi: tayyor fayl bo'lsa o'sha, aks holda darhol
+    yaratadi (davr ko'rsatkichlari tayyor bo'lgani uchun navbat shart emas).
+    """
+    report = find_reusable_report(company, report_type, period_label, period_end)
+    if report is None:
+        output = build_company_report(company, report_type, period_start, period_end, period_label)
+        report = _save_report(company, report_type, period_label, output)
+    return report
+
+
+# --- Navbat ---
+
+def find_reusable_report(company, report_type, period_label, period_end):
+    """
+    Bir xil hisobot allaqachon bo'lsa uni qaytaradi: tugagan davr uchun davr
+    tugagandan keyin yaratilgan fayl, tugamagan davr uchun REUSE_SECONDS dan
+    yangi fayl.
+    """
+    _, closed_at = aware_day_range(period_end, period_end)
+    fresh_after = timezone.now() - datetime.timedelta(seconds=REUSE_SECONDS)
+    report = (
+        Report.objects.filter(company=company, report_type=report_type, period=period_label)
+        .order_by('-created_at')
+        .first()
+    )
+    if report is None:
+        return None
+    if report.created_at >= closed_at or report.created_at >= fresh_after:
+        return report
+    return None
+
+
+def enqueue_report(report_type, period_start, period_end, period_label, company=None, user=None):
+    """
+    Qaytaradi: ReportJob. Tayyor hisobot bo'lsa darhol 'done' holatidagi ish,
+    bir xil ish navbatda/bajarilayotgan bo'lsa - o'sha ish.
+    """
+    for attempt in range(ENQUEUE_ATTEMPTS):
+        in_flight = ReportJob.objects.filter(
+            company=company, report_type=report_type, period=period_label,
+            status__in=('pending', 'running'),
+        ).order_by('created_at').first()
+        if in_flight is not None:
+            return in_flight
+
+        job = ReportJob(
+            company=company, report_type=report_type, period=period_label,
+            period_start=period_start, period_end=period_end, requested_by=user,
+        )
+        report = find_reusable_report(company, report_type, period_label, period_end)
+        if report is not None:
+            job.status = 'done'
+            job.report = report
+            job.finished_at = timezone.now()
+        try:
+            with transaction.atomic():
+                job.save()
+            return job
+        except IntegrityError:
+            # parallel so'rov xuddi shu ishni birinchi bo'lib navbatga qo'ydi (u allaqachon
+            # tugagan bo'lishi ham mumkin) - navbat va tayyor hisobot qaytadan tekshiriladi
+            if attempt == ENQUEUE_ATTEMPTS - 1:
+                raise
+
+
+def _requeue_stale_jobs():
+    """Worker o'lib qolgan (JOB_TIMEOUT dan uzoq 'running') ishlarni qayta navbatga qo'yadi."""
+    stale = ReportJob.objects.filter(
+        status='running', started_at__lt=timezone.now() - datetime.timedelta(seconds=JOB_TIMEOUT),
+    )
+    stale.filter(attempts__lt=MAX_ATTEMPTS).update(status='pending', worker='')
+    stale.update(status='failed', error='Vaqt tugadi', finished_at=timezone.now())
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_next_job(worker=None):
+    """Navbatdagi eng eski ishni oladi; hech narsa bo'lmasa None."""
+    _requeue_stale_jobs()
+    worker = worker or worker_name()
+    candidates = ReportJob.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True)[:10]
+    for job_id in candidates:
+        claimed = ReportJob.objects.filter(id=job_id, status='pending').update(
+            status='running', worker=worker, started_at=timezone.now(), attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return ReportJob.objects.select_related('company').get(id=job_id)
+    return None
+
+
+def run_job(job):
+    """Ishni bajaradi va faylni Report sifatida saqlaydi. Qaytaradi: yakuniy status."""
+    try:
+        output = _build(job)
+        with transaction.atomic():
+            job.report = _save_report(job.company, job.report_type, job.period, output)
+            job.status = 'done'
+            job.error = ''
+            job.finished_at = timezone.now()
+            job.save(update_fields=['report', 'status', 'error', 'finished_at'])
+    except Exception:
+        job.error = traceback.format_exc()
+        job.status = 'pending' if job.attempts < MAX_ATTEMPTS else 'failed'
+        job.finished_at = timezone.now() if job.status == 'failed' else None
+        job.save(update_fields=['error', 'status', 'finished_at'])
+    return job.status
@@ -0,0 +1,143 @@
+# monitoring/retention.py
+"""
+Sensor tarixini saqlash (retention) va siqish (downsampling) siyosati.
+
+1. RAW_DAYS dan eski xom SensorData kunma-kun soatlik/kunlik agregatlarga
+   o'tkaziladi (rebuild_rollups) va RetentionCheckpoint surilib boriladi;
+2. checkpoint'dan oldingi xom qatorlar CHUNK_SIZE bo'laklarida, har biri
+   alohida qisqa tranzaksiyada o'chiriladi;
+3. MINUTE_ROLLUP_DAYS (va berilgan bo'lsa HOUR_ROLLUP_DAYS) dan eski
+   agregatlar ham bo'laklab o'chiriladi.
+
+Jarayon istalgan joyda uzilsa, keyingi ishga tushirish checkpoint'dan
+davom etadi: allaqachon agregatlangan kun qayta qurilmaydi, shu sababli
+qisman o'chirilgan kun hech qachon kam sanalmaydi.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import RetentionCheckpoint, SensorData, SensorRollup
+from .rollups import RAW_CHECKPOINT as CHECKPOINT_NAME, rebuild_rollups
+
+DEFAULTS = {
+    'RAW_DAYS': 90,
+    'MINUTE_ROLLUP_DAYS': 30,
+    'HOUR_ROLLUP_DAYS': None,
+    'CHUNK_SIZE': 5000,
+}
+
+
+def get_policy(**overrides):
+    policy = {**DEFAULTS, **getattr(settings, 'SENSOR_RETENTION', {})}
+    policy.update({k: v for k, v in overrides.items() if v is not None})
+    return policy
+
+
+def _local_midnight(date):
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+def _delete_in_chunks(queryset, chunk_size, max_chunks=None, order=('id',)):
+    """
+    queryset qatorlarini bo'laklab o'chiradi. order filtr ustunidagi indeks
+    bilan mos bo'lishi kerak, aks holda har bir bo'lak butun jadvalni o'qiydi.
+    Qaytaradi: (o'chirilgan qatorlar soni, hammasi o'chirildimi).
+    """
+    deleted = 0
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        ids = list(queryset.order_by(*order).values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return deleted, True
+        with transaction.atomic():
+            count, _ = queryset.model.objects.filter(id__in=ids).delete()
+        deleted += count
+        chunks += 1
+    return deleted, not queryset.exists()
+
+
+def apply_retention(raw_days=None, minute_days=None, hour_days=None, chunk_size=None,
+                    max_chunks=None, dry_run=False):
+    """
+    Siyosatni qo'llaydi va hisobot qaytaradi.
+    max_chunks: har bir o'chirish bosqichi uchun bo'laklar chegarasi
+    (bitta ishga tushirishni vaqt bo'yicha cheklash uchun).
+    dry_run: hech narsa yozmaydi, faqat qancha qator qayta ishlanishini hisoblaydi.
+    """
+    policy = get_policy(RAW_DAYS=raw_days, MINUTE_ROLLUP_DAYS=minute_days,
+                        HOUR_ROLLUP_DAYS=hour_days, CHUNK_SIZE=chunk_size)
+    today = timezone.localdate()
+    cutoff = _local_midnight(today - datetime.timedelta(days=policy['RAW_DAYS']))
+    minute_cutoff = timezone.now() - datetime.timedelta(days=policy['MINUTE_ROLLUP_DAYS'])
+    hour_cutoff = (
+        timezone.now() - datetime.timedelta(days=policy['HOUR_ROLLUP_DAYS'])
+        if policy['HOUR_ROLLUP_DAYS'] is not None else None
+    )
+
+    report = {
+        'cutoff': cutoff.isoformat(),
+        'downsampled_days': 0,
+        'rollups_written': 0,
+        'raw_deleted': 0,
+        'minute_rollups_deleted': 0,
+        'hour_rollups_deleted': 0,
+        'complete': True,
+    }
+
+    if dry_run:
+        report['raw_deleted'] = SensorData.objects.filter(recorded_at__lt=cutoff).count()
+        report['minute_rollups_deleted'] = SensorRollup.objects.filter(
+            granularity='minute', bucket_start__lt=minute_cutoff).count()
+        if hour_cutoff is not None:
+            report['hour_rollups_deleted'] = SensorRollup.objects.filter(
+                granularity='hour', bucket_start__lt=hour_cutoff).count()
+        return report
+
+    checkpoint, _ = RetentionCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+
+    # 1) Downsampling: checkpoint'dan cutoff'gacha bo'lgan kunlar
+    while True:
+        pending = SensorData.objects.filter(recorded_at__lt=cutoff)
+        if checkpoint.downsampled_until is not None:
+            pending = pending.filter(recorded_at__gte=checkpoint.downsampled_until)
+        oldest = pending.aggregate(first=Min('recorded_at'))['first']
+        if oldest is None:
+            break
+        day = timezone.localtime(oldest).date()
+        next_day = _local_midnight(day + datetime.timedelta(days=1))
+        with transaction.atomic():
+            report['rollups_written'] += rebuild_rollups(day, next_day, ('hour', 'day'))
+            checkpoint.downsampled_until = min(next_day, cutoff)
+            checkpoint.save(update_fields=['downsampled_until', 'updated_at'])
+        report['downsampled_days'] += 1
+
+    # 2) Agregatlangan xom qatorlarni o'chirish
+    if checkpoint.downsampled_until is not None:
+        deleted, done = _delete_in_chunks(
+            SensorData.objects.filter(recorded_at__lt=min(checkpoint.downsampled_until, cutoff)),
+            policy['CHUNK_SIZE'], max_chunks, order=('recorded_at', 'id'),
+        )
+        report['raw_deleted'] = deleted
+        report['complete'] &= done
+
+    # 3) Eski agregatlarni o'chirish
+    deleted, done = _delete_in_chunks(
+        SensorRollup.objects.filter(granularity='minute', bucket_start__lt=minute_cutoff),
+        policy['CHUNK_SIZE'], max_chunks,
+    )
+    report['minute_rollups_deleted'] = deleted
+    report['complete'] &= done
+
+    if hour_cutoff is not None:
+        deleted, done = _delete_in_chunks(
+            SensorRollup.objects.filter(granularity='hour', bucket_start__lt=hour_cutoff),
+            policy['CHUNK_SIZE'], max_chunks,
+        )
+        report['hour_rollups_deleted'] = deleted
+        report['complete'] &= done
+
+    return report
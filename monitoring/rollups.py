@@ -0,0 +1,198 @@
+# monitoring/rollups.py
+"""
+SensorRollup jadvalini yuritish:
+- apply_readings(): ingestion vaqtida yangi o'qishlarni agregatlarga qo'shadi;
+- rebuild_rollups(): berilgan vaqt oralig'i uchun agregatlarni xom
+  SensorData qatorlaridan qaytadan quradi (backfill/retention uchun).
+  Retention xom qatorlarini o'chirgan davr (RetentionCheckpoint) va xom
+  qatori umuman yo'q kunlar qayta qurilmaydi - u yerdagi agregatlar
+  tarixning yagona nusxasi.
+
+Oraliqlar (bucket) TIME_ZONE bo'yicha mahalliy vaqtda hisoblanadi.
+"""
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import RetentionCheckpoint, SensorData, SensorRollup
+
+GRANULARITIES = ('minute', 'hour', 'day')
+# Xom ma'lumotlar retention checkpoint'i (monitoring/retention.py)
+RAW_CHECKPOINT = 'sensor_raw'
+
+
+def bucket_start(dt, granularity):
+    """dt ni granularity bo'yicha (mahalliy vaqtda) pastga yaxlitlaydi."""
+    local = timezone.localtime(dt)
+    if granularity == 'minute':
+        return local.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return local.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        return local.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Noma'lum granularity: {granularity}")
+
+
+def _merge(rollup, stats):
+    rollup.sample_count += stats['sample_count']
+    rollup.gas_sum += stats['gas_sum']
+    rollup.exceed_count += stats['exceed_count']
+    rollup.exceed_sum += stats['exceed_sum']
+    rollup.gas_min = stats['gas_min'] if rollup.gas_min is None else min(rollup.gas_min, stats['gas_min'])
+    rollup.gas_max = stats['gas_max'] if rollup.gas_max is None else max(rollup.gas_max, stats['gas_max'])
+
+
+def apply_readings(sensor_rows, granularities=GRANULARITIES):
+    """
+    Saqlangan SensorData obyektlarini (recorded_at to'ldirilgan) agregatlarga
+    qo'shadi. Chaqiruvchi tranzaksiya ichida bo'lishi kerak.
+    Har bir partiya uchun: 1 ta SELECT ... FOR UPDATE, 1 ta UPDATE, 1 ta INSERT.
+    """
+    pending = {}
+    for row in sensor_rows:
+        allowed = row.company.max_allowed_gas
+        for granularity in granularities:
+            key = (row.company_id, granularity, bucket_start(row.recorded_at, granularity))
+            stats = pending.get(key)
+            if stats is None:
+                stats = pending[key] = {
+                    'sample_count': 0, 'gas_sum': 0.0, 'exceed_count': 0, 'exceed_sum': 0.0,
+                    'gas_min': row.gas_amount, 'gas_max': row.gas_amount,
+                }
+            stats['sample_count'] += 1
+            stats['gas_sum'] += row.gas_amount
+            stats['gas_min'] = min(stats['gas_min'], row.gas_amount)
+            stats['gas_max'] = max(stats['gas_max'], row.gas_amount)
+            if row.gas_amount > allowed:
+                stats['exceed_count'] += 1
+                stats['exceed_sum'] += row.gas_amount - allowed
+
+    if not pending:
+        return
+
+    company_ids = {key[0] for key in pending}
+    buckets = {key[2] for key in pending}
+
+    # Parallel ingestion bir xil yangi bucket'ni yaratsa, unique constraint
+    # xatosidan keyin mavjud qatorlar bilan qayta birlashtiramiz.
+    for attempt in range(3):
+        try:
+            with transaction.atomic():
+                existing = {
+                    (r.company_id, r.granularity, r.bucket_start): r
+                    for r in SensorRollup.objects.select_for_update().filter(
+                        company_id__in=company_ids,
+                        granularity__in=granularities,
+                        bucket_start__in=buckets,
+                    )
+                }
+                to_update, to_create = [], []
+                for key, stats in pending.items():
+                    rollup = existing.get(key)
+                    if rollup is not None:
+                        _merge(rollup, stats)
+                        to_update.append(rollup)
+                    else:
+                        to_create.append(SensorRollup(
+                            company_id=key[0], granularity=key[1], bucket_start=key[2], **stats
+                        ))
+                if to_update:
+                    SensorRollup.objects.bulk_update(
+                        to_update, ['sample_count', 'gas_sum', 'gas_min', 'gas_max', 'exceed_count', 'exceed_sum']
+                    )
+                if to_create:
+                    SensorRollup.objects.bulk_create(to_create)
+            return
+        except IntegrityError:
+            if attempt == 2:
+                raise
+
+
+def _local_midnight(value):
+    if isinstance(value, datetime.datetime):
+        return bucket_start(value, 'day')
+    return timezone.make_aware(datetime.datetime.combine(value, datetime.time.min))
+
+
+def raw_history_start():
+    """Xom SensorData to'liq saqlangan davr boshi (retention o'chirmagan), yoki None."""
+    return RetentionCheckpoint.objects.filter(name=RAW_CHECKPOINT).values_list(
+        'downsampled_until', flat=True,
+    ).first()
+
+
+def rebuild_rollups(start, end, granularities=GRANULARITIES, company_ids=None):
+    """
+    [start, end) oralig'idagi agregatlarni xom SensorData'dan qaytadan quradi.
+    Oraliq mahalliy kun chegaralariga kengaytiriladi va har bir kun alohida
+    tranzaksiyada qayta ishlanadi (uzoq lock'lar bo'lmasligi uchun).
+    Retention checkpoint'idan oldingi kunlar o'tkazib yuboriladi.
+    Qaytaradi: yaratilgan agregat qatorlari soni.
+    """
+    created = 0
+    day = _local_midnight(start)
+    history_start = raw_history_start()
+    if history_start is not None and day < history_start:
+        day = _local_midnight(timezone.localtime(history_start).date())
+    last = _local_midnight(end)
+    if isinstance(end, datetime.datetime) and end > last:
+        last = _local_midnight(last.date() + datetime.timedelta(days=1))
+    while day < last:
+        next_day = _local_midnight(day.date() + datetime.timedelta(days=1))
+        created += _rebuild_window(day, next_day, granularities, company_ids)
+        day = next_day
+    return created
+
+
+def _rebuild_window(start, end, granularities, company_ids):
+    # barcha korxonalar bo'yicha oraliq: sensor_recorded_idx (company bo'yicha - sensor_company_recent_idx)
+    raw = SensorData.objects.filter(recorded_at__gte=start, recorded_at__lt=end)
+    existing = SensorRollup.objects.filter(
+        granularity__in=granularities, bucket_start__gte=start, bucket_start__lt=end
+    )
+    if company_ids is not None:
+        raw = raw.filter(company_id__in=company_ids)
+        existing = existing.filter(company_id__in=company_ids)
+
+    if not raw.exists():
+        # Xom qatorlar yo'q - mavjud agregatlar (masalan, retention'dan keyin) saqlanadi
+        return 0
+
+    exceeded = Q(gas_amount__gt=F('company__max_allowed_gas'))
+    created = 0
+    with transaction.atomic():
+        existing.delete()
+        for granularity in granularities:
+            rows = (
+                raw.annotate(bucket=Trunc('recorded_at', granularity))
+                .values('company_id', 'bucket')
+                .annotate(
+                    n=Count('id'),
+                    total=Sum('gas_amount'),
+                    low=Min('gas_amount'),
+                    high=Max('gas_amount'),
+                    exceeded=Count('id', filter=exceeded),
+                    excess=Sum(F('gas_amount') - F('company__max_allowed_gas'), filter=exceeded),
+                )
+                .order_by()
+            )
+            objs = [
+                SensorRollup(
+                    company_id=row['company_id'],
+                    granularity=granularity,
+                    bucket_start=row['bucket'],
+                    sample_count=row['n'],
+                    gas_sum=row['total'],
+                    gas_min=row['low'],
+                    gas_max=row['high'],
+                    exceed_count=row['exceeded'],
+                    exceed_sum=row['excess'] or 0.0,
+                )
+                for row in rows
+            ]
+            SensorRollup.objects.bulk_create(objs, batch_size=1000)
+            created += len(objs)
+    return created
@@ -0,0 +1,118 @@
+# monitoring/search.py
+"""
+Korxonalarni qidirish (icontains o'rniga indeks bo'yicha).
+
+- Company.search_text: nom, STIR va hudud - normallashtirilgan
+  (lotin/kirill, tutuq belgilarisiz, monitoring/textindex.py);
+- CompanySearchTrigram: search_text ning 3-gramlari, (gram, company) indeksi.
+
+search_companies() so'rovning 3-gramlarini indeksdan qidiradi (bitta
+GROUP BY so'rov), nomzodlarni mos kelgan gramlar soni bo'yicha saralaydi,
+so'ng prefiks mosligi bilan ball qo'shadi. Shuning uchun prefiks ("navo")
+va xato yozilgan ("navoyi azod") so'rovlar ham topiladi.
+
+Indeks Company/Region saqlanganda yangilanadi (monitoring/signals.py);
+bulk_create/update bilan yozilganda rebuild_search_index buyrug'ini ishlating.
+"""
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Company, CompanySearchTrigram
+from .textindex import company_search_text, normalize, trigrams
+
+# So'rov gramlarining kamida shu ulushi mos kelishi kerak
+MIN_MATCH_RATIO = getattr(settings, 'COMPANY_SEARCH_MIN_MATCH', 0.4)
+# Ball hisoblanadigan nomzodlar soni
+CANDIDATES = 200
+BATCH_SIZE = 2000
+
+
+def _company_grams(company_id, search_text):
+    return [CompanySearchTrigram(company_id=company_id, gram=gram) for gram in trigrams(search_text)]
+
+
+def index_companies(companies):
+    """Berilgan korxonalarning 3-gramlarini qayta yozadi (search_text tayyor bo'lishi kerak)."""
+    companies = list(companies)
+    with transaction.atomic():
+        CompanySearchTrigram.objects.filter(company_id__in=[c.pk for c in companies]).delete()
+        rows = []
+        for company in companies:
+            rows.extend(_company_grams(company.pk, company.search_text))
+        CompanySearchTrigram.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+def company_saved(sender, instance, update_fields=None, **kwargs):
+    """Company post_save: nom/STIR/hudud o'zgarganda indeksni yangilaydi."""
+    if update_fields is None or 'search_text' in update_fields:
+        index_companies([instance])
+
+
+def region_saved(sender, instance, created=False, **kwargs):
+    """Region post_save: nomi o'zgargan bo'lishi mumkin - hudud korxonalarini qayta indekslaydi."""
+    if not created:
+        rebuild_search_index(Company.objects.filter(region=instance))
+
+
+def rebuild_search_index(queryset=None, chunk_size=BATCH_SIZE):
+    """search_text va 3-gramlarni qaytadan quradi. Qaytaradi: korxonalar soni."""
+    queryset = (queryset if queryset is not None else Company.objects.all()).select_related('region')
+    total = 0
+    chunk = []
+    for company in queryset.order_by('pk').iterator(chunk_size=chunk_size):
+        company.search_text = company_search_text(company.name, company.stir_number, company.region.name)
+        chunk.append(company)
+        if len(chunk) >= chunk_size:
+            total += _rebuild_chunk(chunk)
+            chunk = []
+    if chunk:
+        total += _rebuild_chunk(chunk)
+    return total
+
+
+def _rebuild_chunk(companies):
+    with transaction.atomic():
+        Company.objects.bulk_update(companies, ['search_text'])
+        index_companies(companies)
+    return len(companies)
+
+
+def search_companies(query, queryset=None, limit=20):
+    """
+    Qaytaradi: ball bo'yicha saralangan korxonalar ro'yxati (har birida
+    search_score atributi). queryset berilsa, faqat uning ichidan qidiradi.
+    """
+    text = normalize(query)
+    if not text:
+        return []
+    grams = trigrams(text, partial_last=True)
+    min_hits = max(1, math.ceil(len(grams) * MIN_MATCH_RATIO))
+
+    matches = CompanySearchTrigram.objects.filter(gram__in=grams)
+    if queryset is not None:
+        matches = matches.filter(company__in=queryset.values('pk'))
+    hits = dict(
+        matches.values('company_id')
+        .annotate(hits=Count('id'))
+        .filter(hits__gte=min_hits)
+        .order_by('-hits')
+        .values_list('company_id', 'hits')[:CANDIDATES]
+    )
+    if not hits:
+        return []
+
+    base = queryset if queryset is not None else Company.objects.all()
+    companies = list(base.filter(pk__in=hits))
+    for company in companies:
+        score = hits[company.pk] / len(grams)
+        words = company.search_text.split()
+        if company.search_text.startswith(text):
+            score += 1.0
+        elif any(word.startswith(text) for word in words) or text in company.search_text:
+            score += 0.5
+        company.search_score = round(score, 3)
+    companies.sort(key=lambda c: (-c.search_score, c.name, c.pk))
+    return companies[:limit]
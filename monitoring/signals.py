@@ -0,0 +1,49 @@
+# monitoring/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from . import search
+from .live import publish_company_updates, publish_penalty_update
+from .models import Company, Notification, Penalty, Region
+from .notifications import notification_changed
+from .stats import invalidate_dashboard_stats
+from .summaries import invalidate_penalty_summaries
+
+
+def stats_changed(sender, **kwargs):
+    # Tranzaksiya tugamasdan tozalansa, parallel so'rov eski qiymatlarni qayta keshlab qo'yishi mumkin
+    transaction.on_commit(invalidate_dashboard_stats)
+
+
+def company_saved(sender, instance, **kwargs):
+    publish_company_updates([instance])
+
+
+def penalty_saved(sender, instance, **kwargs):
+    publish_penalty_update(instance)
+
+
+def penalty_summaries_changed(sender, instance, created=False, **kwargs):
+    # Yangi qoralama hisobotlarga kirmaydi; tasdiqlash/holat o'zgarishi kiradi
+    if created and instance.status == 'draft':
+        return
+    rows = [(instance.company_id, instance.created_at)]
+    transaction.on_commit(lambda: invalidate_penalty_summaries(rows))
+
+
+def connect_signals():
+    for model in (Company, Penalty):
+        post_save.connect(stats_changed, sender=model, dispatch_uid=f'stats_save_{model.__name__}')
+        post_delete.connect(stats_changed, sender=model, dispatch_uid=f'stats_delete_{model.__name__}')
+    # Jonli yangilanishlar (SSE)
+    post_save.connect(company_saved, sender=Company, dispatch_uid='live_company_saved')
+    post_save.connect(penalty_saved, sender=Penalty, dispatch_uid='live_penalty_saved')
+    # Davr ko'rsatkichlari (tugagan davr ham) jarimalardan keyin qayta hisoblanadi
+    post_save.connect(penalty_summaries_changed, sender=Penalty, dispatch_uid='summary_penalty_saved')
+    post_delete.connect(penalty_summaries_changed, sender=Penalty, dispatch_uid='summary_penalty_deleted')
+    # Qidiruv indeksi
+    post_save.connect(search.company_saved, sender=Company, dispatch_uid='search_company_saved')
+    post_save.connect(search.region_saved, sender=Region, dispatch_uid='search_region_saved')
+    # O'qilmagan xabarlar hisoblagichi
+    post_save.connect(notification_changed, sender=Notification, dispatch_uid='unread_notification_saved')
+    post_delete.connect(notification_changed, sender=Notification, dispatch_uid='unread_notification_deleted')
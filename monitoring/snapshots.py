@@ -0,0 +1,69 @@
+# monitoring/snapshots.py
+"""
+Korxona holatlarining kunlik snapshot'lari.
+
+take_status_snapshot() kuniga kamida bir marta (cron, take_status_snapshots
+buyrug'i) chaqiriladi va o'sha kun uchun hisoblagichlarni yozadi/yangilaydi.
+Oylik trend har oyning oxirgi snapshot'idan olinadi, shuning uchun o'tgan
+oylar o'sha paytdagi haqiqiy holatni ko'rsatadi.
+"""
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Company, CompanyStatusSnapshot
+
+SNAPSHOT_FIELDS = ('total_companies', 'good_count', 'moderate_count', 'bad_count', 'dangerous_count')
+
+
+def current_status_counts():
+    """Korxonalar holatini bitta so'rovda hisoblaydi."""
+    return Company.objects.aggregate(
+        total_companies=Count('id'),
+        good_count=Count('id', filter=Q(status='good')),
+        moderate_count=Count('id', filter=Q(status='moderate')),
+        bad_count=Count('id', filter=Q(status='bad')),
+        dangerous_count=Count('id', filter=Q(current_gas_amount__gt=F('max_allowed_gas'))),
+    )
+
+
+def counts_from_stats(stats):
+    """get_dashboard_stats() natijasini snapshot maydonlari ko'rinishiga o'tkazadi."""
+    return {
+        'total_companies': stats['total_companies'],
+        'good_count': stats['good_companies'],
+        'moderate_count': stats['moderate_companies'],
+        'bad_count': stats['bad_companies'],
+        'dangerous_count': stats['dangerous_companies'],
+    }
+
+
+def take_status_snapshot(date=None):
+    """Berilgan (standart: bugungi) kun uchun snapshot yozadi yoki yangilaydi."""
+    date = date or timezone.localdate()
+    snapshot, _ = CompanyStatusSnapshot.objects.update_or_create(
+        date=date, defaults=current_status_counts()
+    )
+    return snapshot
+
+
+def monthly_status_trend(year, live_counts=None):
+    """
+    year uchun 12 oylik trend: har bir oy uchun o'sha oyning oxirgi
+    snapshot'idagi hisoblagichlar ({field: son}) yoki snapshot bo'lmasa None.
+    live_counts berilsa va joriy oy uchun snapshot hali yo'q bo'lsa,
+    joriy oy uchun shu qiymatlar ishlatiladi.
+    Bitta so'rov, O(kunlar soni) qator.
+    """
+    months = [None] * 12
+    snapshots = (
+        CompanyStatusSnapshot.objects.filter(date__year=year)
+        .order_by('date')
+        .values('date', *SNAPSHOT_FIELDS)
+    )
+    for row in snapshots:
+        months[row['date'].month - 1] = {field: row[field] for field in SNAPSHOT_FIELDS}
+
+    today = timezone.localdate()
+    if live_counts is not None and today.year == year and months[today.month - 1] is None:
+        months[today.month - 1] = {field: live_counts[field] for field in SNAPSHOT_FIELDS}
+    return months
@@ -0,0 +1,46 @@
+# monitoring/stats.py
+"""
+Dashboard statistikasi xizmati (Django cache orqali).
+
+dashboard_stats har 30 soniyada so'raladi, shuning uchun hisoblagichlar
+keshdan beriladi. Company/Penalty saqlanganda yoki o'chirilganda
+(monitoring/signals.py) va ingestion korxona holatini o'zgartirganda kesh
+bekor qilinadi. Signal chetlab o'tiladigan joylarda (queryset.update)
+invalidate_dashboard_stats() ni qo'lda chaqiring.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .live import publish_stats_changed
+from .models import Penalty
+from .snapshots import current_status_counts
+
+CACHE_KEY = 'monitoring:dashboard_stats'
+# Boshqa jarayonlardagi lokal keshlar uchun eskirish chegarasi (soniya)
+CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_STATS_CACHE_TIMEOUT', 60)
+
+
+def get_dashboard_stats():
+    """
+    Qaytaradi: total_companies, good_companies, moderate_companies,
+    bad_companies, dangerous_companies, active_penalties.
+    """
+    stats = cache.get(CACHE_KEY)
+    if stats is None:
+        counts = current_status_counts()
+        stats = {
+            'total_companies': counts['total_companies'],
+            'good_companies': counts['good_count'],
+            'moderate_companies': counts['moderate_count'],
+            'bad_companies': counts['bad_count'],
+            'dangerous_companies': counts['dangerous_count'],
+            'active_penalties': Penalty.objects.filter(status='active').count(),
+        }
+        cache.set(CACHE_KEY, stats, CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate_dashboard_stats(**kwargs):
+    """Keshni bekor qiladi (signal handler sifatida ham ishlatiladi)."""
+    cache.delete(CACHE_KEY)
+    publish_stats_changed()
@@ -0,0 +1,226 @@
+# monitoring/streaming.py
+"""
+Uzoq davom etadigan sensor shlyuz (gateway) ulanishlari uchun NDJSON oqimi.
+
+Django'ning ASGIHandler'i so'rov tanasini to'liq o'qib bo'lgandan keyingina
+view'ni chaqiradi, shuning uchun oqim yo'li to'g'ridan-to'g'ri ASGI darajasida
+ishlaydi (core/asgi.py dagi SensorStreamRouter orqali):
+
+- tana bo'laklari (chunk) kelishi bilan qatorlarga ajratiladi;
+- o'qishlar hajm (SENSOR_STREAM_BATCH_SIZE) yoki vaqt
+  (SENSOR_STREAM_FLUSH_INTERVAL) bo'yicha mikro-partiyalarda yoziladi;
+- xotirada faqat joriy partiya va tugallanmagan qator saqlanadi;
+- partiya yozilayotganda keyingi bo'lak o'qilmaydi, shu sababli baza
+  sekinlashsa server buferi to'ladi va mijoz (TCP oqim nazorati orqali)
+  sekinlashadi (back-pressure).
+"""
+import asyncio
+import json
+import logging
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.db import close_old_connections
+from django.utils.crypto import constant_time_compare
+
+from .ingest import ingest_readings
+
+STREAM_PATH = '/company/sensor-stream/'
+BATCH_SIZE = getattr(settings, 'SENSOR_STREAM_BATCH_SIZE', 500)
+FLUSH_INTERVAL = getattr(settings, 'SENSOR_STREAM_FLUSH_INTERVAL', 1.0)  # soniya
+MAX_LINE_BYTES = 64 * 1024
+# Javobda qaytariladigan rad etilgan qatorlar soni (xotira cheklangan bo'lishi uchun)
+MAX_REPORTED_ERRORS = 100
+
+logger = logging.getLogger(__name__)
+
+
+class SensorStreamRouter:
+    """
+    STREAM_PATH ga kelgan HTTP so'rovlarni oqim handler'iga, qolganlarini
+    Django ilovasiga yo'naltiradi.
+    """
+
+    def __init__(self, django_application):
+        self.django_application = django_application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == STREAM_PATH:
+            return await sensor_stream(scope, receive, send)
+        return await self.django_application(scope, receive, send)
+
+
+def _get_cookie(scope, name):
+    for key, value in scope.get('headers', []):
+        if key == b'cookie':
+            for part in value.decode('latin-1').split(';'):
+                k, _, v = part.strip().partition('=')
+                if k == name:
+                    return v
+    return None
+
+
+def _resolve_user(session_key):
+    """Sessiya kalitidan foydalanuvchini (korxonasi bilan birga) topadi."""
+    close_old_connections()
+    if not session_key:
+        return None
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    user_id = session.get(SESSION_KEY)
+    if user_id is None:
+        return None
+    User = get_user_model()
+    user = User.objects.select_related('company').filter(pk=user_id, is_active=True).first()
+    if user is None:
+        return None
+    if not constant_time_compare(session.get(HASH_SESSION_KEY, ''), user.get_session_auth_hash()):
+        return None
+    return user
+
+
+def _ingest_batch(batch, company):
+    try:
+        return ingest_readings(batch, company=company)
+    finally:
+        close_old_connections()
+
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii')),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def sensor_stream(scope, receive, send):
+    """
+    POST /company/sensor-stream/ (Transfer-Encoding: chunked, NDJSON).
+    Har bir qator: {"gas_amount": ..} (+ qo'mita uchun company_id/stir_number).
+    Oqim tugagach umumiy natija JSON ko'rinishida qaytariladi.
+    """
+    if scope['method'] != 'POST':
+        return await _send_json(send, 405, {'success': False, 'error': 'Faqat POST so\'rovi qabul qilinadi'})
+
+    user = await sync_to_async(_resolve_user)(_get_cookie(scope, settings.SESSION_COOKIE_NAME))
+    if user is None:
+        return await _send_json(send, 401, {'success': False, 'error': 'Avtorizatsiya talab qilinadi'})
+
+    company = None
+    if user.user_type == 'factory':
+        company = user.company
+        if company is None:
+            return await _send_json(send, 404, {'success': False, 'error': 'Korxona topilmadi'})
+
+    loop = asyncio.get_running_loop()
+    totals = {'accepted': 0, 'rejected': 0, 'batches': 0}
+    errors = []
+    batch = []
+    batch_lines = []
+    batch_started = None
+    line_no = 0
+
+    async def flush():
+        nonlocal batch, batch_lines, batch_started
+        if not batch:
+            return
+        result = await sync_to_async(_ingest_batch)(batch, company)
+        totals['accepted'] += result['accepted']
+        totals['rejected'] += result['rejected']
+        totals['batches'] += 1
+        for row in result['results']:
+            if row['status'] == 'rejected' and len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'line': batch_lines[row['index']], 'error': row['error']})
+        batch, batch_lines, batch_started = [], [], None
+
+    def add_line(raw):
+        nonlocal batch_started, line_no
+        line_no += 1
+        raw = raw.strip()
+        if not raw:
+            return
+        try:
+            reading = json.loads(raw)
+        except ValueError:
+            reading = None
+        if batch_started is None:
+            batch_started = loop.time()
+        batch.append(reading)
+        batch_lines.append(line_no)
+
+    buffer = bytearray()
+    discarding = False  # juda uzun qatorning qolgan qismini tashlab yuborish
+    receive_task = None
+    more_body = True
+    disconnected = False
+
+    try:
+        while more_body:
+            if receive_task is None:
+                receive_task = asyncio.ensure_future(receive())
+
+            timeout = None
+            if batch_started is not None:
+                timeout = max(0.0, FLUSH_INTERVAL - (loop.time() - batch_started))
+            done, _ = await asyncio.wait({receive_task}, timeout=timeout)
+            if not done:
+                # Vaqt bo'yicha flush; receive_task keyingi aylanishda kutiladi
+                await flush()
+                continue
+
+            message = receive_task.result()
+            receive_task = None
+
+            if message['type'] == 'http.disconnect':
+                # Mijoz uzildi: kelib bo'lgan o'qishlarni saqlab qo'yamiz
+                disconnected = True
+                await flush()
+                return
+
+            buffer.extend(message.get('body', b''))
+            more_body = message.get('more_body', False)
+
+            while True:
+                newline = buffer.find(b'\n')
+                if newline == -1:
+                    break
+                line = bytes(buffer[:newline])
+                del buffer[:newline + 1]
+                if discarding:
+                    discarding = False
+                    continue
+                add_line(line)
+                if len(batch) >= BATCH_SIZE:
+                    await flush()
+
+            if len(buffer) > MAX_LINE_BYTES:
+                line_no += 1
+                totals['rejected'] += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({'line': line_no, 'error': 'Qator juda uzun'})
+                buffer.clear()
+                discarding = True
+
+        if buffer and not discarding:
+            add_line(bytes(buffer))
+        await flush()
+    except Exception:
+        # Yozishdagi xatolik (masalan, baza) ham API'ning JSON javobi bilan qaytadi
+        logger.exception("Sensor oqimini qayta ishlashda xatolik")
+        if receive_task is not None:
+            receive_task.cancel()
+        if not disconnected:
+            await _send_json(send, 500, {
+                'success': False, 'error': "Ma'lumotlarni saqlashda xatolik yuz berdi",
+                **totals, 'errors': errors,
+            })
+        return
+
+    await _send_json(send, 200, {'success': True, **totals, 'errors': errors})
@@ -0,0 +1,168 @@
+# monitoring/summaries.py
+"""
+Korxona hisobotlari uchun davr ko'rsatkichlari (CompanyPeriodSummary).
+
+- oylik qator kunlik va soatlik SensorRollup'lardan hamda davr jarimalaridan
+  hisoblanadi (xom SensorData o'qilmaydi);
+- chorak va yil oylik qatorlardan yig'iladi;
+- tugagan davr qatori is_final=True bilan saqlanadi va boshqa hisoblanmaydi,
+  shuning uchun o'tgan davr hisoboti tarix hajmidan qat'i nazar bitta
+  so'rov bilan olinadi. Tugamagan davr REFRESH_SECONDS da bir yangilanadi;
+- jarima yaratilganda yoki holati o'zgarganda shu oy (va uni o'z ichiga
+  olgan chorak/yil) qatorlari invalidate_penalty_summaries() bilan
+  o'chiriladi - tugagan davr bo'lsa ham.
+"""
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from .models import CompanyPeriodSummary, Penalty, Report, SensorRollup
+from .periods import aware_day_range, months_in_period
+
+REFRESH_SECONDS = getattr(settings, 'REPORT_REUSE_SECONDS', 900)
+
+SUMMARY_FIELDS = (
+    'sample_count', 'gas_sum', 'gas_min', 'gas_max', 'exceed_count', 'exceed_hours',
+    'penalty_count', 'penalty_trees', 'penalty_excess',
+)
+
+
+def _compute_month(company, period_start, period_end):
+    start, end = aware_day_range(period_start, period_end)
+    rollups = SensorRollup.objects.filter(company=company, bucket_start__gte=start, bucket_start__lt=end)
+    readings = rollups.filter(granularity='day').aggregate(
+        sample_count=Sum('sample_count'),
+        gas_sum=Sum('gas_sum'),
+        gas_min=Min('gas_min'),
+        gas_max=Max('gas_max'),
+        exceed_count=Sum('exceed_count'),
+    )
+    penalties = Penalty.objects.filter(
+        company=company, created_at__gte=start, created_at__lt=end,
+    ).exclude(status='draft').aggregate(
+        penalty_count=Count('id'),
+        penalty_trees=Sum('trees_required'),
+        penalty_excess=Sum('excess_amount'),
+    )
+    return {
+        'sample_count': readings['sample_count'] or 0,
+        'gas_sum': readings['gas_sum'] or 0.0,
+        'gas_min': readings['gas_min'],
+        'gas_max': readings['gas_max'],
+        'exceed_count': readings['exceed_count'] or 0,
+        'exceed_hours': rollups.filter(granularity='hour', exceed_count__gt=0).count(),
+        'penalty_count': penalties['penalty_count'],
+        'penalty_trees': penalties['penalty_trees'] or 0,
+        'penalty_excess': penalties['penalty_excess'] or Decimal('0'),
+    }
+
+
+def _combine(summaries):
+    values = {
+        'sample_count': 0, 'gas_sum': 0.0, 'gas_min': None, 'gas_max': None, 'exceed_count': 0,
+        'exceed_hours': 0, 'penalty_count': 0, 'penalty_trees': 0, 'penalty_excess': Decimal('0'),
+    }
+    for summary in summaries:
+        for field in ('sample_count', 'gas_sum', 'exceed_count', 'exceed_hours',
+                      'penalty_count', 'penalty_trees', 'penalty_excess'):
+            values[field] += getattr(summary, field)
+        if summary.gas_min is not None:
+            values['gas_min'] = summary.gas_min if values['gas_min'] is None else min(values['gas_min'], summary.gas_min)
+        if summary.gas_max is not None:
+            values['gas_max'] = summary.gas_max if values['gas_max'] is None else max(values['gas_max'], summary.gas_max)
+    return values
+
+
+def get_company_summary(company, report_type, period_start, period_end, period_label):
+    """Davr ko'rsatkichlarini qaytaradi (kerak bo'lsa hisoblab saqlaydi)."""
+    now = timezone.now()
+    summary = CompanyPeriodSummary.objects.filter(
+        company=company, report_type=report_type, period=period_label,
+    ).first()
+    if summary is not None and (
+        summary.is_final or summary.computed_at >= now - datetime.timedelta(seconds=REFRESH_SECONDS)
+    ):
+        return summary
+
+    if report_type == 'monthly':
+        values = _compute_month(company, period_start, period_end)
+    else:
+        today = timezone.localdate()
+        values = _combine(
+            get_company_summary(company, 'monthly', first, last, label)
+            for first, last, label in months_in_period(period_start, period_end)
+            if first <= today
+        )
+    _, closed_at = aware_day_range(period_end, period_end)
+    summary, _ = CompanyPeriodSummary.objects.update_or_create(
+        company=company, report_type=report_type, period=period_label,
+        defaults={
+            'period_start': period_start,
+            'period_end': period_end,
+            'is_final': now >= closed_at,
+            **values,
+        },
+    )
+    return summary
+
+
+def breakdown_rows(company, report_type, period_start, period_end):
+    """
+    Oylik hisobot uchun kunlar, chorak/yil uchun oylar bo'yicha qatorlar:
+    (davr, o'lchovlar, o'rtacha, minimal, maksimal, me'yordan oshgan o'lchovlar).
+    """
+    if report_type != 'monthly':
+        today = timezone.localdate()
+        for first, last, label in months_in_period(period_start, period_end):
+            if first > today:
+                break
+            month = get_company_summary(company, 'monthly', first, last, label)
+            yield (label, month.sample_count, month.gas_avg, month.gas_min, month.gas_max, month.exceed_count)
+        return
+    start, end = aware_day_range(period_start, period_end)
+    days = SensorRollup.objects.filter(
+        company=company, granularity='day', bucket_start__gte=start, bucket_start__lt=end,
+    ).order_by('bucket_start')
+    for day in days:
+        yield (
+            timezone.localtime(day.bucket_start).strftime('%d.%m.%Y'),
+            day.sample_count, day.gas_avg, day.gas_min, day.gas_max, day.exceed_count,
+        )
+
+
+def invalidate_summaries(since, until, company_ids=None):
+    """
+    [since, until) sanalariga tegadigan ko'rsatkichlar va ulardan yaratilgan
+    korxona hisobotlarini o'chiradi (agregatlar qayta qurilgandan keyin).
+    """
+    summaries = CompanyPeriodSummary.objects.filter(period_start__lt=until, period_end__gte=since)
+    if company_ids is not None:
+        summaries = summaries.filter(company_id__in=company_ids)
+    keys = set(summaries.values_list('company_id', 'report_type', 'period'))
+    for company_id, report_type, period in keys:
+        for report in Report.objects.filter(company_id=company_id, report_type=report_type, period=period):
+            report.file_path.delete(save=False)
+            report.delete()
+    deleted, _ = summaries.delete()
+    return deleted
+
+
+def invalidate_penalty_summaries(penalties):
+    """
+    Jarimalar yaratilgan oylar ko'rsatkichlari va hisobotlarini o'chiradi
+    (jarima qo'shilgan yoki holati o'zgargandan keyin).
+    penalties: (company_id, created_at) juftlari.
+    """
+    months = {
+        (company_id, timezone.localtime(created_at).date().replace(day=1))
+        for company_id, created_at in penalties
+        if company_id is not None
+    }
+    deleted = 0
+    for company_id, month in sorted(months):
+        next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+        deleted += invalidate_summaries(month, next_month, company_ids=[company_id])
+    return deleted
@@ -1,3 +1,1294 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import authenticate
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import geo, instrumentation
+from .detector import detector
+from .ingest import ingest_readings
+from .live import InProcessBroker
+from .notifications import count_bits, create_broadcast, get_unread_count, mark_read, recent_broadcasts
+from .models import (
+    Broadcast, Company, CompanyPeriodSummary, CompanyStatusSnapshot, IndustryType, Notification, Penalty, Region,
+    CompanySearchTrigram, Report, ReportJob, RetentionCheckpoint, SensorData, SensorRollup, User,
+)
+from .penalties import issue_penalties
+from .reports import claim_next_job, enqueue_report, get_company_report, run_job
+from .retention import apply_retention
+from .rollups import rebuild_rollups
+from .search import rebuild_search_index, search_companies
+from .snapshots import take_status_snapshot
+from .streaming import STREAM_PATH, sensor_stream
+from .stats import CACHE_KEY as STATS_CACHE_KEY, get_dashboard_stats, invalidate_dashboard_stats
+
+
+def make_company(region, industry, index, **kwargs):
+    defaults = {
+        'name': f'Korxona {index}',
+        'stir_number': f'{index:09d}',
+        'region': region,
+        'industry_type': industry,
+        'latitude': 41.3,
+        'longitude': 69.2,
+    }
+    defaults.update(kwargs)
+    return Company.objects.create(**defaults)
+
+
+class ReportDataQueryCountTests(TestCase):
+    """report_data oylik trendi yil va korxonalar sonidan qat'i nazar o'zgarmas so'rovlar bilan hisoblanadi."""
+
+    def setUp(self):
+        cache.clear()
+        self.region = Region.objects.create(name='Toshkent')
+        self.industry = IndustryType.objects.create(name='Kimyo')
+        self.user = User.objects.create_user('qomita', password='parol', user_type='committee')
+        self.client.force_login(self.user)
+
+    def add_companies(self, count, year, month):
+        created_at = timezone.make_aware(datetime.datetime(year, month, 15, 12, 0))
+        start = Company.objects.count()
+        for i in range(start, start + count):
+            company = make_company(
+                self.region, self.industry, i,
+                current_gas_amount=150 if i % 3 == 0 else 50,
+            )
+            Company.objects.filter(pk=company.pk).update(created_at=created_at)
+
+    def get_report(self, year):
+        return self.client.get(reverse('report_data'), {'year': year})
+
+    def assert_report_queries(self, year):
+        # sovuq kesh: sessiya + foydalanuvchi + korxona agregati + faol jarimalar
+        # + snapshot'lar + sanoat turlari
+        invalidate_dashboard_stats()
+        with self.assertNumQueries(6):
+            self.get_report(year)
+        # issiq kesh: statistika so'rovlarisiz
+        with self.assertNumQueries(4):
+            self.get_report(year)
+
+    def test_query_count_is_constant(self):
+        self.assert_report_queries(2024)
+
+        self.add_companies(3, 2024, 2)
+        self.assert_report_queries(2024)
+
+        self.add_companies(30, 2024, 7)
+        for day in range(1, 60):
+            take_status_snapshot(datetime.date(2024, 1, 1) + datetime.timedelta(days=day))
+        IndustryType.objects.create(name='Energetika')
+        self.assert_report_queries(2024)
+        self.assert_report_queries(2019)
+
+    def test_monthly_trend_reads_last_snapshot_of_month(self):
+        CompanyStatusSnapshot.objects.create(date=datetime.date(2024, 2, 3), good_count=1, bad_count=9)
+        CompanyStatusSnapshot.objects.create(date=datetime.date(2024, 2, 28), good_count=2, bad_count=1)
+        CompanyStatusSnapshot.objects.create(date=datetime.date(2024, 7, 31), good_count=3, moderate_count=1, bad_count=2)
+
+        trend = self.get_report(2024).json()['monthly_trend']
+
+        self.assertEqual([row['label'] for row in trend][:2], ['2024-01', '2024-02'])
+        self.assertIsNone(trend[0]['good_count'])
+        self.assertEqual((trend[1]['good_count'], trend[1]['bad_count']), (2, 1))
+        self.assertEqual((trend[6]['good_count'], trend[6]['moderate_count'], trend[6]['bad_count']), (3, 1, 2))
+        self.assertIsNone(trend[11]['bad_count'])
+
+    def test_current_month_falls_back_to_live_counts(self):
+        today = timezone.localdate()
+        self.add_companies(3, today.year, today.month)  # 1 ta xavfli, 2 ta yaxshi
+
+        data = self.get_report(today.year).json()
+        current = data['monthly_trend'][today.month - 1]
+
+        self.assertEqual((current['good_count'], current['bad_count']), (2, 1))
+        self.assertEqual(data['stats']['total_companies'], 3)
+        self.assertEqual(data['stats']['dangerous_companies'], 1)
+
+        take_status_snapshot()
+        Company.objects.update(current_gas_amount=500)
+        Company.objects.get(pk=Company.objects.first().pk).save()
+        current = self.get_report(today.year).json()['monthly_trend'][today.month - 1]
+        self.assertEqual((current['good_count'], current['bad_count']), (2, 1))
+
+
+class DashboardStatsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.region = Region.objects.create(name='Toshkent')
+        self.industry = IndustryType.objects.create(name='Kimyo')
+        self.company = make_company(self.region, self.industry, 1, current_gas_amount=50)
+        self.user = User.objects.create_user('qomita', password='parol', user_type='committee')
+        self.client.force_login(self.user)
+
+    def test_polling_is_served_from_cache(self):
+        self.client.get(reverse('dashboard_stats'))
+        # faqat sessiya va foydalanuvchi so'rovlari
+        with self.assertNumQueries(2):
+            data = self.client.get(reverse('dashboard_stats')).json()
+        self.assertEqual(data, {'total_companies': 1, 'dangerous_companies': 0, 'active_penalties': 0})
+
+    def test_model_saves_invalidate_cache(self):
+        self.assertEqual(get_dashboard_stats()['active_penalties'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Penalty.objects.create(company=self.company, deadline=datetime.date(2030, 1, 1))
+            # Tranzaksiya tugaguncha kesh tozalanmaydi
+            self.assertIsNotNone(cache.get(STATS_CACHE_KEY))
+        self.assertEqual(get_dashboard_stats()['active_penalties'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_company(self.region, self.industry, 2, current_gas_amount=500)
+        self.assertEqual(get_dashboard_stats()['dangerous_companies'], 1)
+
+    def test_ingest_invalidates_only_on_status_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_readings([{'gas_amount': 60}], company=self.company)
+        stats = get_dashboard_stats()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            ingest_readings([{'gas_amount': 70}], company=self.company)
+        self.assertEqual(callbacks, [])
+        self.assertIsNotNone(cache.get(STATS_CACHE_KEY))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_readings([{'gas_amount': 170}], company=self.company)
+        self.assertEqual(get_dashboard_stats()['bad_companies'], 1)
+        self.assertNotEqual(stats, get_dashboard_stats())
+
+
+class LiveUpdatesTests(TestCase):
+    def setUp(self):
+        self.region = Region.objects.create(name='Toshkent')
+        self.industry = IndustryType.objects.create(name='Kimyo')
+        self.company = make_company(self.region, self.industry, 1)
+        self.other = make_company(self.region, self.industry, 2)
+
+    def test_broker_delivers_ingest_deltas_to_subscribed_channels(self):
+        broker = InProcessBroker()
+
+        async def scenario():
+            company_sub = broker.subscribe([f'company:{self.company.pk}'])
+            other_sub = broker.subscribe([f'company:{self.other.pk}'])
+            with mock.patch('monitoring.live.get_broker', return_value=broker):
+                await sync_to_async(self._ingest)(self.company, 150)
+            event = await company_sub.get(timeout=1)
+            self.assertTrue(other_sub.queue.empty())
+            return event
+
+        event = async_to_sync(scenario)()
+        self.assertEqual(event['type'], 'company')
+        self.assertEqual((event['id'], event['current_gas_amount'], event['status']), (self.company.pk, 150, 'bad'))
+
+    def _ingest(self, company, gas_amount):
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_readings([{'gas_amount': gas_amount}], company=company)
+
+    async def test_channel_authorization(self):
+        factory_user = await User.objects.acreate_user(
+            'korxona', password='parol', user_type='factory', company=self.company,
+        )
+        await self.async_client.aforce_login(factory_user)
+        response = await self.async_client.get(reverse('live_events'), {'channel': f'company:{self.other.pk}'})
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.get(reverse('live_events'), {'channel': 'committee'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_unavailable_under_wsgi(self):
+        # WSGI cheksiz oqimni kutib qolmasligi uchun darhol 503
+        response = self.client.get(reverse('live_events'))
+        self.assertEqual(response.status_code, 503)
+
+
+class CompanyMapDataTests(TestCase):
+    def setUp(self):
+        self.region = Region.objects.create(name='Toshkent')
+        self.industry = IndustryType.objects.create(name='Kimyo')
+        self.company = make_company(self.region, self.industry, 1)
+
+    def test_unchanged_data_returns_304(self):
+        response = self.client.get(reverse('company_map_data'))
+        feature = response.json()['features'][0]
+        self.assertEqual(feature['id'], self.company.pk)
+        self.assertEqual(feature['geometry']['coordinates'], [69.2, 41.3])
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('company_map_data'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_readings([{'gas_amount': 150}], company=self.company)
+        response = self.client.get(reverse('company_map_data'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['features'][0]['properties']['status'], 'bad')
+
+
+class CompanyViewportTests(TestCase):
+    def setUp(self):
+        region = Region.objects.create(name='Toshkent')
+        industry = IndustryType.objects.create(name='Kimyo')
+        self.inside = [
+            make_company(region, industry, 1, latitude=41.30, longitude=69.20),
+            make_company(region, industry, 2, latitude=41.31, longitude=69.21, current_gas_amount=150),
+        ]
+        self.outside = make_company(region, industry, 3, latitude=39.65, longitude=66.96)
+
+    def get_viewport(self, bbox, zoom):
+        return self.client.get(reverse('company_viewport'), {'bbox': bbox, 'zoom': zoom})
+
+    def test_returns_only_companies_in_bbox(self):
+        self.assertEqual(self.inside[0].geohash, geo.encode(41.30, 69.20))
+        data = self.get_viewport('69.1,41.2,69.4,41.4', 16).json()
+        self.assertFalse(data['clustered'])
+        self.assertEqual(sorted(f['id'] for f in data['features']), [c.pk for c in self.inside])
+
+    def test_low_zoom_is_clustered(self):
+        data = self.get_viewport('56,37,73,46', 6).json()
+        self.assertTrue(data['clustered'])
+        clusters = sorted((f['properties'] for f in data['features']), key=lambda p: p['count'])
+        self.assertEqual([(p['count'], p['bad']) for p in clusters], [(1, 0), (2, 1)])
+
+    def test_invalid_bbox(self):
+        self.assertEqual(self.get_viewport('69.4,41.2,69.1,41.4', 12).status_code, 400)
+
+
+class CompaniesNearbyTests(TestCase):
+    def setUp(self):
+        region = Region.objects.create(name='Toshkent')
+        industry = IndustryType.objects.create(name='Kimyo')
+        self.far = make_company(region, industry, 1, latitude=41.3111, longitude=69.2797)  # ~3.3 km
+        self.near = make_company(region, industry, 2, latitude=41.3120, longitude=69.2420, current_gas_amount=150)
+        make_company(region, industry, 3, latitude=39.6542, longitude=66.9597)  # Samarqand
+        self.client.force_login(User.objects.create_user('inspektor', password='parol', user_type='committee'))
+
+    def test_sorted_by_distance_within_radius(self):
+        data = self.client.get(reverse('companies_nearby'), {'lat': 41.3111, 'lng': 69.2406, 'radius': 5}).json()
+        features = data['features']
+        self.assertEqual([f['id'] for f in features], [self.near.pk, self.far.pk])
+        self.assertEqual(features[0]['properties']['status'], 'bad')
+        self.assertAlmostEqual(features[1]['properties']['distance_m'], 3266, delta=5)
+
+        data = self.client.get(reverse('companies_nearby'), {'lat': 41.3111, 'lng': 69.2406, 'radius': 1}).json()
+        self.assertEqual([f['id'] for f in data['features']], [self.near.pk])
+
+
+class DownloadReportExportTests(TestCase):
+    def setUp(self):
+        region = Region.objects.create(name='Toshkent')
+        industry = IndustryType.objects.create(name='Kimyo')
+        self.company = make_company(region, industry, 1, name="Qo'qon zavodi", current_gas_amount=150)
+        Penalty.objects.create(company=self.company, deadline=datetime.date(2030, 1, 1))
+        self.client.force_login(User.objects.create_user('qomita', password='parol', user_type='committee'))
+        today = timezone.localdate()
+        self.params = {'report_type': 'monthly', 'year': today.year, 'month': today.month}
+
+    def download(self, **params):
+        response = self.client.get(reverse('download_report'), {**self.params, **params})
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_and_ndjson(self):
+        response, body = self.download(format='csv')
+        lines = body.decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[0].split(',')[:2], ['ID', 'Korxona nomi'])
+        self.assertIn("Qo'qon zavodi", lines[1])
+
+        response, body = self.download(format='ndjson', dataset='penalties')
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([row['Korxona'] for row in rows], ["Qo'qon zavodi"])
+
+    def test_xlsx(self):
+        response, body = self.download()
+        self.assertEqual(int(response['Content-Length']), len(body))
+        workbook = openpyxl.load_workbook(io.BytesIO(body), read_only=True)
+        self.assertEqual(workbook.sheetnames, ['Umumiy maʼlumot', 'Korxonalar', 'Jarimalar', 'Oylik trend'])
+        rows = list(workbook['Korxonalar'].values)
+        self.assertEqual(rows[1][1], "Qo'qon zavodi")
+        self.assertEqual(len(list(workbook['Oylik trend'].values)), 13)
+
+
+class ReportJobTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        region = Region.objects.create(name='Toshkent')
+        industry = IndustryType.objects.create(name='Kimyo')
+        make_company(region, industry, 1)
+        self.client.force_login(User.objects.create_user('qomita', password='parol', user_type='committee'))
+
+    def enqueue(self, **params):
+        return self.client.post(reverse('create_report_job'), {'report_type': 'monthly', 'year': 2024, 'month': 3, **params})
+
+    def test_job_lifecycle_and_reuse(self):
+        response = self.enqueue()
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['job_id']
+        # navbatdagi bir xil so'rov yangi ish yaratmaydi
+        self.assertEqual(self.enqueue().json()['job_id'], job_id)
+
+        job = claim_next_job('test')
+        self.assertEqual((job.id, job.status, job.attempts), (job_id, 'running', 1))
+        self.assertIsNone(claim_next_job('test'))
+        self.assertEqual(run_job(job), 'done')
+
+        status = self.client.get(reverse('report_job_status', args=[job_id])).json()
+        self.assertEqual(status['status'], 'done')
+        response = self.client.get(status['download_url'])
+        workbook = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        self.assertIn('Korxonalar', workbook.sheetnames)
+
+        # tugagan davr: tayyor fayl qayta ishlatiladi
+        response = self.enqueue()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['download_url'], status['download_url'])
+        self.assertEqual(Report.objects.count(), 1)
+
+    def test_concurrent_enqueue_returns_in_flight_job(self):
+        queued = ReportJob.objects.get(id=self.enqueue().json()['job_id'])
+        args = (queued.report_type, queued.period_start, queued.period_end, queued.period)
+        # parallel so'rov: birinchi navbat tekshiruvi hali ishni ko'rmagan
+        with mock.patch.object(ReportJob.objects, 'filter', side_effect=self.stale_first_filter()):
+            job = enqueue_report(*args)
+        self.assertEqual(job.id, queued.id)
+        self.assertEqual(ReportJob.objects.count(), 1)
+
+        # navbatdagi ish INSERT xatosidan keyin, qayta o'qishdan oldin tugaydi
+        def finish_job():
+            run_job(claim_next_job('test'))
+
+        with mock.patch.object(ReportJob.objects, 'filter', side_effect=self.stale_first_filter(finish_job)):
+            job = enqueue_report(*args)
+        self.assertEqual((job.status, job.report_id), ('done', ReportJob.objects.get(id=queued.id).report_id))
+
+    def stale_first_filter(self, before_retry=None):
+        real_filter = ReportJob.objects.filter
+        calls = []
+
+        def fake(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                return ReportJob.objects.none()
+            if len(calls) == 2 and before_retry is not None:
+                with mock.patch.object(ReportJob.objects, 'filter', real_filter):
+                    before_retry()
+            return real_filter(*args, **kwargs)
+
+        return fake
+
+    def test_failed_job_is_retried_then_failed(self):
+        job_id = self.enqueue(month=4).json()['job_id']
+        with mock.patch('monitoring.reports.build_committee_report', side_effect=RuntimeError('xato')):
+            for _ in range(3):
+                run_job(claim_next_job('test'))
+        job = ReportJob.objects.get(id=job_id)
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertIn('RuntimeError', job.error)
+
+
+class CompanyReportTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        region = Region.objects.create(name='Toshkent')
+        industry = IndustryType.objects.create(name='Kimyo')
+        self.company = make_company(region, industry, 1)
+        self.user = User.objects.create_user('korxona', password='parol', user_type='factory', company=self.company)
+        self.client.force_login(self.user)
+
+        def local(*args):
+            return timezone.make_aware(datetime.datetime(*args))
+
+        for day, count, total, low, high, exceeded in ((1, 2, 230, 80, 150, 1), (2, 1, 90, 90, 90, 0)):
+            SensorRollup.objects.create(
+                company=self.company, granularity='day', bucket_start=local(2024, 3, day),
+                sample_count=count, gas_sum=total, gas_min=low, gas_max=high, exceed_count=exceeded,
+            )
+        SensorRollup.objects.create(
+            company=self.company, granularity='hour', bucket_start=local(2024, 3, 1, 10),
+            sample_count=2, gas_sum=230, gas_min=80, gas_max=150, exceed_count=1,
+        )
+        SensorRollup.objects.create(
+            company=self.company, granularity='day', bucket_start=local(2024, 7, 9),
+            sample_count=1, gas_sum=20, gas_min=20, gas_max=20,
+        )
+        penalty = Penalty.objects.create(company=self.company, deadline=datetime.date(2024, 6, 1), trees_required=50)
+        Penalty.objects.filter(pk=penalty.pk).update(created_at=local(2024, 3, 5, 9))
+
+    def download(self, report_type, **params):
+        response = self.client.get(reverse('download_company_report', args=[report_type]), params)
+        workbook = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        return {name: list(workbook[name].values) for name in workbook.sheetnames}
+
+    def test_monthly_report_from_rollups(self):
+        sheets = self.download('monthly', year=2024, month=3)
+        overview = dict(zip(*sheets['Umumiy maʼlumot']))
+        self.assertEqual(overview["O'lchovlar soni"], 3)
+        self.assertAlmostEqual(overview["O'rtacha gaz (kg/soat)"], 320 / 3)
+        self.assertEqual((overview['Minimal (kg/soat)'], overview['Maksimal (kg/soat)']), (80, 150))
+        self.assertEqual((overview["Me'yordan oshgan soatlar"], overview['Jarimalar soni']), (1, 1))
+        self.assertEqual([row[0] for row in sheets['Kunlar'][1:]], ['01.03.2024', '02.03.2024'])
+        self.assertTrue(CompanyPeriodSummary.objects.get(period='2024-03').is_final)
+
+    def test_penalty_changes_invalidate_closed_period(self):
+        def penalty_count():
+            return dict(zip(*self.download('monthly', year=2024, month=3)['Umumiy maʼlumot']))['Jarimalar soni']
+
+        self.assertEqual(penalty_count(), 1)
+        draft = Penalty.objects.create(
+            company=self.company, deadline=datetime.date(2024, 6, 1), trees_required=10, status='draft',
+        )
+        Penalty.objects.filter(pk=draft.pk).update(created_at=timezone.make_aware(datetime.datetime(2024, 3, 20, 9)))
+        # qoralama hisobotga kirmaydi, tayyor (is_final) qator o'zgarmaydi
+        self.assertEqual(penalty_count(), 1)
+
+        self.client.force_login(User.objects.create_superuser('admin', password='parol'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:monitoring_penalty_changelist'), {
+                'action': 'approve_drafts', '_selected_action': [draft.pk],
+            })
+        self.assertFalse(Report.objects.filter(company=self.company, period='2024-03').exists())
+        self.client.force_login(self.user)
+        self.assertEqual(penalty_count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Penalty.objects.get(pk=draft.pk).delete()
+        self.assertEqual(penalty_count(), 1)
+
+    def test_yearly_report_combines_months_and_closed_period_is_reused(self):
+        sheets = self.download('yearly', year=2024)
+        overview = dict(zip(*sheets['Umumiy maʼlumot']))
+        self.assertEqual((overview["O'lchovlar soni"], overview['Minimal (kg/soat)']), (4, 20))
+        self.assertEqual(len(sheets['Oylar']), 13)
+
+        # sessiya, foydalanuvchi+korxona (get_user JOIN), tayyor hisobot
+        with self.assertNumQueries(3):
+            self.client.get(reverse('download_company_report', args=['yearly']), {'year': 2024})
+        self.assertEqual(Report.objects.filter(company=self.company).count(), 1)
+
+    def test_open_period_report_replaces_previous_file(self):
+        today = timezone.localdate()
+        args = (self.company, 'monthly', today.replace(day=1), today, today.strftime('%Y-%m'))
+        first = get_company_report(*args)
+        job = ReportJob.objects.create(
+            company=self.company, report_type='monthly', period=args[4], period_start=args[2],
+            period_end=args[3], status='done', report=first,
+        )
+        old_path = first.file_path.path
+        with mock.patch('monitoring.reports.REUSE_SECONDS', -60), self.captureOnCommitCallbacks(execute=True):
+            second = get_company_report(*args)
+        self.assertNotEqual(second.pk, first.pk)
+        self.assertEqual(list(Report.objects.filter(company=self.company)), [second])
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(second.file_path.path))
+        job.refresh_from_db()
+        self.assertEqual(job.report_id, second.pk)
+
+
+class BulkPenaltyTests(TestCase):
+    def setUp(self):
+        self.region = Region.objects.create(name='Toshkent')
+        self.other_region = Region.objects.create(name='Navoiy')
+        self.industry = IndustryType.objects.create(name='Kimyo')
+        self.user = User.objects.create_user('qomita', password='parol', user_type='committee')
+        self.client.force_login(self.user)
+        gas = [(100.5, 100), (120.123, 100), (80, 100), (0.3, 0.1)]
+        self.companies = [
+            make_company(self.region, self.industry, i, current_gas_amount=current, max_allowed_gas=allowed)
+            for i, (current, allowed) in enumerate(gas)
+        ]
+        make_company(self.other_region, self.industry, 10, current_gas_amount=500, max_allowed_gas=100)
+
+    def post(self, **data):
+        deadline = (timezone.localdate() + datetime.timedelta(days=30)).isoformat()
+        return self.client.post(reverse('issue_penalties_bulk'), {'deadline': deadline, **data})
+
+    def test_bulk_matches_single_penalty_rule(self):
+        response = self.post(region_id=self.region.pk)
+        self.assertEqual(response.json()['count'], 3)
+        for penalty in Penalty.objects.select_related('company'):
+            single = Penalty(company=penalty.company, deadline=penalty.deadline)
+            single.excess_amount = single.compute_excess_amount()
+            self.assertEqual(penalty.excess_amount, single.excess_amount)
+            self.assertEqual(penalty.trees_required, single.calculate_trees_required())
+        self.assertEqual(
+            sorted(Penalty.objects.values_list('trees_required', flat=True)), [2, 5, 202],
+        )
+
+        # Faol jarimasi borlarga qayta yozilmaydi
+        self.assertEqual(self.post(region_id=self.region.pk).json()['count'], 0)
+
+    def test_bulk_publishes_live_updates(self):
+        with mock.patch('monitoring.penalties.publish_penalty_update') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                count = self.post(region_id=self.region.pk).json()['count']
+        self.assertEqual(sorted(call.args[0].company_id for call in publish.call_args_list),
+                         sorted(Penalty.objects.values_list('company_id', flat=True)))
+        self.assertEqual(publish.call_count, count)
+
+    def test_draft_skipped_and_status_change_keeps_amounts(self):
+        Penalty.objects.bulk_create([Penalty(
+            company=self.companies[0], status='draft', deadline=timezone.localdate(),
+            penalty_number='DRAFT-1', excess_amount=1, trees_required=1,
+        )])
+        self.assertEqual(self.post(region_id=self.region.pk).json()['count'], 2)
+
+        penalty = Penalty.objects.get(company=self.companies[1])
+        excess, trees = penalty.excess_amount, penalty.trees_required
+        Company.objects.filter(pk=self.companies[1].pk).update(current_gas_amount=500)
+        penalty.refresh_from_db()
+        penalty.status = 'completed'
+        penalty.save()
+        penalty.refresh_from_db()
+        self.assertEqual((penalty.excess_amount, penalty.trees_required), (excess, trees))
+
+    def test_dry_run_and_permissions(self):
+        response = self.post(dry_run='1')
+        self.assertEqual(response.json()['count'], 4)
+        self.assertFalse(Penalty.objects.exists())
+
+        self.client.force_login(User.objects.create_user('korxona', password='parol', user_type='factory'))
+        self.assertEqual(self.post().status_code, 403)
+
+
+class DurationPenaltyTests(TestCase):
+    def setUp(self):
+        region = Region.objects.create(name='Toshkent')
+        industry = IndustryType.objects.create(name='Kimyo')
+        self.company = make_company(region, industry, 1, current_gas_amount=50, max_allowed_gas=100)
+        self.window_start = timezone.localtime().replace(minute=0, second=0, microsecond=0) - datetime.timedelta(days=2)
+        self.window_end = self.window_start + datetime.timedelta(days=1)
+        readings = [
+            (datetime.timedelta(hours=1), 130), (datetime.timedelta(hours=1, minutes=30), 90),
+            (datetime.timedelta(hours=5), 110),
+            # oynadan tashqarida
+            (datetime.timedelta(days=1, hours=1), 500),
+        ]
+        for offset, gas_amount in readings:
+            row = SensorData.objects.create(company=self.company, gas_amount=gas_amount)
+            SensorData.objects.filter(pk=row.pk).update(recorded_at=self.window_start + offset)
+        rebuild_rollups(self.window_start, self.window_end + datetime.timedelta(days=1))
+
+    def test_excess_is_integrated_over_hourly_rollups(self):
+        penalty = Penalty.objects.create(
+            company=self.company, deadline=timezone.localdate(), mode='duration',
+            window_start=self.window_start, window_end=self.window_end,
+        )
+        # (30 + 0) / 2 + 10 / 1 = 25 kg
+        self.assertEqual(str(penalty.excess_amount), '25.000')
+        self.assertEqual(penalty.exceed_hours, 2)
+        self.assertEqual(penalty.trees_required, 250)
+
+        # Joriy o'lchov me'yorda - lahzalik rejimda jarima 0
+        instant = Penalty.objects.create(company=self.company, deadline=timezone.localdate())
+        self.assertEqual(instant.trees_required, 0)
+
+        result = issue_penalties(
+            timezone.localdate(), mode='duration', skip_active=False,
+            window_start=self.window_start, window_end=self.window_end, dry_run=True,
+        )
+        self.assertEqual(result['count'], 1)
+        self.assertEqual(result['excess_amount'], penalty.excess_amount)
+        self.assertEqual(result['trees_required'], penalty.trees_required)
+
+    def test_ingest_and_rebuild_agree_on_exceed_sum(self):
+        SensorRollup.objects.all().delete()
+        SensorData.objects.all().delete()
+        ingest_readings([{'gas_amount': 130}, {'gas_amount': 90}, {'gas_amount': 101.5}], company=self.company)
+        ingested = SensorRollup.objects.get(company=self.company, granularity='hour')
+        self.assertAlmostEqual(ingested.exceed_sum, 31.5)
+
+        rebuild_rollups(ingested.bucket_start, ingested.bucket_start + datetime.timedelta(hours=1))
+        rebuilt = SensorRollup.objects.get(company=self.company, granularity='hour')
+        self.assertAlmostEqual(rebuilt.exceed_sum, ingested.exceed_sum)
+
+
+class ViolationDetectorTests(TestCase):
+    def setUp(self):
+        detector.reset()
+        region = Region.objects.create(name='Toshkent')
+        industry = IndustryType.objects.create(name='Kimyo')
+        self.company = make_company(region, industry, 1, current_gas_amount=50, max_allowed_gas=100)
+
+    def feed(self, *amounts):
+        for gas_amount in amounts:
+            ingest_readings([{'gas_amount': gas_amount}], company=self.company)
+        self.company.refresh_from_db()
+
+    def test_debounce_and_hysteresis(self):
+        # Bitta sakrash xabar bermaydi
+        self.feed(150, 50, 50)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(self.company.alert_level, 'good')
+
+        # Ketma-ket 3 ta oshish - 'bad', xabar va qoralama jarima
+        self.feed(150, 120, 101)
+        self.assertEqual(self.company.alert_level, 'bad')
+        self.assertEqual(Notification.objects.count(), 1)
+        draft = Penalty.objects.get()
+        self.assertEqual((draft.status, draft.trees_required), ('draft', 10))
+
+        # Chegara atrofidagi tebranish (gisterezis oralig'i) darajani o'zgartirmaydi
+        self.feed(97, 99, 96, 98)
+        self.assertEqual(self.company.alert_level, 'bad')
+
+        # Me'yorga qaytish
+        self.feed(50, 50, 50)
+        self.assertEqual(self.company.alert_level, 'good')
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(Penalty.objects.count(), 1)
+
+    def test_state_follows_database_level(self):
+        self.feed(150, 150)
+        # Boshqa worker darajani allaqachon 'bad' qilgan
+        Company.objects.filter(pk=self.company.pk).update(alert_level='bad')
+        self.company.refresh_from_db()
+        self.feed(150, 150, 150)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_drafts_hidden_from_factory(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.feed(150, 150, 150)
+        draft = Penalty.objects.get(status='draft')
+        self.client.force_login(User.objects.create_user('korxona', password='parol', user_type='factory', company=self.company))
+
+        response = self.client.post(
+            reverse('submit_penalty_response', args=[draft.pk]), json.dumps({'comment': 'Bajarildi'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 404)
+        draft.refresh_from_db()
+        self.assertEqual(draft.status, 'draft')
+
+        today = timezone.localdate()
+        response = self.client.get(
+            reverse('download_company_report', args=['monthly']), {'year': today.year, 'month': today.month},
+        )
+        workbook = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        self.assertEqual(dict(zip(*workbook['Umumiy maʼlumot'].values))['Jarimalar soni'], 0)
+        self.assertNotIn(draft.penalty_number, [row[0] for row in workbook['Jarimalar'].values])
+
+
+class BroadcastTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        region = Region.objects.create(name='Toshkent')
+        other_region = Region.objects.create(name='Navoiy')
+        industry = IndustryType.objects.create(name='Kimyo')
+        self.companies = [make_company(region, industry, i) for i in range(3)]
+        self.outside = make_company(other_region, industry, 10)
+        self.region = region
+        committee = User.objects.create_user('qomita', password='parol', user_type='committee')
+        self.client.force_login(committee)
+        self.factory = User.objects.create_user(
+            'korxona', password='parol', user_type='factory', company=self.companies[0],
+        )
+
+    def test_region_broadcast_read_state(self):
+        response = self.client.post(reverse('create_broadcast'), {'message': 'Smog', 'region_id': self.region.pk})
+        self.assertEqual(response.json()['recipient_count'], 3)
+        self.assertEqual([get_unread_count(c) for c in self.companies + [self.outside]], [1, 1, 1, 0])
+
+        self.client.force_login(self.factory)
+        self.client.get(reverse('company_unread_count'))
+        # Keshdan: faqat sessiya va foydalanuvchi (korxona bilan JOIN) so'rovlari
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(reverse('company_unread_count')).json()['unread_count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('mark_notifications_read'))
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(self.client.get(reverse('company_unread_count')).json()['unread_count'], 0)
+        broadcast = Broadcast.objects.get()
+        self.assertEqual(count_bits(broadcast.read_by, broadcast.recipients), 1)
+        self.assertEqual(get_unread_count(self.companies[1]), 1)
+
+        # Shaxsiy xabar hisoblagichni yangilaydi
+        Notification.objects.create(company=self.companies[0], message='Test')
+        data = self.client.get(reverse('company_notifications')).json()
+        self.assertEqual(data['unread_count'], 1)
+        self.assertEqual([b['is_read'] for b in data['broadcasts']], [True])
+
+    def test_old_broadcasts_count_as_read(self):
+        old = create_broadcast('Eski', region=self.region)
+        Broadcast.objects.filter(pk=old.pk).update(created_at=timezone.now() - datetime.timedelta(days=40))
+        create_broadcast('Yangi')
+        cache.clear()
+        self.assertEqual(get_unread_count(self.companies[0]), 1)
+        self.assertEqual([is_read for _, is_read in recent_broadcasts(self.companies[0])], [False, True])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(mark_read(self.companies[0]), 1)
+        self.assertEqual(get_unread_count(self.companies[0]), 0)
+        # eski xabarga tegilmaydi
+        self.assertEqual(bytes(Broadcast.objects.get(pk=old.pk).read_by), b'')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        region = Region.objects.create(name='Toshkent')
+        industry = IndustryType.objects.create(name='Kimyo')
+        # Bir xil nomlar: tartib id bilan aniqlanadi
+        self.companies = [
+            make_company(region, industry, i, name=f'Korxona {i % 7}') for i in range(40)
+        ]
+        self.client.force_login(User.objects.create_user('qomita', password='parol', user_type='committee'))
+
+    def test_companies_pages_cover_all_rows(self):
+        expected = list(Company.objects.order_by('name', 'id').values_list('id', flat=True))
+        seen, cursors, cursor = [], [], ''
+        while True:
+            response = self.client.get(reverse('companies'), {'cursor': cursor} if cursor else {})
+            page = response.context['page']
+            seen.extend(company.pk for company in page)
+            cursors.append(cursor)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(cursors), 3)
+
+        # Oxirgi sahifadan orqaga - ikkinchi sahifa
+        response = self.client.get(reverse('companies'), {'cursor': page.previous_cursor})
+        self.assertEqual([c.pk for c in response.context['page']], expected[15:30])
+
+        self.assertEqual(self.client.get(reverse('companies'), {'cursor': 'xato'}).status_code, 400)
+
+    def test_company_penalties_cursor(self):
+        company = self.companies[0]
+        for _ in range(25):
+            Penalty.objects.create(company=company, deadline=timezone.localdate())
+        self.client.force_login(User.objects.create_user('korxona', password='parol', user_type='factory', company=company))
+        first = self.client.get(reverse('company_penalties')).json()
+        second = self.client.get(reverse('company_penalties'), {'cursor': first['next_cursor']}).json()
+        self.assertEqual((len(first['penalties']), len(second['penalties'])), (20, 5))
+        self.assertIsNone(second['next_cursor'])
+        ids = [p['id'] for p in first['penalties'] + second['penalties']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+
+class CompanySearchTests(TestCase):
+    def setUp(self):
+        self.region = Region.objects.create(name='Navoiy')
+        industry = IndustryType.objects.create(name='Kimyo')
+        self.azot = make_company(self.region, industry, 1, name='Navoiyazot', stir_number='301234567')
+        self.sement = make_company(self.region, industry, 2, name="O'zbekiston sement zavodi")
+        self.other = make_company(Region.objects.create(name='Toshkent'), industry, 3, name='Toshkent issiqlik')
+
+    def names(self, query):
+        return [c.name for c in search_companies(query)]
+
+    def test_prefix_typo_and_script(self):
+        self.assertEqual(self.names('navoiya')[0], 'Navoiyazot')
+        self.assertEqual(self.names('navoyazot')[0], 'Navoiyazot')
+        self.assertEqual(self.names('Ўзбекистон')[0], "O'zbekiston sement zavodi")
+        self.assertEqual(self.names('o‘zbek')[0], "O'zbekiston sement zavodi")
+        self.assertEqual(self.names('30123')[0], 'Navoiyazot')
+        self.assertNotIn('Toshkent issiqlik', self.names('sement'))
+        self.assertEqual(search_companies('  '), [])
+
+    def test_index_follows_renames(self):
+        self.azot.name = 'Farg\'onaazot'
+        self.azot.save()
+        self.assertEqual(self.names('fargona')[0], "Farg'onaazot")
+        self.assertNotIn('navoiyazot', Company.objects.get(pk=self.azot.pk).search_text)
+
+    def test_long_cyrillic_name_keeps_full_search_text(self):
+        # ш/ч/ю transliteratsiyada ikki harf bo'ladi: 255 belgili nom 400 dan oshadi
+        self.azot.name = 'Шчю ' * 63 + 'Шчю'
+        self.azot.save()
+        search_text = Company.objects.get(pk=self.azot.pk).search_text
+        self.assertGreater(len(search_text), 400)
+        self.assertTrue(search_text.endswith('301234567 navoiy'))
+
+        self.region.name = 'Buxoro'
+        self.region.save()
+        self.assertIn("O'zbekiston sement zavodi", self.names('buxoro'))
+
+    def test_rebuild_and_views(self):
+        CompanySearchTrigram.objects.all().delete()
+        Company.objects.update(search_text='')
+        self.assertEqual(search_companies('navoiyazot'), [])
+        self.assertEqual(rebuild_search_index(), 3)
+
+        self.client.force_login(User.objects.create_user('qomita', password='parol', user_type='committee'))
+        results = self.client.get(reverse('company_search'), {'q': 'navoiy'}).json()['results']
+        self.assertEqual({r['id'] for r in results}, {self.azot.pk, self.sement.pk})
+        response = self.client.get(reverse('companies'), {'search': 'toshkent'})
+        self.assertEqual([c.pk for c in response.context['page']], [self.other.pk])
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        region = Region.objects.create(name='Toshkent')
+        self.company = make_company(region, IndustryType.objects.create(name='Kimyo'), 1)
+        self.factory_user = User.objects.create_user(
+            'korxona', password='parol', user_type='factory', stir_number='123456789', company=self.company,
+        )
+        self.committee_user = User.objects.create_user(
+            'inspektor', password='parol', user_type='committee', employee_id='E-1', stir_number='',
+        )
+
+    def test_backend_single_query(self):
+        with self.assertNumQueries(1):
+            user = authenticate(username='123456789', password='parol', user_type='factory')
+        self.assertEqual(user, self.factory_user)
+        with self.assertNumQueries(0):
+            self.assertEqual(user.company, self.company)
+        self.assertEqual(authenticate(username='E-1', password='parol', user_type='committee'), self.committee_user)
+        self.assertEqual(authenticate(username='inspektor', password='parol'), self.committee_user)
+        self.assertIsNone(authenticate(username='123456789', password='xato', user_type='factory'))
+        self.assertIsNone(authenticate(username='yoq', password='parol', user_type='factory'))
+
+    def test_identifier_preferred_over_username(self):
+        # Boshqa foydalanuvchining username'i STIR bilan bir xil
+        User.objects.create_user('123456789', password='parol', user_type='committee')
+        self.assertEqual(authenticate(username='123456789', password='parol', user_type='factory'), self.factory_user)
+        # Bo'sh identifikatorlar NULL sifatida saqlanadi (unique indeks)
+        self.assertIsNone(User.objects.get(pk=self.committee_user.pk).stir_number)
+
+    def test_login_view(self):
+        response = self.client.post(reverse('login'), {'username': '123456789', 'password': 'parol', 'user_type': 'committee'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('_auth_user_id', self.client.session)
+        response = self.client.post(reverse('login'), {'username': '123456789', 'password': 'parol', 'user_type': 'factory'})
+        self.assertRedirects(response, reverse('company_dashboard'), fetch_redirect_response=False)
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.factory_user.pk)
+
+
+class FactoryContextTests(TestCase):
+    def setUp(self):
+        region = Region.objects.create(name='Toshkent')
+        self.company = make_company(region, IndustryType.objects.create(name='Kimyo'), 1)
+        self.user = User.objects.create_user('korxona', password='parol', user_type='factory', company=self.company)
+
+    def test_company_loaded_with_user(self):
+        self.client.force_login(self.user)
+        # sessiya, foydalanuvchi+korxona - alohida korxona so'rovi yo'q
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(reverse('company_dashboard')).status_code, 200)
+        # + oxirgi sensor o'qishi
+        with self.assertNumQueries(3):
+            data = self.client.get(reverse('company_sensor_data')).json()
+        self.assertEqual(data['max_allowed_gas'], self.company.max_allowed_gas)
+
+    def test_access_checks(self):
+        penalty = Penalty.objects.create(company=self.company, deadline=timezone.localdate())
+        respond = reverse('submit_penalty_response', args=[penalty.pk])
+        bulk = reverse('bulk_sensor_data')
+        self.client.force_login(User.objects.create_user('qomita', password='parol', user_type='committee'))
+        self.assertEqual(self.client.get(reverse('company_notifications')).status_code, 403)
+        self.assertEqual(self.client.post(respond, '{}', content_type='application/json').status_code, 403)
+        # qo'mita partiyani istalgan korxonaga yozishi mumkin
+        self.assertEqual(self.client.post(bulk, '[]', content_type='application/json').status_code, 200)
+        self.client.force_login(User.objects.create_user('yangi', password='parol', user_type='factory'))
+        self.assertEqual(self.client.get(reverse('company_unread_count')).status_code, 404)
+        self.assertEqual(self.client.post(respond, '{}', content_type='application/json').status_code, 404)
+        self.assertEqual(self.client.post(bulk, '[]', content_type='application/json').status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('company_penalties')).status_code, 302)
+
+
+@override_settings(INSTRUMENTATION_ENABLED=True)
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        instrumentation.buffer.clear()
+        region = Region.objects.create(name='Toshkent')
+        company = make_company(region, IndustryType.objects.create(name='Kimyo'), 1)
+        self.client.force_login(User.objects.create_user('korxona', password='parol', user_type='factory', company=company))
+
+    def test_records_queries_and_endpoint(self):
+        for _ in range(3):
+            self.client.get(reverse('company_sensor_data'))
+        record = instrumentation.buffer.records()[-1]
+        self.assertEqual((record.view, record.status, record.queries), ('company_sensor_data', 200, 3))
+        self.assertGreater(record.size, 0)
+
+        self.assertEqual(self.client.get(reverse('instrumentation_stats')).status_code, 403)
+        self.client.force_login(User.objects.create_user('admin', password='parol', is_staff=True))
+        data = self.client.get(reverse('instrumentation_stats'), {'view': 'company_sensor_data', 'records': 2}).json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(len(data['records']), 2)
+        self.assertEqual(data['views'][0]['queries']['p95'], 3)
+
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = f'{tmp}/instrumentation.json'
+            with open(path, 'w') as f:
+                json.dump(data, f)
+            call_command('instrumentation_report', file=path, stdout=out)
+        self.assertIn('company_sensor_data', out.getvalue())
+
+    async def test_async_request_counts_queries_from_sync_view(self):
+        user = await User.objects.select_related('company').aget(username='korxona')
+        await self.async_client.aforce_login(user)
+        await self.async_client.get(reverse('company_sensor_data'))
+        record = instrumentation.buffer.records()[-1]
+        self.assertEqual((record.view, record.status, record.queries), ('company_sensor_data', 200, 3))
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_small_seed_runs(self):
+        # xom INSERT'lar sxema o'zgarganda (yangi NOT NULL ustun) shu yerda yiqiladi
+        out = io.StringIO()
+        call_command('benchmark_queries', companies=3, sensor_rows=20, penalties=5, notifications=5,
+                     repeat=2, stdout=out)
+        self.assertIn('Penalty: 5 qator', out.getvalue())
+        self.assertFalse(Company.objects.filter(name__startswith='BENCH-').exists())
+
+
+class AdminScalingTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='parol'))
+
+    def test_region_counts_annotated(self):
+        industry = IndustryType.objects.create(name='Kimyo')
+        regions = [Region.objects.create(name=f'Hudud {i}') for i in range(6)]
+        for i, region in enumerate(regions):
+            for j in range(i):
+                make_company(region, industry, i * 10 + j)
+
+        url = reverse('admin:monitoring_region_changelist')
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        Region.objects.bulk_create([Region(name=f'Yangi {i}') for i in range(10)])
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url, {'o': '-2'})
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(response.context['cl'].result_list[0], regions[-1])
+        self.assertEqual(response.context['cl'].result_list[0].company_total, 5)
+
+    def test_company_inlines_capped(self):
+        from .admin import INLINE_LIMIT
+
+        company = make_company(Region.objects.create(name='Toshkent'), IndustryType.objects.create(name='Kimyo'), 1)
+        SensorData.objects.bulk_create([SensorData(company=company, gas_amount=i) for i in range(INLINE_LIMIT + 5)])
+        response = self.client.get(reverse('admin:monitoring_company_change', args=[company.pk]))
+        self.assertEqual(response.status_code, 200)
+        sensor_formset = next(
+            f for f in response.context['inline_admin_formsets'] if f.formset.model is SensorData
+        )
+        self.assertEqual(len(sensor_formset.formset.forms), INLINE_LIMIT)
+        changelist = f"{reverse('admin:monitoring_sensordata_changelist')}?company__id__exact={company.pk}"
+        self.assertContains(response, changelist)
+        self.assertEqual(self.client.get(changelist).context['cl'].result_count, INLINE_LIMIT + 5)
+
+
+class SensorRollupTests(TestCase):
+    def setUp(self):
+        detector.reset()
+        region = Region.objects.create(name='Toshkent')
+        self.company = make_company(region, IndustryType.objects.create(name='Kimyo'), 1, max_allowed_gas=100)
+
+    def add_raw(self, when, *amounts):
+        """Xom o'qishlarni (agregatlarsiz) o'tmishdagi vaqt bilan yozadi."""
+        rows = SensorData.objects.bulk_create([SensorData(company=self.company, gas_amount=a) for a in amounts])
+        SensorData.objects.filter(pk__in=[r.pk for r in rows]).update(recorded_at=when)
+
+    def test_apply_readings_merges_batches(self):
+        ingest_readings([{'gas_amount': 80}, {'gas_amount': 150}], company=self.company)
+        ingest_readings([{'gas_amount': 40}], company=self.company)
+        hour = SensorRollup.objects.get(company=self.company, granularity='hour')
+        self.assertEqual((hour.sample_count, hour.gas_sum, hour.gas_min, hour.gas_max), (3, 270, 40, 150))
+        self.assertEqual((hour.exceed_count, hour.exceed_sum), (1, 50))
+        self.assertEqual(SensorRollup.objects.filter(company=self.company).count(), 3)
+
+    def test_integrity_error_is_retried(self):
+        real_bulk_create = SensorRollup.objects.bulk_create
+        calls = []
+
+        def racing_bulk_create(objs, *args, **kwargs):
+            # Birinchi urinish: boshqa worker shu bucket'ni yaratib ulgurgan
+            calls.append(len(objs))
+            if len(calls) == 1:
+                raise IntegrityError('UNIQUE constraint failed')
+            return real_bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(SensorRollup.objects, 'bulk_create', side_effect=racing_bulk_create):
+            ingest_readings([{'gas_amount': 60}], company=self.company)
+        self.assertEqual(calls, [3, 3])
+        self.assertEqual(SensorRollup.objects.filter(company=self.company, sample_count=1).count(), 3)
+
+    def test_rebuild_matches_ingest(self):
+        ingest_readings([{'gas_amount': 120}, {'gas_amount': 30}], company=self.company)
+        expected = sorted(SensorRollup.objects.values_list('granularity', 'sample_count', 'gas_sum', 'exceed_sum'))
+        SensorRollup.objects.all().delete()
+        now = timezone.now()
+        self.assertEqual(rebuild_rollups(now - datetime.timedelta(days=1), now + datetime.timedelta(days=1)), 3)
+        self.assertEqual(sorted(SensorRollup.objects.values_list('granularity', 'sample_count', 'gas_sum', 'exceed_sum')), expected)
+
+    def test_backfill_keeps_rollups_after_retention(self):
+        old = timezone.now() - datetime.timedelta(days=200)
+        self.add_raw(old, 50, 150)
+        apply_retention(raw_days=90)
+        self.assertFalse(SensorData.objects.exists())
+        self.assertEqual(SensorRollup.objects.count(), 2)
+
+        self.add_raw(timezone.now(), 70)
+        out = io.StringIO()
+        call_command('backfill_rollups', since=(old - datetime.timedelta(days=1)).date().isoformat(),
+                     stdout=out)
+        self.assertIn('retention', out.getvalue())
+        self.assertEqual(SensorRollup.objects.filter(bucket_start__lt=old + datetime.timedelta(days=1)).count(), 2)
+        # Checkpoint'siz ham: xom qatori yo'q kunning agregatlari o'chirilmaydi
+        RetentionCheckpoint.objects.all().delete()
+        rebuild_rollups(old - datetime.timedelta(days=1), old + datetime.timedelta(days=1))
+        self.assertEqual(SensorRollup.objects.get(granularity='day', bucket_start__lt=old + datetime.timedelta(days=1)).sample_count, 2)
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        detector.reset()
+        region = Region.objects.create(name='Toshkent')
+        self.company = make_company(region, IndustryType.objects.create(name='Kimyo'), 1, max_allowed_gas=100)
+        self.now = timezone.now()
+
+    def add_raw(self, days_ago, *amounts):
+        rows = SensorData.objects.bulk_create([SensorData(company=self.company, gas_amount=a) for a in amounts])
+        SensorData.objects.filter(pk__in=[r.pk for r in rows]).update(
+            recorded_at=self.now - datetime.timedelta(days=days_ago),
+        )
+
+    def test_raw_deleted_only_after_downsampling_and_resumes(self):
+        self.add_raw(120, 50, 150)
+        self.add_raw(110, 70)
+        self.add_raw(10, 80)  # cutoff'dan yangi - saqlanadi
+
+        calls = []
+
+        def interrupted(*args, **kwargs):
+            # Ikkinchi kunni agregatlashda jarayon uziladi
+            calls.append(args)
+            if len(calls) > 1:
+                raise RuntimeError('uzildi')
+            return rebuild_rollups(*args, **kwargs)
+
+        with mock.patch('monitoring.retention.rebuild_rollups', side_effect=interrupted):
+            with self.assertRaises(RuntimeError):
+                apply_retention(raw_days=90)
+        # Hech bir xom qator o'chirilmagan, checkpoint birinchi kundan keyin turibdi
+        self.assertEqual(SensorData.objects.count(), 4)
+        checkpoint = RetentionCheckpoint.objects.get()
+        self.assertEqual(timezone.localtime(checkpoint.downsampled_until).date(),
+                         timezone.localtime(self.now - datetime.timedelta(days=119)).date())
+
+        report = apply_retention(raw_days=90)
+        self.assertEqual((report['downsampled_days'], report['raw_deleted'], report['complete']), (1, 3, True))
+        self.assertEqual(list(SensorData.objects.values_list('gas_amount', flat=True)), [80])
+        days = SensorRollup.objects.filter(granularity='day').order_by('bucket_start')
+        self.assertEqual([(d.sample_count, d.exceed_count) for d in days], [(2, 1), (1, 0)])
+
+    def test_chunked_partial_run(self):
+        self.add_raw(100, 10, 20, 30)
+        report = apply_retention(raw_days=90, chunk_size=1, max_chunks=1)
+        self.assertEqual((report['raw_deleted'], report['complete']), (1, False))
+        self.assertEqual(SensorData.objects.count(), 2)
+
+        out = io.StringIO()
+        call_command('apply_retention', raw_days=90, chunk_size=1, stdout=out)
+        self.assertIn('Retention yakunlandi', out.getvalue())
+        self.assertFalse(SensorData.objects.exists())
+        # Qayta agregatlanmagan: kunlik agregat uchala o'qishni saqlaydi
+        self.assertEqual(SensorRollup.objects.get(granularity='day').sample_count, 3)
+
+    def test_rollup_expiry_and_dry_run(self):
+        for granularity, days_ago in (('minute', 40), ('minute', 5), ('hour', 400), ('hour', 5), ('day', 400)):
+            SensorRollup.objects.create(
+                company=self.company, granularity=granularity, sample_count=1, gas_sum=1, gas_min=1, gas_max=1,
+                bucket_start=self.now - datetime.timedelta(days=days_ago),
+            )
+        report = apply_retention(hour_days=365, dry_run=True)
+        self.assertEqual((report['minute_rollups_deleted'], report['hour_rollups_deleted']), (1, 1))
+        self.assertEqual(SensorRollup.objects.count(), 5)
+        self.assertFalse(RetentionCheckpoint.objects.exists())
+
+        apply_retention(minute_days=30)
+        self.assertEqual(SensorRollup.objects.filter(granularity='minute').count(), 1)
+        self.assertEqual(SensorRollup.objects.filter(granularity='hour').count(), 2)
+        apply_retention(hour_days=365)
+        self.assertEqual(SensorRollup.objects.filter(granularity='hour').count(), 1)
+        self.assertEqual(SensorRollup.objects.filter(granularity='day').count(), 1)
+
+
+class SensorStreamTests(TestCase):
+    def setUp(self):
+        detector.reset()
+        region = Region.objects.create(name='Toshkent')
+        self.company = make_company(region, IndustryType.objects.create(name='Kimyo'), 1)
+        self.client.force_login(User.objects.create_user('korxona', password='parol', user_type='factory', company=self.company))
+        # Test tranzaksiyasi ichida ulanish yopilmasin
+        self.enterContext(mock.patch('monitoring.streaming.close_old_connections'))
+
+    def stream(self, *messages, authenticated=True):
+        """sensor_stream ni ASGI xabarlari bilan ishga tushiradi: (status, javob yoki None)."""
+        pending = list(messages)
+        sent = []
+
+        async def receive():
+            message = pending.pop(0)
+            if isinstance(message, float):
+                await asyncio.sleep(message)
+                message = pending.pop(0)
+            return message
+
+        async def send(message):
+            sent.append(message)
+
+        headers = []
+        if authenticated:
+            headers.append((b'cookie', f"sessionid={self.client.cookies['sessionid'].value}".encode()))
+        scope = {'type': 'http', 'method': 'POST', 'path': STREAM_PATH, 'headers': headers}
+        async_to_sync(sensor_stream)(scope, receive, send)
+        if not sent:
+            return None, None
+        return sent[0]['status'], json.loads(sent[1]['body'])
+
+    def body(self, data, more=False):
+        return {'type': 'http.request', 'body': data, 'more_body': more}
+
+    def test_requires_session(self):
+        status, data = self.stream(self.body(b'{"gas_amount": 1}\n'), authenticated=False)
+        self.assertEqual((status, data['success']), (401, False))
+        self.assertFalse(SensorData.objects.exists())
+
+    def test_size_and_time_bounded_flush(self):
+        lines = b''.join(b'{"gas_amount": %d}\n' % i for i in range(5))
+        with mock.patch('monitoring.streaming.BATCH_SIZE', 2):
+            status, data = self.stream(self.body(lines))
+        self.assertEqual((status, data['accepted'], data['batches']), (200, 5, 3))
+
+        with mock.patch('monitoring.streaming.FLUSH_INTERVAL', 0.05):
+            # Birinchi qatordan keyin mijoz jim turadi - partiya vaqt bo'yicha yoziladi
+            status, data = self.stream(
+                self.body(b'{"gas_amount": 1}\n', more=True), 0.3, self.body(b'{"gas_amount": 2}\n'),
+            )
+        self.assertEqual((data['accepted'], data['batches']), (2, 2))
+
+    def test_long_and_malformed_lines_are_rejected(self):
+        with mock.patch('monitoring.streaming.MAX_LINE_BYTES', 32):
+            status, data = self.stream(
+                self.body(b'{"gas_amount": 1}\n{bad\n{"gas_amount": "' + b'9' * 40, more=True),
+                self.body(b'"}\n{"gas_amount": 3}'),
+            )
+        self.assertEqual((status, data['accepted'], data['rejected']), (200, 2, 2))
+        self.assertEqual([e['line'] for e in data['errors']], [3, 2])
+        self.assertEqual(data['errors'][0]['error'], 'Qator juda uzun')
+
+    def test_disconnect_keeps_received_readings(self):
+        status, data = self.stream(
+            self.body(b'{"gas_amount": 1}\n{"gas_amount": 2}\n', more=True), {'type': 'http.disconnect'},
+        )
+        self.assertIsNone(status)
+        self.assertEqual(SensorData.objects.filter(company=self.company).count(), 2)
+
+    def test_ingest_error_returns_json(self):
+        with mock.patch('monitoring.streaming.ingest_readings', side_effect=RuntimeError('baza')):
+            with self.assertLogs('monitoring.streaming', 'ERROR'):
+                status, data = self.stream(self.body(b'{"gas_amount": 1}\n'))
+        self.assertEqual((status, data['success'], data['accepted']), (500, False, 0))
+
+
+class BulkSensorDataTests(TestCase):
+    def setUp(self):
+        detector.reset()
+        region = Region.objects.create(name='Toshkent')
+        industry = IndustryType.objects.create(name='Kimyo')
+        self.first = make_company(region, industry, 1, max_allowed_gas=100, current_gas_amount=10)
+        self.second = make_company(region, industry, 2, max_allowed_gas=100, current_gas_amount=10)
+        self.client.force_login(User.objects.create_user('qomita', password='parol', user_type='committee'))
+
+    def post(self, payload, content_type='application/json'):
+        body = payload if isinstance(payload, (str, bytes)) else json.dumps(payload)
+        return self.client.post(reverse('bulk_sensor_data'), body, content_type=content_type)
+
+    def test_mixed_addressing_and_per_row_results(self):
+        response = self.post({'readings': [
+            {'company_id': self.first.pk, 'gas_amount': 120},
+            {'stir_number': self.second.stir_number, 'gas_amount': 50},
+            {'company_id': self.first.pk, 'gas_amount': 130},
+            {'company_id': self.first.pk, 'gas_amount': -1},
+            {'stir_number': '999999999', 'gas_amount': 5},
+            {'gas_amount': 5},
+            'matn',
+            {'company_id': self.first.pk, 'gas_amount': 140},
+        ]})
+        data = response.json()
+        self.assertEqual((response.status_code, data['accepted'], data['rejected']), (200, 4, 4))
+        self.assertEqual(
+            [row['status'] for row in data['results']],
+            ['accepted', 'accepted', 'accepted', 'rejected', 'rejected', 'rejected', 'rejected', 'accepted'],
+        )
+        self.assertEqual(data['results'][4]['error'], 'Korxona topilmadi')
+        self.assertEqual(SensorData.objects.filter(company=self.first).count(), 3)
+
+        # Partiyadagi oxirgi o'qish, holat va detektor darajasi bitta bulk_update bilan
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.current_gas_amount, self.first.status, self.first.alert_level), (140, 'bad', 'bad'))
+        self.assertEqual((self.second.current_gas_amount, self.second.status), (50, 'good'))
+
+    def test_non_integer_company_id_rejected(self):
+        pk = self.first.pk
+        data = self.post({'readings': [
+            {'company_id': pk + 0.7, 'gas_amount': 10},
+            {'company_id': f'{pk}.7', 'gas_amount': 10},
+            {'company_id': True, 'gas_amount': 10},
+            {'company_id': float(pk), 'gas_amount': 10},
+            {'company_id': str(pk), 'gas_amount': 10},
+        ]}).json()
+        self.assertEqual(
+            [row['status'] for row in data['results']],
+            ['rejected', 'rejected', 'rejected', 'accepted', 'accepted'],
+        )
+        self.assertEqual(data['results'][0]['error'], "company_id noto'g'ri")
+
+    def test_query_count_does_not_grow_with_batch(self):
+        def batch(size):
+            return [
+                {'company_id': company.pk, 'gas_amount': 50 + i % 3}
+                for i in range(size) for company in (self.first, self.second)
+            ]
+
+        # vaqt qotiriladi: barcha o'qishlar bir xil daqiqa/soat/kun agregatlariga tushadi
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now()):
+            ingest_readings(batch(1))
+            # korxonalar, SensorData INSERT, agregatlar SELECT+UPDATE, korxonalar UPDATE, savepoint'lar
+            for size in (2, 100):
+                with self.assertNumQueries(9):
+                    ingest_readings(batch(size))
+
+    def test_ndjson_and_factory_scope(self):
+        self.client.force_login(User.objects.create_user('korxona', password='parol', user_type='factory', company=self.first))
+        body = '\n'.join([
+            json.dumps({'gas_amount': 20}),
+            json.dumps({'company_id': self.second.pk, 'gas_amount': 30}),
+            '{buzuq',
+        ])
+        data = self.post(body, content_type='application/x-ndjson').json()
+        self.assertEqual((data['accepted'], data['rejected']), (1, 2))
+        self.assertEqual(data['results'][1]['error'], "Boshqa korxonaga yozish ruxsati yo'q")
+        self.assertFalse(SensorData.objects.filter(company=self.second).exists())
+
+    def test_invalid_body_and_batch_limit(self):
+        self.assertEqual(self.post('{buzuq').status_code, 400)
+        self.assertEqual(self.post({'items': []}).status_code, 400)
+        with mock.patch('monitoring.views.MAX_BATCH_SIZE', 2):
+            response = self.post([{'company_id': self.first.pk, 'gas_amount': 1}] * 3)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(SensorData.objects.exists())
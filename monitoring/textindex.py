@@ -0,0 +1,55 @@
+# monitoring/textindex.py
+"""
+Qidiruv uchun matnni normallashtirish (lotin/kirill o'zbek yozuvi).
+
+normalize() kichik harfga o'tkazadi, kirillni lotinga o'giradi, tutuq
+belgilarini (' ʻ ʼ ‘ ’ `) olib tashlaydi va harf/raqamdan boshqa belgilarni
+bo'shliqqa almashtiradi: "Ўзбекистон", "O‘zbekiston" va "o'zbekiston"
+bir xil "ozbekiston" bo'ladi.
+
+trigrams() pg_trgm kabi har bir so'zni "  so'z " ko'rinishida to'ldirib
+3 harfli bo'laklarga ajratadi (CompanySearchTrigram jadvali uchun).
+"""
+import re
+
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'ё': 'yo', 'ж': 'j', 'з': 'z',
+    'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p',
+    'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'x', 'ц': 'ts', 'ч': 'ch',
+    'ш': 'sh', 'щ': 'sh', 'ъ': '', 'ы': 'i', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h',
+}
+_APOSTROPHES = str.maketrans('', '', "'`ʻʼ‘’")
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    text = (text or '').lower()
+    latin = []
+    for i, ch in enumerate(text):
+        if ch == 'е':
+            # so'z boshida "ye" (Ер -> yer), aks holda "e"
+            latin.append('ye' if i == 0 or not text[i - 1].isalpha() else 'e')
+        else:
+            latin.append(CYRILLIC_TO_LATIN.get(ch, ch))
+    return ' '.join(_WORD.findall(''.join(latin).translate(_APOSTROPHES)))
+
+
+def trigrams(text, partial_last=False):
+    """
+    Normallashtirilgan matnning 3-gramlari.
+    partial_last=True: oxirgi so'z hali yozilayotgan deb olinadi (prefiks
+    qidiruv uchun so'z oxiri bo'lagi qo'shilmaydi).
+    """
+    grams = set()
+    words = text.split()
+    for i, word in enumerate(words):
+        padded = f'  {word} '
+        if partial_last and i == len(words) - 1:
+            padded = padded[:-1]
+        grams.update(padded[j:j + 3] for j in range(len(padded) - 2))
+    return grams
+
+
+def company_search_text(name, stir_number, region_name):
+    return normalize(f'{name} {stir_number} {region_name}')
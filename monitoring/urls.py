@@ -6,6 +6,10 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
+    path('api/companies/map/', views.company_map_data, name='company_map_data'),
+    path('api/companies/viewport/', views.company_viewport, name='company_viewport'),
+    path('api/companies/nearby/', views.companies_nearby, name='companies_nearby'),
+    path('api/companies/search/', views.company_search, name='company_search'),
     
     # Admin sahifalari
     path('committee/dashboard/', views.dashboard, name='committee_dashboard'),
@@ -13,8 +17,12 @@ urlpatterns = [
     path('companies/', views.companies, name='companies'),
     path('penalties/', views.penalties, name='penalties'),
     path('create-penalty/', views.create_penalty, name='create_penalty'),
+    path('penalties/bulk/', views.issue_penalties_bulk, name='issue_penalties_bulk'),
     path('report-data/', views.report_data, name='report_data'),
     path('download-report/', views.download_report, name='download_report'),
+    path('reports/jobs/', views.create_report_job, name='create_report_job'),
+    path('reports/jobs/<int:job_id>/', views.report_job_status, name='report_job_status'),
+    path('reports/<int:report_id>/download/', views.download_saved_report, name='download_saved_report'),
     
     # Korxona paneli asosiy sahifasi
     path('company/dashboard/', views.company_dashboard, name='company_dashboard'),
@@ -27,14 +35,25 @@ urlpatterns = [
     
     # Sensor ma'lumotlari
     path('company/sensor-data/', views.company_sensor_data, name='company_sensor_data'),
+    path('company/sensor-history/', views.company_sensor_history, name='company_sensor_history'),
     
     # Sensor ma'lumotlarini yangilash
     path('company/update-sensor/', views.update_sensor_data, name='update_sensor_data'),
+    path('sensor-data/bulk/', views.bulk_sensor_data, name='bulk_sensor_data'),
     
     # Ogohlantirishlar
     path('company/notifications/', views.company_notifications, name='company_notifications'),
+    path('company/notifications/unread/', views.company_unread_count, name='company_unread_count'),
+    path('company/notifications/read/', views.mark_notifications_read, name='mark_notifications_read'),
+    path('broadcasts/', views.create_broadcast_view, name='create_broadcast'),
+    
+    # Jonli yangilanishlar (SSE)
+    path('live/events/', views.live_events, name='live_events'),
     
     # Hisobotlarni yuklab olish
     path('company/reports/<str:report_type>/', views.download_company_report, name='download_company_report'),
+    
+    # So'rovlar instrumentatsiyasi (staff)
+    path('api/instrumentation/', views.instrumentation_stats, name='instrumentation_stats'),
 
 ]
\ No newline at end of file
@@ -10,27 +10,26 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 import json
 from .models import *
+from .stats import get_dashboard_stats
 
 # Asosiy sahifa
 def index(request):
-    companies = Company.objects.all()
-    
-    # Statistikalar
-    total_companies = companies.count()
-    good_companies = companies.filter(status='good').count()
-    moderate_companies = companies.filter(status='moderate').count()
-    bad_companies = companies.filter(status='bad').count()
-    
-    # Top 10 korxonalar
-    top_companies = companies.order_by('-current_gas_amount')[:10]
+    # Korxonalar ro'yxati sahifaga joylanmaydi - xarita oynadagi korxonalarni
+    # /api/companies/viewport/ dan oladi
+    # Statistikalar (keshdan)
+    stats = get_dashboard_stats()
+    total_companies = stats['total_companies']
+    good_companies = stats['good_companies']
+    moderate_companies = stats['moderate_companies']
+    bad_companies = stats['bad_companies']
     
     context = {
         'total_companies': total_companies,
         'good_companies': good_companies,
         'moderate_companies': moderate_companies,
         'bad_companies': bad_companies,
-        'companies': companies,
-        'top_companies': top_companies,
+        # Top 10 korxonalar
+        'top_companies': _company_features(Company.objects.order_by('-current_gas_amount')[:10]),
     }
     return render(request, 'index.html', context)
 
@@ -58,64 +57,20 @@ def login_view(request):
         password = request.POST.get('password', '').strip()
         user_type = request.POST.get('user_type', 'committee')
 
-        print(f"Login attempt: {username_input}, type: {user_type}")  # Debug
-
         if not username_input or not password:
             messages.error(request, "Iltimos, barcha maydonlarni to'ldiring")
             return render(request, 'login.html', {'active_tab': user_type})
 
-        try:
-            user = None
-
-            # Agar korxona (factory) turi bo'lsa, oldin STIR bo'yicha qidiramiz,
-            # keyin username bo'yicha tekshiramiz.
-            if user_type == 'factory':
-                # 1) STIR bo'lib qidiring
-                try:
-                    user = User.objects.get(stir_number=username_input)
-                    print("Found by stir_number:", user.username)
-                except User.DoesNotExist:
-                    # 2) username bo'yicha qidiramiz
-                    try:
-                        user = User.objects.get(username=username_input)
-                        print("Found by username:", user.username)
-                    except User.DoesNotExist:
-                        user = None
-
-            # Agar Qo'mita turi bo'lsa, employee_id yoki username bo'yicha qidiring
-            else:  # committee
-                try:
-                    user = User.objects.get(employee_id=username_input)
-                    print("Found by employee_id:", user.username)
-                except User.DoesNotExist:
-                    try:
-                        user = User.objects.get(username=username_input)
-                        print("Found by username:", user.username)
-                    except User.DoesNotExist:
-                        user = None
-
-            # Agar user topilsa, authenticate qilish uchun uning username'ini ishlatamiz
-            if user:
-                authenticated_user = authenticate(request, username=user.username, password=password)
-            else:
-                # Hech qanday user topilmagan — fallback: authenticate raw username bilan urinib ko'rish
-                authenticated_user = authenticate(request, username=username_input, password=password)
-
-            if authenticated_user is not None:
-                # user type mosligini tekshirish
-                if authenticated_user.user_type == user_type:
-                    login(request, authenticated_user)
-                    return redirect('committee_dashboard' if user_type == 'committee' else 'company_dashboard')
-                else:
-                    messages.error(request, f'Siz {authenticated_user.get_user_type_display()} sifatida kira olmaysiz. Iltimos, to\'g\'ri kirish turini tanlang.')
-                    print("User type mismatch")
-            else:
-                messages.error(request, 'Login yoki parol noto\'g\'ri')
-                print("Authentication failed")
+        # CustomAuthBackend: STIR / employee_id / username bo'yicha bitta so'rov
+        authenticated_user = authenticate(request, username=username_input, password=password, user_type=user_type)
 
-        except Exception as e:
-            messages.error(request, f'Xatolik yuz berdi: {str(e)}')
-            print("Error in login_view:", e)
+        if authenticated_user is None:
+            messages.error(request, 'Login yoki parol noto\'g\'ri')
+        elif authenticated_user.user_type != user_type:
+            messages.error(request, f'Siz {authenticated_user.get_user_type_display()} sifatida kira olmaysiz. Iltimos, to\'g\'ri kirish turini tanlang.')
+        else:
+            login(request, authenticated_user)
+            return redirect('committee_dashboard' if user_type == 'committee' else 'company_dashboard')
 
     active_tab = request.POST.get('user_type', 'committee') if request.method == 'POST' else 'committee'
     return render(request, 'login.html', {'active_tab': active_tab})
@@ -135,25 +90,27 @@ from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse, HttpResponseBadRequest, HttpResponse
 from django.views.decorators.http import require_POST, require_GET
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.db.models import Q, Count
 from django.utils import timezone
-import math
-import uuid
 from .models import Company, Region, IndustryType, Penalty, SensorData, Notification
+from .pagination import InvalidCursor, KeysetPage, paginate
+from .penalty_rules import trees_needed
+from .search import search_companies
+
+# Qidiruv natijalari chegarasi (sahifalanmaydi)
+SEARCH_RESULTS_LIMIT = 50
+
+# Keyset sahifalash kalitlari
+COMPANY_PAGE_KEYS = [('name', False), ('id', False)]
+RECENT_PAGE_KEYS = [('created_at', True), ('id', True)]
 
 # --- Helper functions ---
 def compute_trees_needed(excess_amount):
     """
-    Daraxtlar sonini hisoblash uchun oddiy qoidalar.
-    Hozirgi qoidaga ko'ra: har 1 kg/soat ortiqcha uchun 2 ta daraxt.
-    (Qoida: TREES_PER_KG = 2)
-    O'zgartirish uchun shu funksiyani tahrirlang.
+    Daraxtlar sonini hisoblash (me'yor: penalty_rules.TREES_PER_KG_PER_HOUR).
+    Penalty.save() va ommaviy jarima bilan bir xil qoida.
     """
-    TREES_PER_KG = 2
-    if excess_amount <= 0:
-        return 0
-    return math.ceil(excess_amount * TREES_PER_KG)
+    return trees_needed(excess_amount)
 
 def company_extra_info(company):
     """
@@ -174,9 +131,8 @@ def dashboard(request):
     """
     Asosiy admin sahifasi: ekolog.html uchun barcha kerakli context'larni taqdim etadi.
     """
-    total_companies = Company.objects.count()
+    stats = get_dashboard_stats()
     dangerous_companies_qs = Company.objects.filter(current_gas_amount__gt=models.F('max_allowed_gas'))
-    dangerous_companies_count = dangerous_companies_qs.count()
 
     # recent penalties
     recent_penalties = Penalty.objects.select_related('company').order_by('-created_at')[:10]
@@ -194,9 +150,9 @@ def dashboard(request):
         dangerous_list.append(c)
 
     context = {
-        'total_companies': total_companies,
-        'dangerous_companies': dangerous_companies_count,
-        'active_penalties': Penalty.objects.filter(status='active').count(),
+        'total_companies': stats['total_companies'],
+        'dangerous_companies': stats['dangerous_companies'],
+        'active_penalties': stats['active_penalties'],
         'dangerous_companies_list': dangerous_list,
         'recent_penalties': recent_penalties,
         'region_stats': [{'name': r.name, 'company_count': r.company_count} for r in region_stats],
@@ -213,9 +169,10 @@ def dashboard_stats(request):
     JSON: tezkor statistikani qaytaradi (AJAX).
     JS: updateStatistics() shu endpointga murojaat qiladi.
     """
-    total_companies = Company.objects.count()
-    dangerous_companies = Company.objects.filter(current_gas_amount__gt=models.F('max_allowed_gas')).count()
-    active_penalties = Penalty.objects.filter(status='active').count()
+    stats = get_dashboard_stats()
+    total_companies = stats['total_companies']
+    dangerous_companies = stats['dangerous_companies']
+    active_penalties = stats['active_penalties']
 
     return JsonResponse({
         'total_companies': total_companies,
@@ -232,22 +189,25 @@ def companies(request):
     """
     search = request.GET.get('search', '').strip()
     status = request.GET.get('status', '').strip()
-    page = int(request.GET.get('page', 1))
 
-    qs = Company.objects.select_related('region', 'industry_type').order_by('name')
-
-    if search:
-        qs = qs.filter(Q(name__icontains=search) | Q(stir_number__icontains=search))
+    qs = Company.objects.select_related('region', 'industry_type')
 
     if status in ('good', 'moderate', 'bad'):
         qs = qs.filter(status=status)
 
-    paginator = Paginator(qs, 15)
-    page_obj = paginator.get_page(page)
+    if search:
+        # Qidiruv indeksi bo'yicha, mosligi bo'yicha saralangan natijalar (sahifasiz)
+        page = KeysetPage(search_companies(search, queryset=qs, limit=SEARCH_RESULTS_LIMIT), None, None)
+    else:
+        # Keyset sahifalash: (name, id) bo'yicha, COUNT(*) va OFFSET'siz
+        try:
+            page = paginate(qs, COMPANY_PAGE_KEYS, request.GET.get('cursor'), page_size=15)
+        except InvalidCursor as e:
+            return HttpResponseBadRequest(str(e))
 
     # qo'shimcha maydonlar
     companies_list = []
-    for c in page_obj.object_list:
+    for c in page:
         info = company_extra_info(c)
         c.get_trees_needed = info['trees_needed']
         c.excess_amount = info['excess_amount']
@@ -256,8 +216,7 @@ def companies(request):
     # render partial (sizda 'partials/companies_table.html' bo'lishi kerak)
     return render(request, 'partials/companies_table.html', {
         'companies': companies_list,
-        'page_obj': page_obj,
-        'paginator': paginator,
+        'page': page,
     })
 
 @login_required
@@ -268,24 +227,50 @@ def penalties(request):
     JS: loadPenalties() - POST yuboradi.
     """
     status = request.POST.get('status', '').strip()
-    qs = Penalty.objects.select_related('company').order_by('-created_at')
+    qs = Penalty.objects.select_related('company', 'company__region')
 
-    if status in ('active', 'completed', 'cancelled'):
+    if status in ('draft', 'active', 'completed', 'cancelled'):
         qs = qs.filter(status=status)
 
-    penalties_list = qs[:50]
+    try:
+        page = paginate(qs, RECENT_PAGE_KEYS, request.POST.get('cursor'), page_size=50)
+    except InvalidCursor as e:
+        return HttpResponseBadRequest(str(e))
 
     return render(request, 'partials/penalties_table.html', {
-        'penalties': penalties_list
+        'penalties': page,
+        'page': page,
     })
 
+import datetime as _datetime
+from .periods import aware_day_range as _aware_day_range
+
+def _penalty_window(data):
+    """
+    POST dan jarima rejimi va oynasi: mode (instant | duration),
+    window_start, window_end (YYYY-MM-DD, oxirgi kun ham kiradi).
+    Qaytaradi: (mode, boshlanish, tugash); oyna berilmasa (mode, None, None).
+    """
+    mode = data.get('mode') or 'instant'
+    if mode not in dict(Penalty.MODE_CHOICES):
+        raise ValueError("Noma'lum jarima rejimi")
+    if mode != 'duration' or not data.get('window_start') or not data.get('window_end'):
+        return mode, None, None
+    first = _datetime.date.fromisoformat(data['window_start'])
+    last = _datetime.date.fromisoformat(data['window_end'])
+    if first > last:
+        raise ValueError("Oyna boshlanishi tugashidan keyin")
+    start, end = _aware_day_range(first, last)
+    return mode, start, end
+
 @login_required
 @require_POST
 def create_penalty(request):
     """
     Jarima yaratish (AJAX).
     JS: createPenalty() -> yana serverdan result JSON kutadi.
-    Kutilgan POST maydonlar: company_id, deadline (YYYY-MM-DD), comment (ixtiyoriy)
+    Kutilgan POST maydonlar: company_id, deadline (YYYY-MM-DD), comment (ixtiyoriy),
+    mode, window_start, window_end (ixtiyoriy, _penalty_window ga qarang)
     """
     company_id = request.POST.get('company_id')
     deadline = request.POST.get('deadline')
@@ -299,18 +284,20 @@ def create_penalty(request):
     except Company.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Kompaniya topilmadi.'})
 
-    # Excess amount hisoblash
-    excess = max(0.0, company.current_gas_amount - company.max_allowed_gas)
-    trees_required = compute_trees_needed(excess)
+    try:
+        mode, window_start, window_end = _penalty_window(request.POST)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)})
 
+    # excess_amount va trees_required Penalty.save() da hisoblanadi
     try:
         penalty = Penalty.objects.create(
             company=company,
-            excess_amount=round(excess, 2),
-            trees_required=trees_required,
             status='active',
             deadline=deadline,
-            penalty_number=f"PEN-{uuid.uuid4().hex[:8].upper()}",
+            mode=mode,
+            window_start=window_start,
+            window_end=window_end,
         )
 
         # Agar comment bo'lsa, PenaltyResponse ham yaratish mumkin
@@ -331,31 +318,28 @@ from django.db.models import Count, Q, Sum, Max
 from django.utils import timezone
 from django.db import models
 import datetime
-import io
-import pandas as pd
+import os
+from . import exports
 from django.utils.timezone import make_naive
 from django.core.paginator import Paginator
 
 from .models import Company, Region, IndustryType, Penalty, SensorData
+from .periods import aware_day_range as _aware_day_range, parse_period
+from .reports import build_committee_report, get_company_report
+from .snapshots import counts_from_stats as _snapshot_counts, monthly_status_trend
+from .stats import get_dashboard_stats
 
 # --- Helper for report generation ---
-def _get_month_range(year, month):
-    start = datetime.date(year, month, 1)
-    if month == 12:
-        end = datetime.date(year + 1, 1, 1) - datetime.timedelta(days=1)
-    else:
-        end = datetime.date(year, month + 1, 1) - datetime.timedelta(days=1)
-    return start, end
-
 @login_required
 def dashboard_page(request):
     """
     Bosh sahifa - Dashboard
     """
     # Umumiy statistika
-    total_companies = Company.objects.count()
-    dangerous_companies = Company.objects.filter(current_gas_amount__gt=models.F('max_allowed_gas')).count()
-    active_penalties = Penalty.objects.filter(status='active').count()
+    stats = get_dashboard_stats()
+    total_companies = stats['total_companies']
+    dangerous_companies = stats['dangerous_companies']
+    active_penalties = stats['active_penalties']
     
     # Xavfli korxonalar ro'yxati
     dangerous_companies_list = Company.objects.filter(
@@ -384,16 +368,13 @@ def companies_page(request):
     
     companies = Company.objects.select_related('region', 'industry_type').all()
     
-    if search:
-        companies = companies.filter(
-            Q(name__icontains=search) | 
-            Q(stir_number__icontains=search) |
-            Q(region__name__icontains=search)
-        )
-    
     if status:
         companies = companies.filter(status=status)
     
+    if search:
+        # search_text nom, STIR va hudud nomini o'z ichiga oladi
+        companies = search_companies(search, queryset=companies, limit=200)
+    
     # Pagination
     paginator = Paginator(companies, 20)
     page_number = request.GET.get('page')
@@ -441,9 +422,10 @@ def reports_page(request):
     default_month = today.month
 
     # Umumiy statistika
-    total_companies = Company.objects.count()
-    dangerous_companies = Company.objects.filter(current_gas_amount__gt=models.F('max_allowed_gas')).count()
-    active_penalties = Penalty.objects.filter(status='active').count()
+    stats = get_dashboard_stats()
+    total_companies = stats['total_companies']
+    dangerous_companies = stats['dangerous_companies']
+    active_penalties = stats['active_penalties']
 
     context = {
         'regions': regions,
@@ -465,9 +447,13 @@ def report_data(request):
     year = int(request.GET.get('year', timezone.localdate().year))
     month = request.GET.get('month')
 
-    # Korxona holatlari bo'yicha taqsimot
-    status_qs = Company.objects.values('status').annotate(cnt=Count('id'))
-    status_counts = {row['status']: row['cnt'] for row in status_qs}
+    # Joriy holatlar bo'yicha taqsimot va umumiy statistika (keshdan)
+    stats = get_dashboard_stats()
+    status_counts = {
+        'good': stats['good_companies'],
+        'moderate': stats['moderate_companies'],
+        'bad': stats['bad_companies'],
+    }
     
     # Holat nomlarini o'zbek tilida qaytarish
     status_mapping = {
@@ -501,28 +487,13 @@ def report_data(request):
         'Xavfli': []
     }
     
+    # Har oyning oxirgi kunlik snapshot'idan (snapshot yo'q oylar uchun None)
+    snapshots = monthly_status_trend(year, live_counts=_snapshot_counts(stats))
     for m in range(1, 13):
-        start = datetime.date(year, m, 1)
-        if m == 12:
-            end = datetime.date(year + 1, 1, 1) - datetime.timedelta(days=1)
-        else:
-            end = datetime.date(year, m + 1, 1) - datetime.timedelta(days=1)
-
-        # Har bir holat bo'yicha hisoblash
-        good_count = Company.objects.filter(
-            status='good',
-            created_at__date__lte=end
-        ).count()
-        
-        moderate_count = Company.objects.filter(
-            status='moderate', 
-            created_at__date__lte=end
-        ).count()
-        
-        bad_count = Company.objects.filter(
-            status='bad',
-            created_at__date__lte=end
-        ).count()
+        snapshot = snapshots[m - 1]
+        good_count = snapshot['good_count'] if snapshot else None
+        moderate_count = snapshot['moderate_count'] if snapshot else None
+        bad_count = snapshot['bad_count'] if snapshot else None
         
         status_trend_data['Yaxshi'].append(good_count)
         status_trend_data['Oʻrtacha'].append(moderate_count)
@@ -552,9 +523,9 @@ def report_data(request):
         })
 
     # Umumiy statistika
-    total_companies = Company.objects.count()
-    dangerous_companies = Company.objects.filter(current_gas_amount__gt=models.F('max_allowed_gas')).count()
-    active_penalties = Penalty.objects.filter(status='active').count()
+    total_companies = stats['total_companies']
+    dangerous_companies = stats['dangerous_companies']
+    active_penalties = stats['active_penalties']
 
     return JsonResponse({
         'by_status': by_status,
@@ -571,148 +542,59 @@ def report_data(request):
 @login_required
 def download_report(request):
     """
-    Excel hisobot yaratadi va yuboradi.
+    Hisobotni yuboradi: format=xlsx (standart) yoki format=csv|ndjson&dataset=companies|penalties.
+    Ma'lumotlar xotirada to'planmaydi - bo'laklab o'qiladi va oqim bilan yuboriladi.
     """
     report_type = request.GET.get('report_type', 'monthly')
-    year = int(request.GET.get('year', timezone.localdate().year))
-    month = request.GET.get('month')
-    
-    if report_type == 'monthly':
-        if month is None:
-            return HttpResponseBadRequest("month parametri monthly hisobot uchun majburiy")
-        month = int(month)
-        start_date, end_date = _get_month_range(year, month)
-        period_label = f"{year}-{month:02d}"
-    elif report_type == 'quarterly':
-        quarter = int(request.GET.get('quarter', 1))
-        start_month = (quarter - 1) * 3 + 1
-        start_date = datetime.date(year, start_month, 1)
-        end_month = start_month + 2
-        _, end_day = _get_month_range(year, end_month)
-        end_date = end_day
-        period_label = f"{year}-Q{quarter}"
-    elif report_type == 'yearly':
-        start_date = datetime.date(year, 1, 1)
-        end_date = datetime.date(year, 12, 31)
-        period_label = f"{year}"
-    else:
-        return HttpResponseBadRequest("Noto'g'ri report_type")
-
-    # Umumiy statistika
-    total_companies = Company.objects.count()
-    dangerous_companies = Company.objects.filter(current_gas_amount__gt=models.F('max_allowed_gas')).count()
-    active_penalties = Penalty.objects.filter(status='active').count()
-
-    # Korxonalar jadvali
-    companies_qs = Company.objects.select_related('region', 'industry_type').all().order_by('region__name', 'name')
-    companies_data = []
-    for c in companies_qs:
-        companies_data.append({
-            'ID': c.id,
-            'Korxona nomi': c.name,
-            'STIR raqami': c.stir_number,
-            'Hudud': c.region.name,
-            'Sanoat turi': c.industry_type.name,
-            'Kenglik': c.latitude,
-            'Uzunlik': c.longitude,
-            'Ruxsat etilgan maksimal gaz': f"{c.max_allowed_gas} kg",
-            'Joriy gaz miqdori': f"{c.current_gas_amount} kg",
-            'Holati': c.get_status_display(),
-            'Sensor faol': "Ha" if c.sensor_active else "Yo'q",
-            'Yaratilgan sana': c.created_at.strftime("%d.%m.%Y %H:%M"),
-        })
-
-    # Jarimalar davr bo'yicha
-    penalties_qs = Penalty.objects.filter(
-        created_at__date__gte=start_date, 
-        created_at__date__lte=end_date
-    ).select_related('company').order_by('-created_at')
-    
-    penalties_data = []
-    for p in penalties_qs:
-        penalties_data.append({
-            'Jarima raqami': p.penalty_number,
-            'Korxona': p.company.name,
-            'Oshib ketgan miqdor': f"{p.excess_amount} kg",
-            'Kerakli daraxtlar': f"{p.trees_required} ta",
-            'Holati': p.get_status_display(),
-            'Muddati': p.deadline.strftime("%d.%m.%Y"),
-            'Yaratilgan sana': p.created_at.strftime("%d.%m.%Y %H:%M"),
-        })
-
-    # Oylik trend
-    trend = []
-    for m in range(1, 13):
-        month_start = datetime.date(year, m, 1)
-        if m == 12:
-            month_end = datetime.date(year + 1, 1, 1) - datetime.timedelta(days=1)
-        else:
-            month_end = datetime.date(year, m + 1, 1) - datetime.timedelta(days=1)
-            
-        dangerous_count = Company.objects.filter(
-            current_gas_amount__gt=models.F('max_allowed_gas'),
-            created_at__date__lte=month_end
-        ).count()
-        
-        trend.append({
-            'Oy': f"{year}-{m:02d}", 
-            'Xavfli korxonalar soni': dangerous_count
-        })
-
-    # Excel yaratish
-    output = io.BytesIO()
-    
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        # Overview sheet
-        overview_data = [{
-            'Hisobot davri': period_label,
-            'Jami korxonalar': total_companies,
-            'Xavfli korxonalar': dangerous_companies,
-            'Faol jarimalar': active_penalties,
-            'Yaratilgan sana': timezone.now().strftime("%d.%m.%Y %H:%M")
-        }]
-        overview_df = pd.DataFrame(overview_data)
-        overview_df.to_excel(writer, sheet_name='Umumiy maʼlumot', index=False)
-
-        # Korxonalar sheet
-        if companies_data:
-            companies_df = pd.DataFrame(companies_data)
-            companies_df.to_excel(writer, sheet_name='Korxonalar', index=False)
+    try:
+        start_date, end_date, period_label = parse_period(
+            report_type,
+            request.GET.get('year', timezone.localdate().year),
+            request.GET.get('month'),
+            request.GET.get('quarter'),
+        )
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    period_start, period_end = _aware_day_range(start_date, end_date)
+
+    # CSV / NDJSON: bitta jadval (dataset=companies|penalties) oqim bilan
+    export_format = request.GET.get('format', 'xlsx')
+    if export_format in ('csv', 'ndjson'):
+        dataset = request.GET.get('dataset', 'companies')
+        if dataset == 'companies':
+            headers, rows = exports.COMPANY_HEADERS, exports.company_rows()
+        elif dataset == 'penalties':
+            headers, rows = exports.PENALTY_HEADERS, exports.penalty_rows(period_start, period_end)
         else:
-            pd.DataFrame({'Maʼlumot': ['Hech qanday korxona topilmadi']}).to_excel(
-                writer, sheet_name='Korxonalar', index=False
-            )
-
-        # Jarimalar sheet
-        if penalties_data:
-            penalties_df = pd.DataFrame(penalties_data)
-            penalties_df.to_excel(writer, sheet_name='Jarimalar', index=False)
+            return HttpResponseBadRequest("Noto'g'ri dataset")
+        if export_format == 'csv':
+            chunks, content_type = exports.csv_chunks(headers, rows), exports.CSV_CONTENT_TYPE
         else:
-            pd.DataFrame({'Maʼlumot': [f'{period_label} davrida hech qanday jarima topilmadi']}).to_excel(
-                writer, sheet_name='Jarimalar', index=False
-            )
-
-        # Trend sheet
-        trend_df = pd.DataFrame(trend)
-        trend_df.to_excel(writer, sheet_name='Oylik trend', index=False)
-
-    output.seek(0)
+            chunks, content_type = exports.ndjson_chunks(headers, rows), exports.NDJSON_CONTENT_TYPE
+        filename = f"ekolog_{dataset}_{period_label}.{export_format}"
+        return exports.streaming_response(request, chunks, content_type, filename)
+    if export_format != 'xlsx':
+        return HttpResponseBadRequest("Noto'g'ri format")
+
+    # Excel: write-only rejimda vaqtinchalik faylga, keyin bo'laklab yuboriladi.
+    # Katta hisobotlar uchun fon rejimi: /reports/jobs/
+    output = build_committee_report(start_date, end_date, period_label)
+    size = os.fstat(output.fileno()).st_size
     filename = f"ekolog_hisobot_{period_label}.xlsx"
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return exports.streaming_response(
+        request, exports.file_chunks(output), exports.XLSX_CONTENT_TYPE, filename, length=size,
     )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
 
 @login_required
 def dashboard_stats(request):
     """
     Dashboard uchun real-time statistika
     """
-    total_companies = Company.objects.count()
-    dangerous_companies = Company.objects.filter(current_gas_amount__gt=models.F('max_allowed_gas')).count()
-    active_penalties = Penalty.objects.filter(status='active').count()
+    stats = get_dashboard_stats()
+    total_companies = stats['total_companies']
+    dangerous_companies = stats['dangerous_companies']
+    active_penalties = stats['active_penalties']
     
     return JsonResponse({
         'total_companies': total_companies,
@@ -729,22 +611,21 @@ from django.http import JsonResponse, HttpResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Q, Sum, Min, Max
+from django.db.models.functions import TruncMonth
+from django.views.decorators.http import require_GET, require_POST
 import json
 import datetime
-from .models import Company, Penalty, SensorData, Notification
+from .models import Company, Penalty, Region, SensorData, SensorRollup, Notification
+from .notifications import create_broadcast, get_unread_count, mark_read, recent_broadcasts
+from .decorators import factory_required
 
-@login_required
+@factory_required(html=True)
 def company_dashboard(request):
     """
     Korxona dashboard sahifasi
     """
-    if request.user.user_type != 'factory':
-        return render(request, 'error.html', {'error': 'Sizga korxona paneliga kirish ruxsati yo\'q'})
-    
-    company = request.user.company
-    if not company:
-        return render(request, 'error.html', {'error': 'Sizga biriktirilgan korxona topilmadi'})
+    company = request.company
     
     # Sensor ma'lumotlari
     sensor_data = SensorData.objects.filter(company=company).order_by('-recorded_at')[:10]
@@ -764,28 +645,29 @@ def company_dashboard(request):
     
     return render(request, 'korxona.html', context)
 
-@login_required
+@factory_required
 @csrf_exempt
 def company_penalties(request):
     """
     Korxona jarimalari ro'yxati (AJAX)
     """
-    if request.user.user_type != 'factory':
-        return JsonResponse({'error': 'Ruxsat yo\'q'}, status=403)
-    
-    company = request.user.company
-    if not company:
-        return JsonResponse({'error': 'Korxona topilmadi'}, status=404)
+    company = request.company
     
     status_filter = request.GET.get('status', '')
     
-    penalties = Penalty.objects.filter(company=company)
+    # Qoralamalar qo'mita tasdiqlagandan keyin ko'rinadi
+    penalties = Penalty.objects.filter(company=company).exclude(status='draft')
     
     if status_filter:
         penalties = penalties.filter(status=status_filter)
     
+    try:
+        page = paginate(penalties, RECENT_PAGE_KEYS, request.GET.get('cursor'), page_size=20)
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
     penalties_data = []
-    for penalty in penalties.order_by('-created_at'):
+    for penalty in page:
         penalties_data.append({
             'id': penalty.id,
             'penalty_number': penalty.penalty_number,
@@ -798,22 +680,22 @@ def company_penalties(request):
             'response': getattr(penalty, 'response_data', None)
         })
     
-    return JsonResponse({'penalties': penalties_data})
+    return JsonResponse({
+        'penalties': penalties_data,
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
 
-@login_required
+@factory_required
 @csrf_exempt
 def submit_penalty_response(request, penalty_id):
     """
     Jarimaga javob yuborish
     """
-    if request.user.user_type != 'factory':
-        return JsonResponse({'success': False, 'error': 'Ruxsat yo\'q'})
+    company = request.company
     
-    company = request.user.company
-    if not company:
-        return JsonResponse({'success': False, 'error': 'Korxona topilmadi'})
-    
-    penalty = get_object_or_404(Penalty, id=penalty_id, company=company)
+    # Qoralama jarimalar qo'mita tasdiqlagunicha korxonaga ko'rinmaydi
+    penalty = get_object_or_404(Penalty.objects.exclude(status='draft'), id=penalty_id, company=company)
     
     if request.method == 'POST':
         try:
@@ -851,17 +733,12 @@ def submit_penalty_response(request, penalty_id):
     
     return JsonResponse({'success': False, 'error': 'Faqat POST so\'rovi qabul qilinadi'})
 
-@login_required
+@factory_required
 def company_sensor_data(request):
     """
     Sensor ma'lumotlarini olish (real-time)
     """
-    if request.user.user_type != 'factory':
-        return JsonResponse({'error': 'Ruxsat yo\'q'}, status=403)
-    
-    company = request.user.company
-    if not company:
-        return JsonResponse({'error': 'Korxona topilmadi'}, status=404)
+    company = request.company
     
     # Oxirgi sensor ma'lumotlari
     latest_sensor_data = SensorData.objects.filter(company=company).order_by('-recorded_at').first()
@@ -878,22 +755,85 @@ def company_sensor_data(request):
     
     return JsonResponse(data)
 
-@login_required
+@factory_required
+@require_GET
+def company_sensor_history(request):
+    """
+    Grafiklar uchun sensor tarixi (SensorRollup agregatlaridan, xom qatorlarsiz).
+    granularity: minute (oxirgi 1 soat), hour (oxirgi 24 soat), day (oxirgi 30 kun),
+    month (?year=YYYY bo'yicha 12 oy, kunlik agregatlardan).
+    """
+    company = request.company
+    
+    granularity = request.GET.get('granularity', 'hour')
+    rollups = SensorRollup.objects.filter(company=company)
+    
+    if granularity == 'month':
+        try:
+            year = int(request.GET.get('year', timezone.localdate().year))
+        except ValueError:
+            return JsonResponse({'error': 'Noto\'g\'ri yil'}, status=400)
+        rows = (
+            rollups.filter(granularity='day', bucket_start__year=year)
+            .annotate(bucket=TruncMonth('bucket_start'))
+            .values('bucket')
+            .annotate(
+                count=Sum('sample_count'), total=Sum('gas_sum'), low=Min('gas_min'),
+                high=Max('gas_max'), exceeded=Sum('exceed_count'),
+            )
+            .order_by('bucket')
+        )
+        series = [{
+            'bucket': row['bucket'].isoformat(),
+            'count': row['count'],
+            'avg': row['total'] / row['count'] if row['count'] else None,
+            'min': row['low'],
+            'max': row['high'],
+            'exceed_count': row['exceeded'],
+        } for row in rows]
+    elif granularity in ('minute', 'hour', 'day'):
+        window = {
+            'minute': datetime.timedelta(hours=1),
+            'hour': datetime.timedelta(hours=24),
+            'day': datetime.timedelta(days=30),
+        }[granularity]
+        rows = rollups.filter(
+            granularity=granularity, bucket_start__gte=timezone.now() - window
+        ).order_by('bucket_start')
+        series = [{
+            'bucket': r.bucket_start.isoformat(),
+            'count': r.sample_count,
+            'avg': r.gas_avg,
+            'min': r.gas_min,
+            'max': r.gas_max,
+            'exceed_count': r.exceed_count,
+        } for r in rows]
+    else:
+        return JsonResponse({'error': 'Noto\'g\'ri granularity'}, status=400)
+    
+    return JsonResponse({
+        'granularity': granularity,
+        'max_allowed_gas': company.max_allowed_gas,
+        'series': series,
+    })
+
+@factory_required
 def company_notifications(request):
     """
     Korxona ogohlantirishlari
     """
-    if request.user.user_type != 'factory':
-        return JsonResponse({'error': 'Ruxsat yo\'q'}, status=403)
+    company = request.company
     
-    company = request.user.company
-    if not company:
-        return JsonResponse({'error': 'Korxona topilmadi'}, status=404)
-    
-    notifications = Notification.objects.filter(company=company).order_by('-created_at')[:10]
+    try:
+        page = paginate(
+            Notification.objects.filter(company=company), RECENT_PAGE_KEYS,
+            request.GET.get('cursor'), page_size=10,
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
     
     notifications_data = []
-    for notification in notifications:
+    for notification in page:
         notifications_data.append({
             'id': notification.id,
             'message': notification.message,
@@ -901,48 +841,103 @@ def company_notifications(request):
             'created_at': notification.created_at.strftime('%Y-%m-%d %H:%M')
         })
     
-    return JsonResponse({'notifications': notifications_data})
+    # Hudud bo'yicha umumiy xabarlar
+    broadcasts_data = [
+        {
+            'id': broadcast.id,
+            'message': broadcast.message,
+            'is_read': is_read,
+            'created_at': timezone.localtime(broadcast.created_at).strftime('%Y-%m-%d %H:%M'),
+        }
+        for broadcast, is_read in recent_broadcasts(company)
+    ]
+    
+    return JsonResponse({
+        'notifications': notifications_data,
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+        'broadcasts': broadcasts_data,
+        'unread_count': get_unread_count(company),
+    })
+
+@factory_required
+@require_GET
+def company_unread_count(request):
+    """Badge uchun o'qilmagan xabarlar soni (keshdan)."""
+    company = request.company
+    return JsonResponse({'unread_count': get_unread_count(company)})
+
+def _id_list(values):
+    return [int(value) for value in values if str(value).isdigit()]
+
+@factory_required
+@require_POST
+def mark_notifications_read(request):
+    """
+    Xabarlarni o'qilgan deb belgilaydi.
+    POST: notification_ids, broadcast_ids (ikkalasi ham berilmasa - hammasi).
+    """
+    company = request.company
+    notification_ids = request.POST.getlist('notification_ids')
+    broadcast_ids = request.POST.getlist('broadcast_ids')
+    if notification_ids or broadcast_ids:
+        updated = mark_read(company, _id_list(notification_ids), _id_list(broadcast_ids))
+    else:
+        updated = mark_read(company)
+    return JsonResponse({'success': True, 'updated': updated, 'unread_count': get_unread_count(company)})
 
 @login_required
+@require_POST
+def create_broadcast_view(request):
+    """Qo'mita: hudud (region_id) yoki barcha korxonalarga xabar yuborish."""
+    if request.user.user_type != 'committee':
+        return JsonResponse({'error': 'Ruxsat yo\'q'}, status=403)
+    message = request.POST.get('message', '').strip()
+    if not message:
+        return JsonResponse({'error': 'Xabar matni kiritilmagan'}, status=400)
+    region = None
+    if request.POST.get('region_id'):
+        region = Region.objects.filter(pk=request.POST['region_id']).first()
+        if region is None:
+            return JsonResponse({'error': 'Hudud topilmadi'}, status=404)
+    broadcast = create_broadcast(message, region=region, user=request.user)
+    return JsonResponse({'id': broadcast.id, 'recipient_count': broadcast.recipient_count}, status=201)
+
+@factory_required
 def download_company_report(request, report_type):
     """
     Korxona hisobotlarini yuklab olish
     """
-    if request.user.user_type != 'factory':
-        return JsonResponse({'error': 'Ruxsat yo\'q'}, status=403)
-    
-    company = request.user.company
-    if not company:
-        return JsonResponse({'error': 'Korxona topilmadi'}, status=404)
+    company = request.company
     
     # Hisobot turi
     valid_report_types = ['monthly', 'quarterly', 'yearly']
     if report_type not in valid_report_types:
         return JsonResponse({'error': 'Noto\'g\'ri hisobot turi'}, status=400)
     
-    # Hisobot yaratish va yuklab olish logikasi
-    # Bu yerda Excel yoki PDF hisobot yaratish kodi bo'ladi
+    # Davr: standart - joriy oy/chorak/yil
+    today = timezone.localdate()
+    try:
+        start_date, end_date, period_label = parse_period(
+            report_type,
+            request.GET.get('year', today.year),
+            request.GET.get('month', today.month),
+            request.GET.get('quarter', (today.month - 1) // 3 + 1),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     
-    # Vaqtincha muvaffaqiyat xabarini qaytaramiz
-    return JsonResponse({
-        'success': True,
-        'message': f'{report_type} hisobot yuklab olindi',
-        'report_type': report_type,
-        'company': company.name
-    })
+    # Oldindan hisoblangan davr ko'rsatkichlaridan; tayyor fayl bo'lsa qayta ishlatiladi
+    report = get_company_report(company, report_type, start_date, end_date, period_label)
+    return _report_file_response(request, report)
 
-@login_required
+@factory_required
 @csrf_exempt
 def update_sensor_data(request):
     """
     Sensor ma'lumotlarini yangilash (simulyatsiya uchun)
     """
-    if request.user.user_type != 'factory':
-        return JsonResponse({'error': 'Ruxsat yo\'q'}, status=403)
-    
-    company = request.user.company
-    if not company:
-        return JsonResponse({'error': 'Korxona topilmadi'}, status=404)
+    company = request.company
     
     if request.method == 'POST':
         try:
@@ -950,15 +945,10 @@ def update_sensor_data(request):
             gas_amount = data.get('gas_amount')
             
             if gas_amount is not None:
-                # Yangi sensor ma'lumotini yaratish
-                SensorData.objects.create(
-                    company=company,
-                    gas_amount=gas_amount
-                )
-                
-                # Kompaniyaning joriy gaz miqdorini yangilash
-                company.current_gas_amount = gas_amount
-                company.save()
+                # Yangi sensor ma'lumotini yaratish va joriy gaz miqdorini yangilash
+                result = ingest_readings([{'gas_amount': gas_amount}], company=company)
+                if not result['accepted']:
+                    return JsonResponse({'success': False, 'error': result['results'][0]['error']})
                 
                 return JsonResponse({
                     'success': True,
@@ -974,4 +964,465 @@ def update_sensor_data(request):
     return JsonResponse({'success': False, 'error': 'Faqat POST so\'rovi qabul qilinadi'})
 
 
+# Sensor ma'lumotlarini partiya (batch) bilan qabul qilish
+from .ingest import ingest_readings, parse_readings_body, IngestError, MAX_BATCH_SIZE
+
+@factory_required(allow_committee=True)
+@csrf_exempt
+@require_POST
+def bulk_sensor_data(request):
+    """
+    Ko'p korxonalar uchun ko'p o'qishlarni bitta so'rovda qabul qiladi.
+    Tana: JSON ro'yxat, {"readings": [...]} yoki NDJSON (application/x-ndjson).
+    Har bir qator: {"company_id" | "stir_number", "gas_amount"}.
+    Korxona foydalanuvchisi faqat o'z korxonasiga yozishi mumkin.
+    Javob: har bir qator uchun accepted/rejected natijasi.
+    """
+    try:
+        readings = parse_readings_body(request.body, request.content_type or '')
+    except IngestError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    if len(readings) > MAX_BATCH_SIZE:
+        return JsonResponse({
+            'success': False,
+            'error': f'Bir so\'rovda ko\'pi bilan {MAX_BATCH_SIZE} ta o\'qish yuborish mumkin'
+        }, status=413)
+
+    result = ingest_readings(readings, company=request.company)
+    return JsonResponse({'success': True, **result})
+
+
+# Jonli yangilanishlar (Server-Sent Events)
+import asyncio
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from .live import get_broker
+
+LIVE_HEARTBEAT_INTERVAL = getattr(settings, 'LIVE_HEARTBEAT_INTERVAL', 15)  # soniya
+
+def _allowed_live_channel(user, channel):
+    if channel == 'companies':
+        return True
+    if channel.startswith('region:'):
+        return channel[len('region:'):].isdigit()
+    if not user.is_authenticated:
+        return False
+    if channel == 'committee':
+        return user.user_type == 'committee'
+    if channel.startswith('company:'):
+        return user.user_type == 'factory' and channel == f'company:{user.company_id}'
+    return False
+
+async def _live_event_stream(channels):
+    broker = get_broker()
+    subscription = broker.subscribe(channels)
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                event = await subscription.get(timeout=LIVE_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                # Proxy'lar ulanishni yopmasligi uchun
+                yield ': ping\n\n'
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
+@require_GET
+async def live_events(request):
+    """
+    SSE oqimi: ?channel=companies|region:<id>|company:<id>|committee (bir nechta bo'lishi mumkin).
+    Kanal ko'rsatilmasa: qo'mita -> committee + companies, korxona -> company:<id>,
+    mehmon -> companies.
+    Faqat ASGI ostida ishlaydi: WSGI cheksiz oqimni ro'yxatga yig'ib, worker'ni band qilib qo'yadi.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Jonli yangilanish faqat ASGI serverda ishlaydi'}, status=503)
+
+    user = await request.auser()
+    channels = request.GET.getlist('channel')
+    if not channels:
+        if user.is_authenticated and user.user_type == 'committee':
+            channels = ['committee', 'companies']
+        elif user.is_authenticated and user.company_id:
+            channels = [f'company:{user.company_id}']
+        else:
+            channels = ['companies']
+
+    for channel in channels:
+        if not _allowed_live_channel(user, channel):
+            return JsonResponse({'error': f'Kanalga ruxsat yo\'q: {channel}'}, status=403)
+
+    response = StreamingHttpResponse(_live_event_stream(channels), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+
+# Ochiq xarita uchun korxonalar (GeoJSON)
+from django.db.models import Count, Max
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+def _company_map_version(request):
+    """(oxirgi updated_at, korxonalar soni) - bitta so'rov, so'rov davomida eslab qolinadi."""
+    if not hasattr(request, '_company_map_version'):
+        version = Company.objects.aggregate(last=Max('updated_at'), count=Count('id'))
+        request._company_map_version = (version['last'], version['count'])
+    return request._company_map_version
+
+def _company_map_etag(request):
+    last, count = _company_map_version(request)
+    # O'chirilgan korxona updated_at'ni o'zgartirmaydi, shuning uchun son ham kiradi
+    return f"{count}-{last.timestamp() if last else 0}"
+
+def _company_map_last_modified(request):
+    return _company_map_version(request)[0]
+
+def _company_features(queryset):
+    rows = queryset.values_list(
+        'id', 'name', 'region__name', 'industry_type__name', 'longitude', 'latitude',
+        'current_gas_amount', 'max_allowed_gas', 'status', 'sensor_active',
+    )
+    return [
+        {
+            'type': 'Feature',
+            'id': pk,
+            'geometry': {'type': 'Point', 'coordinates': [lng, lat]},
+            'properties': {
+                'name': name,
+                'region': region,
+                'type': industry,
+                'gas': gas,
+                'max': max_allowed,
+                'status': status,
+                'sensor': sensor,
+            },
+        }
+        for pk, name, region, industry, lng, lat, gas, max_allowed, status, sensor in rows
+    ]
+
+@require_GET
+@cache_control(public=True, no_cache=True)
+@condition(etag_func=_company_map_etag, last_modified_func=_company_map_last_modified)
+def company_map_data(request):
+    """
+    Bosh sahifa xaritasi uchun korxonalar ro'yxati (GeoJSON FeatureCollection).
+    Ma'lumot o'zgarmagan bo'lsa (If-None-Match / If-Modified-Since) 304 qaytadi.
+    """
+    features = _company_features(Company.objects.order_by('id'))
+    return JsonResponse({'type': 'FeatureCollection', 'features': features})
+
+
+# Xarita oynasi (viewport) bo'yicha korxonalar
+from django.db.models.functions import Substr
+from . import geo
+
+# Shu zoom'dan boshlab alohida nuqtalar, undan past - klasterlar
+CLUSTER_MAX_ZOOM = getattr(settings, 'MAP_CLUSTER_MAX_ZOOM', 14)
+
+def _parse_bbox(value):
+    """'g'arb,janub,sharq,shimol' -> (south, west, north, east) yoki None."""
+    try:
+        west, south, east, north = (float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if not (-90 <= south < north <= 90 and -180 <= west < east <= 180):
+        return None
+    return south, west, north, east
+
+@require_GET
+def company_viewport(request):
+    """
+    ?bbox=g'arb,janub,sharq,shimol&zoom=Z - faqat oynadagi korxonalar (GeoJSON).
+    zoom < CLUSTER_MAX_ZOOM bo'lsa korxonalar geohash kataklari bo'yicha
+    serverda klasterlanadi: har bir klaster - soni, o'rtacha koordinatasi va
+    holatlar bo'yicha soni.
+    """
+    bbox = _parse_bbox(request.GET.get('bbox'))
+    if bbox is None:
+        return JsonResponse({'error': "bbox noto'g'ri: g'arb,janub,sharq,shimol"}, status=400)
+    try:
+        zoom = int(request.GET.get('zoom', CLUSTER_MAX_ZOOM))
+    except ValueError:
+        return JsonResponse({'error': "zoom noto'g'ri"}, status=400)
+
+    south, west, north, east = bbox
+    # Geohash indeksidan oraliq so'rovlari, keyin aniq koordinata filtri
+    cells = Q()
+    for prefix in geo.cover(south, west, north, east):
+        cells |= Q(geohash__gte=prefix, geohash__lt=prefix + geo.RANGE_END)
+    companies = Company.objects.filter(cells).filter(
+        latitude__range=(south, north), longitude__range=(west, east),
+    )
+
+    if zoom >= CLUSTER_MAX_ZOOM:
+        return JsonResponse({
+            'type': 'FeatureCollection',
+            'clustered': False,
+            'features': _company_features(companies.order_by('id')),
+        })
+
+    precision = geo.cluster_precision(zoom)
+    rows = (
+        companies.annotate(cell=Substr('geohash', 1, precision))
+        .values('cell')
+        .annotate(
+            count=Count('id'),
+            lat=Avg('latitude'),
+            lng=Avg('longitude'),
+            good=Count('id', filter=Q(status='good')),
+            moderate=Count('id', filter=Q(status='moderate')),
+            bad=Count('id', filter=Q(status='bad')),
+        )
+        .order_by('cell')
+    )
+    features = [
+        {
+            'type': 'Feature',
+            'id': row['cell'],
+            'geometry': {'type': 'Point', 'coordinates': [row['lng'], row['lat']]},
+            'properties': {
+                'cluster': True,
+                'count': row['count'],
+                'good': row['good'],
+                'moderate': row['moderate'],
+                'bad': row['bad'],
+            },
+        }
+        for row in rows
+    ]
+    return JsonResponse({'type': 'FeatureCollection', 'clustered': True, 'features': features})
+
+
+# Nuqta atrofidagi korxonalar (radius bo'yicha qidiruv)
+import numpy as np
+
+MAX_SEARCH_RADIUS_KM = 50
+MAX_SEARCH_RESULTS = 500
+
+@login_required
+@require_GET
+def companies_nearby(request):
+    """
+    ?lat=..&lng=..&radius=5 (km) - shu doira ichidagi korxonalar, masofa bo'yicha saralangan.
+    Nomzodlar avval geohash indeksi va bbox bilan qisqartiriladi, aniq masofa
+    esa NumPy'da bir martada hisoblanadi.
+    """
+    try:
+        lat = float(request.GET['lat'])
+        lng = float(request.GET['lng'])
+        radius_km = float(request.GET.get('radius', 5))
+        limit = int(request.GET.get('limit', 100))
+    except (KeyError, ValueError):
+        return JsonResponse({'error': "lat, lng (va radius km) ko'rsatilishi kerak"}, status=400)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return JsonResponse({'error': "Koordinatalar noto'g'ri"}, status=400)
+    if not 0 < radius_km <= MAX_SEARCH_RADIUS_KM:
+        return JsonResponse({'error': f'radius 0 dan {MAX_SEARCH_RADIUS_KM} km gacha bo\'lishi kerak'}, status=400)
+    limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+
+    radius_m = radius_km * 1000
+    south, west, north, east = geo.radius_bbox(lat, lng, radius_m)
+    cells = Q()
+    for prefix in geo.cover(south, west, north, east):
+        cells |= Q(geohash__gte=prefix, geohash__lt=prefix + geo.RANGE_END)
+    candidates = _company_features(
+        Company.objects.filter(cells).filter(
+            latitude__range=(south, north), longitude__range=(west, east),
+        )
+    )
+
+    results = []
+    if candidates:
+        coords = np.array([f['geometry']['coordinates'] for f in candidates], dtype=float)
+        distances = geo.haversine_m(lat, lng, coords[:, 1], coords[:, 0])
+        inside = np.flatnonzero(distances <= radius_m)
+        for i in inside[np.argsort(distances[inside], kind='stable')][:limit]:
+            feature = candidates[i]
+            feature['properties']['distance_m'] = round(float(distances[i]), 1)
+            results.append(feature)
+
+    return JsonResponse({
+        'type': 'FeatureCollection',
+        'center': [lng, lat],
+        'radius_km': radius_km,
+        'features': results,
+    })
 
+
+# Hisobotlarni fon rejimida yaratish (navbat: monitoring/reports.py)
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+from .models import Report, ReportJob
+from .reports import enqueue_report
+
+def _can_access_report(user, company_id):
+    if user.user_type == 'committee':
+        return True
+    return company_id is not None and company_id == user.company_id
+
+def _report_job_payload(job):
+    data = {
+        'job_id': job.id,
+        'status': job.status,
+        'report_type': job.report_type,
+        'period': job.period,
+        'created_at': job.created_at.isoformat(),
+        'status_url': reverse('report_job_status', args=[job.id]),
+    }
+    if job.report_id:
+        data['download_url'] = reverse('download_saved_report', args=[job.report_id])
+    if job.status == 'failed':
+        data['error'] = 'Hisobot yaratilmadi'
+    return data
+
+def _report_file_response(request, report):
+    report.file_path.open('rb')
+    return exports.streaming_response(
+        request, exports.file_chunks(report.file_path.file), exports.XLSX_CONTENT_TYPE,
+        os.path.basename(report.file_path.name), length=report.file_path.size,
+    )
+
+@login_required
+@require_POST
+def create_report_job(request):
+    """
+    Hisobotni navbatga qo'yadi: report_type, year, month | quarter.
+    Tayyor bo'lsa (yoki bir xil hisobot allaqachon bo'lsa) download_url darhol qaytadi,
+    aks holda status_url orqali holatini so'rash kerak.
+    """
+    if request.user.user_type != 'committee':
+        return JsonResponse({'error': 'Ruxsat yo\'q'}, status=403)
+    report_type = request.POST.get('report_type', 'monthly')
+    try:
+        start_date, end_date, period_label = parse_period(
+            report_type,
+            request.POST.get('year', timezone.localdate().year),
+            request.POST.get('month'),
+            request.POST.get('quarter'),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    job = enqueue_report(report_type, start_date, end_date, period_label, user=request.user)
+    return JsonResponse(_report_job_payload(job), status=200 if job.status == 'done' else 202)
+
+@login_required
+@require_GET
+def report_job_status(request, job_id):
+    job = get_object_or_404(ReportJob, id=job_id)
+    if not _can_access_report(request.user, job.company_id):
+        return JsonResponse({'error': 'Ruxsat yo\'q'}, status=403)
+    return JsonResponse(_report_job_payload(job))
+
+@login_required
+@require_GET
+def download_saved_report(request, report_id):
+    report = get_object_or_404(Report, id=report_id)
+    if not _can_access_report(request.user, report.company_id):
+        return JsonResponse({'error': 'Ruxsat yo\'q'}, status=403)
+    return _report_file_response(request, report)
+
+
+### Ommaviy jarima
+
+import datetime as _datetime
+from .penalties import issue_penalties
+
+@login_required
+@require_POST
+def issue_penalties_bulk(request):
+    """
+    Hudud/sanoat turidagi barcha qoidabuzarlarga jarima yozadi.
+    POST: deadline (YYYY-MM-DD), region_id, industry_type_id (ixtiyoriy),
+    mode, window_start, window_end (ixtiyoriy), dry_run=1 - faqat hisoblab ko'rsatadi.
+    """
+    if request.user.user_type != 'committee':
+        return JsonResponse({'error': 'Ruxsat yo\'q'}, status=403)
+    try:
+        deadline = _datetime.date.fromisoformat(request.POST.get('deadline', ''))
+        region_id = int(request.POST.get('region_id') or 0) or None
+        industry_type_id = int(request.POST.get('industry_type_id') or 0) or None
+        mode, window_start, window_end = _penalty_window(request.POST)
+    except ValueError:
+        return JsonResponse({'error': "Noto'g'ri parametrlar"}, status=400)
+    if deadline < timezone.localdate():
+        return JsonResponse({'error': "Muddat o'tgan sana bo'lishi mumkin emas"}, status=400)
+
+    dry_run = request.POST.get('dry_run') in ('1', 'true')
+    result = issue_penalties(
+        deadline, region_id, industry_type_id, dry_run=dry_run,
+        mode=mode, window_start=window_start, window_end=window_end,
+    )
+    return JsonResponse({
+        'success': True,
+        'dry_run': dry_run,
+        'mode': mode,
+        'count': result['count'],
+        'trees_required': result['trees_required'],
+        'excess_amount': float(result['excess_amount']),
+        'penalty_numbers': [penalty.penalty_number for penalty in result['penalties']],
+    })
+
+
+### Korxonalarni qidirish (avtomatik to'ldirish)
+
+@login_required
+@require_GET
+def company_search(request):
+    """
+    ?q= - nom, STIR yoki hudud bo'yicha (lotin/kirill), prefiks va xatoli
+    yozuvlar ham topiladi. ?limit= (maks. 50)
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), SEARCH_RESULTS_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': "limit noto'g'ri"}, status=400)
+    companies = search_companies(
+        request.GET.get('q', ''), queryset=Company.objects.select_related('region'), limit=limit,
+    )
+    return JsonResponse({'results': [
+        {
+            'id': company.id,
+            'name': company.name,
+            'stir_number': company.stir_number,
+            'region': company.region.name,
+            'status': company.status,
+            'score': company.search_score,
+        }
+        for company in companies
+    ]})
+
+
+### So'rovlar instrumentatsiyasi
+
+from . import instrumentation
+
+
+@login_required
+@require_GET
+def instrumentation_stats(request):
+    """
+    Faqat staff. View bo'yicha SQL soni/vaqti, render vaqti va umumiy vaqt
+    foizlari (shu worker buferidan). ?view= - filtr, ?records=N - oxirgi N yozuv.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Ruxsat yo\'q'}, status=403)
+    records = [record.as_dict() for record in instrumentation.buffer.records()]
+    if request.GET.get('view'):
+        records = [record for record in records if record['view'] == request.GET['view']]
+    try:
+        limit = max(int(request.GET.get('records', 0)), 0)
+    except ValueError:
+        return JsonResponse({'error': 'records noto\'g\'ri'}, status=400)
+    return JsonResponse({
+        'enabled': getattr(settings, 'INSTRUMENTATION_ENABLED', False),
+        'count': len(records),
+        'views': instrumentation.summarize(records),
+        'records': records[-limit:] if limit else [],
+    })